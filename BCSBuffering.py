@@ -121,14 +121,20 @@ Northern long-eared bat or Tricolored bat:
 
 '''
 
-#add Arc Message
-arcpy.AddMessage("Starting the script")
-arcpy.AddMessage("Import modules and packages")
-
 #import modules and packages
-import arcpy, arcgis, pandas as pd, os, fnmatch, re
-from arcpy import env
-from datetime import datetime, timedelta
+import arcpy
+import os
+import sys
+import multiprocessing
+from datetime import datetime
+
+#import the BCS rules package (bcs folder next to this script).  The engine and legacy modules are imported when they are run
+from bcs.wns import DEFAULT_TABLE, WNSTable
+from bcs.buffers import buffer_rings, merge_buffer_rows, ring_distances
+from bcs.incremental import stateFields, buffer_key
+from bcs.instrument import Recorder
+from bcs.constants import (pyqryHibernacula, pyqryRoost, pyqrySiteCatBio, pyqryCapture, siteFields, captureFields,
+                           siteDerivedFields, captureDerivedFields, bufferFields)
 
 #Common Header Information
 __author__ = "Philip Marley and Jeff Erwin"
@@ -140,939 +146,362 @@ __maintainer__ = " Jeffery Erwin, Philip Marley, & Walker Johnson"
 __email__ = "jeffery.erwin@usda.gov, philip.marley@usda.gov, george.w.johnson@usda.gov"
 __status__ = "Final"
 
-#add Arc Message
-arcpy.AddMessage("Setting env settings")
-
-#add Arc Message
-arcpy.AddMessage("Setting hardcoded values")
-
-''' Set/define hardcoded global values '''
-#Species Variables
-MYSE = "Myotis septentrionalis"
-MYSO = "Myotis sodalis"
-MYLU = "Myotis lucifugus"
-PESU = ["Perimyotis subflavus", "Pipistrellus subflavus"] # in case the taxa list isnt updated
-BATS = "Chiroptera"
-
-#Hibernacula Buffers
-hbPrimary = "500 Feet" # 500 feet
-hbSecondary1 = "1320 Feet" # 1,320 feet | .25 miles
-hbSecondary2 = "10560 Feet" # 10,560 feet | 2 miles
-hbTertiary1 = "4488 Feet" # 4,488 feet | 0.85 miles
-hbTertiary2 = "26400 Feet" # 26,400 feet | 5 miles
-
-#Roost Buffers
-rbPrimary = "150 Feet"
-rbPESU = "300 Feet"
-rbMYSE = "1320 Feet"
-rbMYSO = rbMYLU = "3696 Feet"
-
-#Capture Buffers
-cbPESU = cbMYSE = "3960 Feet"
-cbMYSO = cbMYLU = "9540 Feet"
-
-#Determine Current Date
-currentDate = datetime.now()
-
-#Define White Nose Syndrome(WNS) Detection Dates Dictionary.  Based on BCS Document Table D-1 with addition of R8 and R9 to handle errors
-wns_dict = {'0903':'2015',
-            '0904':'2016',
-            '0905':'2016',
-            '0907':'2017',
-            '0908':'2016',
-            '0909':'2016',
-            '0910':'2016',
-            '0912':'2014',
-            '0913':'2015',
-            '0914':'2015',
-            '0915':'2016',
-            '0919':'2014',
-            '0920':'2011',
-            '0921':'2011',
-            '0922':'2014',
-            '0801':'2016',
-            '0802':'2014',
-            '0803':'2015',
-            '0804':'2013',
-            '0805':'NA',
-            '0806':'NA',
-            '0807':'NA',
-            '0808':'2013',
-            '0809':'NA',
-            '0810':'NA',
-            '0811':'NA',
-            '0812':'NA',
-            '0813':'NA',
-            '0816':'NA',
-            '0860':'2013',
-            '09':'2021',
-            '08':'ERR'
-           }
-
-#Dictionary to hold Roost Data for processing
-roSpecies_dict = {}
-
-#Set GIS Queries in hardcoded
-pyqryHibernacula = "BIOLOGICAL_SITE_USE = 'Hibernating'"
-pyqryRoost = "BIOLOGICAL_SITE_USE = 'Perch or Roost'"
-pyqrySiteCatBio = "SITE_CATEGORY = 'Biological' and OBS_SCIENTIFIC_NAME in ('Myotis septentrionalis','Myotis sodalis', 'Myotis lucifugus', 'Perimyotis subflavus', 'Pipistrellus subflavus', 'Chiroptera')"
-pyqryCapture = "SCIENTIFIC_NAME in ('Myotis septentrionalis','Myotis sodalis', 'Myotis lucifugus', 'Perimyotis subflavus', 'Pipistrellus subflavus') and OBS_METHOD in ('In Hand', 'Visual')"
-
-
-''' End Global Varibles '''
-
-
-''' Get Data and Make Copies '''
-#Add Arc Message
-arcpy.AddMessage("Setting User Inputed Values")
-
-#Define User User Input Values from ArcPro Python Script tool parameters
-roostHibDataNRM = arcpy.GetParameterAsText(0) #Roost/Site NRM GI Data Layer
-captureDataNRM = arcpy.GetParameterAsText(1)  #Capture/Observation NRM GI Data Layer
-workspace = arcpy.GetParameterAsText(2)       #Set FGDB to output all temp and final data output layers
-
-#Set ArcPro Enviromental Settings
-#Overwite output, add layers to the map, set workspace
-arcpy.env.overwriteOutput = True
-arcpy.addOutputsToMap = True
-arcpy.env.workspace = workspace
-
-#Add Arc Message
-arcpy.AddMessage("Defined Workspace = {}".format(arcpy.env.workspace))
-
-#Export User Inputed Layers to Maintain Integrity of Original Dataset
-captureDataExport = str(arcpy.env.workspace + "\\captureDataLayer") #create export path
-rstHibDataExport = str(arcpy.env.workspace + "\\rstHibDataLayer") #create export path
-bufferDataExport = str(arcpy.env.workspace + "\\BCSBuffers_" + currentDate.strftime("%d%b%Y")) #create export path
-arcpy.conversion.ExportFeatures(roostHibDataNRM, rstHibDataExport, pyqrySiteCatBio) #export Roost & Hibernacula Data to new layer
-arcpy.conversion.ExportFeatures(captureDataNRM, captureDataExport, pyqryCapture)  #export capture data to new layer
-
-
-#Create New Feature Layers from the newly exported data layers (from user inputed GI data)
-arcpy.management.MakeFeatureLayer(rstHibDataExport,"HibData", pyqryHibernacula) #Hibernacula Layer
-arcpy.management.MakeFeatureLayer(rstHibDataExport,"RoostData", pyqryRoost) #Roost Layer
-arcpy.management.MakeFeatureLayer(captureDataExport,"CaptureData") #Capture Layer
-
-#Create new feature class to store individual lines data to create poly buffers from
-#get the spatial reference from the Hibernacula data layer
-sR = arcpy.Describe(rstHibDataExport).spatialReference 
-arcpy.management.CreateFeatureclass(arcpy.env.workspace,'ptBufferFC','POINT', spatial_reference=sR)
-
-''' End Get Data and Make New Layers ''' 
-
-''' Add fields to Feature Layers and Feature Classes'''
-arcpy.AddMessage("Adding fields to FCs")
-
-#Add fields to the exported data layers
-#Add fields to rstHibDataLayer which replicates to the Hib and Roost Feature Layers
-arcpy.management.AddFields(rstHibDataExport,[['Historic','TEXT','',10],
-                                    ['VisitNum','TEXT','',5], 
-                                    ['PrePostWNS','TEXT','',10],
-                                    ['haMYSE','DOUBLE'],
-                                    ['haPESU','DOUBLE'],
-                                    ['haMYSO','DOUBLE'],
-                                    ['haMYLU','DOUBLE'],
-                                    ['haCOMB','DOUBLE'],
-                                    ['haBATS','DOUBLE'],
-                                    ['SnagDays','DOUBLE'],
-                                    ['SnagProcess','TEXT', '', 5],
-                                    ['Maternity', 'TEXT', '', 5]
-                                    ])
-                                    
-#Add field to capture data layer
-arcpy.management.AddFields(captureDataExport,[['PrePostWNS','TEXT','',10]
-                                    ])
-                                   
-#Add fiels to the new pt Buffer layer
-arcpy.management.AddFields('ptBufferFC',[['Site_CN', 'TEXT'],
-                                ['SiteName', 'TEXT'],
-                                ['ForestName', 'TEXT'],
-                                ['OrgCode','TEXT','',6],
-                                ['BufferClass', 'TEXT'],
-                                ['BufferType','TEXT'],
-                                ['BufferDistance','TEXT', '',20],
-                                ['Species', 'TEXT'],
-                                ['BufferComments','TEXT'],
-                                ['Exempt','TEXT','',5]
-                                ])
-
-''' End Add Fields '''
+#Fields of the pt Buffer layer, also used for the buffer polygons when they are built in memory
+bufferFieldDefs = [['Site_CN', 'TEXT'],
+                   ['SiteName', 'TEXT'],
+                   ['ForestName', 'TEXT'],
+                   ['OrgCode','TEXT','',6],
+                   ['BufferClass', 'TEXT'],
+                   ['BufferType','TEXT'],
+                   ['BufferDistance','TEXT', '',20],
+                   ['Species', 'TEXT'],
+                   ['BufferComments','TEXT'],
+                   ['Exempt','TEXT','',5]
+                   ]
 
 ''' Define Functions '''
-arcpy.AddMessage("Starting to Define Functions")
-
-#Function to loop through data and determine visit order.  Most recent visit = 1 and sequential in reverse order
-def VisitSequence(featureLayer):
-        #Create a dictionary to hold the unique combinations and their corresponding dates 
-    visit_dict = {} 
-     
-    # Use a search cursor to iterate through the records and populate the visit_dict 
-    with arcpy.da.SearchCursor(featureLayer, ["SITE_CN", "VISIT_START_DATE"]) as cursor: 
-        for row in cursor: 
-            key = (row[0]) # withCreate a unique key for SITE_CN and VISIT_CN 
-            if len(row[1]) == 10:
-                visit_date = row[1]
-            elif len(row[1]) == 16:
-                visit_date = datetime.strptime(row[1],"%Y/%m/%d %H:%M").strftime("%Y/%m/%d") # Get the visit date 
-            
-     
-            # If the key is not in the dictionary, initialize it with an empty list 
-            if key not in visit_dict: 
-                visit_dict[key] = [] 
-     
-            if visit_date not in visit_dict[key]:
-                # Append the visit date to the corresponding key 
-                visit_dict[key].append(visit_date) 
-            
-    # Create a dictionary to hold the visit order 
-    visit_order_dict = {} 
-
-    # Determine the visit order for each unique key 
-    for key, dates in visit_dict.items(): 
-        # Sort dates in descending order 
-        sorted_dates = sorted(dates, reverse=True) 
-     
-        # Assign visit order starting from 1 for the most recent date 
-        for idx, date in enumerate(sorted_dates): 
-            visit_order_dict[(key, date)] = idx + 1 # Start counting from 1 
-     
-    # Update the VisitNum field in the table 
-    with arcpy.da.UpdateCursor(featureLayer, ["SITE_CN", "VISIT_START_DATE", "VisitNum"]) as cursor: 
-        for row in cursor: 
-            if len(row[1]) == 10:
-                vsd = row[1]
-            elif len(row[1]) == 16:
-                vsd = datetime.strptime(row[1],"%Y/%m/%d %H:%M").strftime("%Y/%m/%d") # Get the visit date
-            key = (row[0], vsd) # Create the key for the current row 
-            if key in visit_order_dict: 
-                row[2] = visit_order_dict[key] # Update the VisitNum field 
-            cursor.updateRow(row) # Commit changes to the table 
-
-#Function to Loop through data and determine if most recent visit is a Historic Hib or is its Active and Usable
-#Inputs (input feature layer for processing)
-def HistAct(featureLayer):  
-    # Create a dictionary to hold the unique combinations and their corresponding statuses
-    hist_dict = {}
-    # Use a search cursor to iterate through the records and populate the hist_dict 
-    with arcpy.da.SearchCursor(featureLayer, ["SITE_CN", "VISIT_CN", "VisitNum","VISIT_SITE_STATUS","VISIT_SITE_CONDITION"]) as cursor:
-        for row in cursor:
-            if row[2] == "1":  #determine if the records is the most recent visit.  only process the most recent visit, and ignore the others
-                key = row[0], row[1]  #Create a unique key for SITE_CN and VISIT_CN
-                if key not in hist_dict:
-                    if row[3] == "Inactive" and row[4] == "Usable": # Determine if record is Historic
-                        hist_dict[key] = "Hist"
-                    elif row[3] == "Active" and row[4] == "Usable": # Determine if record is Active
-                        hist_dict[key] = "Act"
-                    elif row[4] == "Unusable": # Determine if record is Unsuable
-                        hist_dict[key] = "Not"
-                    else:                    #Determine if records doesnt meet above criteria
-                        hist_dict[key] = "Unkn"
-                        
-    
-    # Update the Historic field in the table 
-    with arcpy.da.UpdateCursor(featureLayer, ["SITE_CN", "VISIT_CN", "VisitNum","VISIT_SITE_STATUS","VISIT_SITE_CONDITION","Historic"]) as cursor:
-        for row in cursor:
-            key = (row[0], row[1])  # Create the key for the current row
-            if key in hist_dict:  # process records that the key is found in hist_dict
-                row[5] = hist_dict[key]  # Update the Historic field 
-            else:   # process records whose key is NOT in hist_dict
-                row[5] = "err"  # Update the Historic field 
-            cursor.updateRow(row)   # Commit changes to the table
-
-#Function to process data to determine PrePostWNSDates
-#Inputs (input feature layer for processing, date field (column) name where the date is stored)
-def PrePostWNSDate(featureLayer,vDateLayer):
-    
-    #Loop through input feature class with update cursor
-    with arcpy.da.UpdateCursor(featureLayer,["FS_UNIT_ID", vDateLayer,"PrePostWNS"]) as cursor:
-        for row in cursor:
-            key = row[0] #org Code
-            #determine if org code is in the WNS Date Dictionary
-            if key in wns_dict:
-                #process if the Org Code has a WNS date
-                if wns_dict[key] != "NA" or wns_dict != 'ERR':
-                    visit = row[1] #date column
-                    vdate = visit[:4] #Year from date column variable
-                    wns = wns_dict[key]  #set varibale to year value from the wns dictionary
-                    #determine if visit date variable is before the WNS year
-                    if vdate < wns:
-                        row[2] = "PreWNS"
-                    else:
-                        row[2] = "PostWNS"
-                #Process id the Org Code has no WNS Date
-                elif wns_dict == "NA":
-                    row[2] = "NoWNS"
-            else:
-                row[2] = "error"
-            cursor.updateRow(row)
-
-#Function to process Hibernacula Data and populate a dictionary with individual counts per species for orgs with no post wns date
-def haCountIndividuals():        
-    haSpecies_dict = {}     #highest abundance (for orgs with no WNS dates)
-    l3Species_dict = {}     #Last 3 visits (for orgs with a WNS date)
-    
-    value1 = value2 = ''
-    #loops through and populate dictionary with species counts
-    with arcpy.da.SearchCursor('HibData',["SITE_CN", "VISIT_CN", "OBS_COUNT","OBS_SCIENTIFIC_NAME","FS_UNIT_ID","VisitNum"]) as cursor:
-        for row in cursor:
-            key = (row[0], row[1])  # Site Cn number & Visit CN number
-            if row[2]:
-                #process if org code has no wns date.
-                if wns_dict[row[4]] == "NA" and len(row[4]) >= 4:
-                    #is the key in the haSpecies Dict?
-                    if key in haSpecies_dict:
-                        if row[3] in PESU:
-                            if "PESU" in haSpecies_dict[key]:
-                                haSpecies_dict[key]["PESU"] += row[2]
-                            else:
-                                haSpecies_dict[key]["PESU"] = row[2]
-                        elif row[3] == MYSE:
-                            if "MYSE" in haSpecies_dict[key]:
-                                haSpecies_dict[key]["MYSE"] += row[2]
-                            else:
-                                haSpecies_dict[key]["MYSE"] = row[2]
-                        elif row[3] == MYSO:
-                            if "MYSO" in haSpecies_dict[key]:
-                                haSpecies_dict[key]["MYSO"] += row[2]
-                            else:
-                                haSpecies_dict[key]["MYSO"] = row[2]
-                        elif row[3] == MYLU:
-                            if "MYLU" in haSpecies_dict[key]:
-                                haSpecies_dict[key]["MYLU"] += row[2]
-                            else:
-                                haSpecies_dict[key]["MYLU"] = row[2]
-                        elif row[3] == BATS:
-                            if "BATS" in haSpecies_dict[key]:
-                                haSpecies_dict[key]["BATS"] += row[2]
-                            else:
-                                haSpecies_dict[key]["BATS"] = row[2]   
-                    else:
-                        if row[3] in PESU:
-                            value1 = {"PESU":row[2]}
-                        elif row[3] == MYSE:
-                            value1 = {"MYSE":row[2]}
-                        elif row[3] == MYSO:
-                            value1 = {"MYSO":row[2]}
-                        elif row[3] == MYLU:
-                            value1 = {"MYLU":row[2]}
-                        elif row[3] == BATS:
-                            value1 = {"BATS":row[2]}
-                                                    
-                        if "value1" in locals():
-                            haSpecies_dict[key] = value1
-                        
-                elif wns_dict[row[4]] != "NA" and len(row[4]) >= 4:
-                    #print("key:{} | Starting WNS Date process".format(key))
-                    if key in l3Species_dict:
-                        if row[3] in PESU:
-                            if "PESU" in l3Species_dict[key]:
-                                if l3Species_dict[key]["PESU"]:
-                                    l3Species_dict[key]["PESU"] += row[2]
-                            else:
-                                l3Species_dict[key]["PESU"] = row[2]
-                        elif row[3] == MYSE:
-                            if "MYSE" in l3Species_dict[key]:
-                                if l3Species_dict[key]["MYSE"]:
-                                    l3Species_dict[key]["MYSE"] += row[2]
-                            else:
-                                l3Species_dict[key]["MYSE"] = row[2]
-                        elif row[3] in MYSO:
-                            if "MYSO" in l3Species_dict[key]:
-                                if l3Species_dict[key]["MYSO"]:
-                                    l3Species_dict[key]["MYSO"] += row[2]
-                            else:
-                                l3Species_dict[key]["MYSO"] = row[2]
-                        elif row[3] == MYLU:
-                            if "MYLU" in l3Species_dict[key]:
-                                if l3Species_dict[key]["MYLU"]:
-                                    l3Species_dict[key]["MYLU"] += row[2]
-                            else:
-                                l3Species_dict[key]["MYLU"] = row[2]  
-                        elif row[3] == BATS:
-                            if "BATS" in l3Species_dict[key]:
-                                if l3Species_dict[key]["BATS"]:
-                                    l3Species_dict[key]["BATS"] += row[2]
-                            else:
-                                 l3Species_dict[key]["BATS"] = row[2]   
-                    else:
-                        if row[3] in PESU:
-                            value2 = {"PESU":row[2]}
-                        elif row[3] == MYSE:
-                            value2 = {"MYSE":row[2]}
-                        elif row[3] == MYSO:
-                            value2 = {"MYSO":row[2]}
-                        elif row[3] == MYLU:
-                            value2 = {"MYLU":row[2]}
-                        elif row[3] == BATS:
-                            value2 = {"BATS":row[2]}
-                            
-                        if "value2" in locals():
-                            l3Species_dict[key] = value2
-
-   #update cursor           
-    with arcpy.da.UpdateCursor('HibData',["SITE_CN", "VISIT_CN", "haMYSE","haPESU","haCOMB","haMYSO","haMYLU","haBATS","PrePostWNS", "FS_UNIT_ID","VisitNum"]) as cursor:
-        for row in cursor:
-            key = (row[0], row[1])
-            if key in haSpecies_dict:
-                if 'MYSE' in haSpecies_dict[key]:
-                    row[2] = haSpecies_dict[key]['MYSE']
-                if 'PESU' in haSpecies_dict[key]:
-                    row[3] = haSpecies_dict[key]['PESU']
-                if 'MYSO' in haSpecies_dict[key]:
-                    row[5] = haSpecies_dict[key]['MYSO']
-                if 'MYLU' in haSpecies_dict[key]:
-                    row[6] = haSpecies_dict[key]['MYLU']
-                if 'BATS' in haSpecies_dict[key]:
-                    row[7] = haSpecies_dict[key]['BATS']    
-                    
-                if 'MYSO' in haSpecies_dict[key] or 'MYLU' in haSpecies_dict[key]:
-                    value1C=0
-                    if 'MYSO' in haSpecies_dict[key]: 
-                        value1C += row[5]
-                    if 'MYLU' in haSpecies_dict[key]:
-                        value1C += row[6]
-                    if value1C >0:
-                        row[4] = value1C
-                    
-                cursor.updateRow(row)  
-            elif key in l3Species_dict:
-                if 'MYSE' in l3Species_dict[key]:
-                    row[2] = l3Species_dict[key]['MYSE']
-                if 'PESU' in l3Species_dict[key]:
-                    row[3] = l3Species_dict[key]['PESU']
-                if 'MYSO' in l3Species_dict[key]:
-                    row[5] = l3Species_dict[key]['MYSO']
-                if 'MYLU' in l3Species_dict[key]:
-                    row[6] = l3Species_dict[key]['MYLU']
-                if 'BATS' in l3Species_dict[key]:
-                    row[7] = l3Species_dict[key]['BATS'] 
-                    
-                if 'MYSO' in l3Species_dict[key] or 'MYLU' in l3Species_dict[key]:
-                    value2C=0
-                    if 'MYSO' in l3Species_dict[key]: 
-                        value2C += row[5]
-                    if 'MYLU' in l3Species_dict[key]:
-                        value2C += row[6]
-                    if value2C >0:
-                        row[4] = value2C
-                    
-                cursor.updateRow(row)
-
-#Function to process Hibernacula data to the pt Feature Layer
-def ptBufferLayerHib():
-    #Define in function variables
-    bfHib_dict = {} #Dict to store Hib Buffer Data
-    processedList =[] # List to hold unique keys of what has been processed so we arnt double buffering
-    row_values=[] # list to store the physical records which will be added to the ptBuffer Layer
-
-    #Search Cursor to loop through Hib data for hibernacula
-    with arcpy.da.SearchCursor('HibData',["SITE_CN", "VISIT_CN","VISIT_START_DATE","FS_UNIT_ID",
-                                   "EXEMPT_FROM_PUBLIC","VisitNum","Historic","PrePostWNS","haMYSE",
-                                   "haPESU","haCOMB","haMYSO","haMYLU","haBATS", "OBS_METHOD_TYPE", 
-                                   "VISIT_COMMENTS", "SHAPE@XY", "SITE_NAME", "FS_UNIT_NAME",
-                                   "VISIT_SITE_CONDITION", "VISIT_SITE_STATUS"]) as cursor:
-        #loop through HibData and populate  dictionary with the site_cn and visit_cn as key, and then values as items from the FC
-        for row in cursor:
-            key = row[0] #Site Num
-            orgC = row[3]
-            xy = row[16] #XY Coord Token
-            sName = row[17] #SiteName
-            forest = row[18]
-            
-            #loop through records that havnt been processed yet (looking at processedList list)
-            if key not in processedList:
-            
-                #process the historic hib records 
-                #where historic records and the visit is most recent 
-                if row[6] == "Hist" and row[5] == 1:
-                    
-                    #SiteCN, SiteName, Forest, OrgCode, BlufferClass, BufferType, BufferDistance, Species, Comments, Exempt, XY Coords(Token)
-                    #add row datato the row value list 
-                    row_values.append((key, sName, forest, orgC, "Hibernacula", "Historical", 500, "BCS", "", row[4], xy))   
-                    
-                    #add SiteCN number to the process list
-                    processList.append(key)
-
-
-    #Search Cursor to loop through Hib data of non hibernacula data
-    with arcpy.da.SearchCursor('HibData',["SITE_CN", "VISIT_CN","VISIT_START_DATE","FS_UNIT_ID",
-                                   "EXEMPT_FROM_PUBLIC","VisitNum","Historic","PrePostWNS","haMYSE",
-                                   "haPESU","haCOMB","haMYSO","haMYLU","haBATS", "OBS_METHOD_TYPE", 
-                                   "VISIT_COMMENTS", "SHAPE@XY", "SITE_NAME", "FS_UNIT_NAME",
-                                   "VISIT_SITE_CONDITION", "VISIT_SITE_STATUS"]) as cursor:
-        #loop through HibData and populate  dictionary with the site_cn and visit_cn as key, and then values as items from the FC
+
+#Function to read a table or layer once into a list of rows
+def readTable(da, featureLayer, fields, where=None):
+    with da.SearchCursor(featureLayer, fields, where) as cursor:
+        return list(cursor)
+
+#Function to write derived values ({ObjectID: values}) back to a table in a single UpdateCursor pass
+def writeValues(da, featureClass, fields, values):
+    with da.UpdateCursor(featureClass, ["OID@"] + fields) as cursor:
         for row in cursor:
-            key = row[0] #Site Num
-            orgC = row[3]
-            xy = row[16] #XY Coord Token
-            sName = row[17] #SiteName
-            forest = row[18]
-            
-            #loop through records that havnt been processed yet (looking at processedList list)
-            if key not in processedList:
-            
-                if row[19] == "Usable" and row[20] == "Active":
-                                
-                    if len(row[3]) >=4 and row[7] != "PreWNS":
-                        if key in bfHib_dict:
-                            if row[7] == "NoWNS":
-                                
-                                '''??? should the following elifs under this if statement and the next elif statment be if statements?'''
-                                if row[9] is not None:
-                                    if 'PESU' in bfHib_dict[key]:
-                                        if row[9] > bfHib_dict[key]['PESU']:
-                                            bfHib_dict[key]['PESU'] = row[9]
-                                    else:
-                                        bfHib_dict[key]['PESU'] = row[9]
-                                
-                                if row[8] is not None:
-                                    if 'MYSE' in bfHib_dict[key]: 
-                                        if row[8] > bfHib_dict[key]['MYSE']:
-                                            bfHib_dict[key]['MYSE'] = row[8]
-                                    else:
-                                        bfHib_dict[key]['MYSE'] = row[8]
-                                if row[10] is not None:
-                                    if 'COMB' in bfHib_dict[key]: 
-                                        if row[10] > bfHib_dict[key]['COMB']:
-                                            bfHib_dict[key]['COMB'] = row[10]
-                                    else:
-                                        bfHib_dict[key]['COMB'] = row[10]
-                                if row[13] is not None:
-                                    if 'BATS' in bfHib_dict[key]:
-                                        if row[13] > bfHib_dict[key]['BATS']:
-                                            bfHib_dict[key]['BATS'] = row[13]
-                                    else:
-                                        bfHib_dict[key]['BATS'] = row[13]
-                            elif row[7] == "PostWNS" and int(row[5]) <= 3:
-                                
-                                if row[9] is not None:
-                                    if 'PESU' in bfHib_dict[key]:
-                                        if row[9] > bfHib_dict[key]['PESU']:
-                                            bfHib_dict[key]['PESU'] = row[9]
-                                    else:
-                                        bfHib_dict[key]['PESU'] = row[9]
-                                
-                                if row[8] is not None:
-                                    if 'MYSE' in bfHib_dict[key]: 
-                                        if row[8] > bfHib_dict[key]['MYSE']:
-                                            bfHib_dict[key]['MYSE'] = row[8]
-                                    else:
-                                        bfHib_dict[key]['MYSE'] = row[8]
-                                if row[10] is not None:
-                                    if 'COMB' in bfHib_dict[key]: 
-                                        if row[10] > bfHib_dict[key]['COMB']:
-                                            bfHib_dict[key]['COMB'] = row[10]
-                                    else:
-                                        bfHib_dict[key]['COMB'] = row[10]
-                                if row[13] is not None:
-                                    if 'BATS' in bfHib_dict[key]:
-                                        if row[13] > bfHib_dict[key]['BATS']:
-                                            bfHib_dict[key]['BATS'] = row[13]
-                                    else:
-                                        bfHib_dict[key]['BATS'] = row[13]
-                        else:
-                            
-                            if row[2]:
-                                bfHib_dict[key] = {'date':row[2]}
-                            if row[3]:
-                                bfHib_dict[key]['org'] = row[3]                                           
-                            if row[4]:
-                                bfHib_dict[key]['exempt'] = row[4]
-                            if row[5]:
-                                bfHib_dict[key]['vnum'] = row[5]
-                            if row[6]:
-                                bfHib_dict[key]['hist'] = row[6]
-                            if row[7]:
-                                bfHib_dict[key]['wns'] = row[7]
-                            if row[8]:
-                                bfHib_dict[key]['MYSE'] = row[8]
-                            if row[9]:
-                                bfHib_dict[key]['PESU'] = row[9]
-                            if row[10]:
-                                bfHib_dict[key]['COMB'] = row[10]
-                            if row[11]:
-                                bfHib_dict[key]['MYSO'] = row[11]
-                            if row[12]:
-                                bfHib_dict[key]['MYLU'] = row[12]
-                            if row[13]:
-                                bfHib_dict[key]['BATS'] = row[13]
-                            if row[14]:
-                                bfHib_dict[key]['OMT'] = row[14] # OBS_METHOD_TYPE field
-                            if row[15]:
-                                bfHib_dict[key]['VLID'] = row[15] # VISIT_LOCAL_ID field
-                            if row[17]:
-                                bfHib_dict[key]['name'] = row[17]
-                            if row[18]:
-                                bfHib_dict[key]['forest'] = row[18]
-                            
-                            bfHib_dict[key]['XY'] = xy
-                            
-    #loop through bfHib_dict (which should be a record per site) and process the key values into rews and 
-    #append to the row_values list to be proceessed into the new FC    
-    for d in bfHib_dict:
-        key = d
-        orgC = bfHib_dict[d]['org']
-        sName = bfHib_dict[d]['name']
-        forest = bfHib_dict[key]['forest']
-        if 'exempt' in bfHib_dict[d]:
-            exempt = bfHib_dict[d]['exempt']
-        else:
-            exempt = "N"
-        #if bfHib_dict[d]['hist']=='Act':
-        if 'PESU' in bfHib_dict[d]:
-            count = bfHib_dict[d]['PESU']
-            if count == 0:
-                #SiteCN, SiteName, OrgCode, BlufferClass, BufferType, BufferDistance, Species, Comments, Exempt, XY Coords(Token)
-                row_values.append((key, sName, forest, orgC, "Hibernacula", "Primary", hbPrimary, "PESU","", exempt, bfHib_dict[d]['XY']))
-                row_values.append((key, sName, forest, orgC, "Hibernacula", "Secondary", hbSecondary1, "PESU", "", exempt, bfHib_dict[d]['XY']))
-                row_values.append((key, sName, forest, orgC, "Hibernacula", "Tertiary", hbTertiary1, "PESU", "", exempt, bfHib_dict[d]['XY']))
-            if count >= 1:
-                row_values.append((key, sName, forest, orgC, "Hibernacula", "Primary", hbPrimary, "PESU","", exempt, bfHib_dict[d]['XY']))
-            if count >= 10:
-                row_values.append((key, sName, forest, orgC, "Hibernacula", "Secondary", hbSecondary1, "PESU", "", exempt, bfHib_dict[d]['XY']))
-            if count >= 20:
-                row_values.append((key, sName, forest, orgC, "Hibernacula", "Tertiary", hbTertiary1, "PESU", "", exempt, bfHib_dict[d]['XY']))
-            
-        if 'MYSE' in bfHib_dict[d]:
-            count = bfHib_dict[d]['MYSE']
-            if 'VLID' in bfHib_dict[d] and re.search(r'\b' + re.escape("internal") + r'\b',bfHib_dict[d]['VLID'], re.IGNORECASE):#internal count
-                if count == 0:
-                    #SiteCN, SiteName, OrgCode, BlufferClass, BufferType, BufferDistance, Species, Comments, Exempt, XY Coords(Token)
-                    row_values.append((key, sName, forest, orgC, "Hibernacula", "Primary", hbPrimary, "MYSE","", exempt, bfHib_dict[d]['XY']))
-                    row_values.append((key, sName, forest, orgC, "Hibernacula", "Secondary", hbSecondary1, "MYSE", "", exempt, bfHib_dict[d]['XY']))
-                    row_values.append((key, sName, forest, orgC, "Hibernacula", "Tertiary", hbTertiary1, "MYSE", "", exempt, bfHib_dict[d]['XY']))
-            
-                if count >= 1:
-                    row_values.append((key, sName, forest, orgC, "Hibernacula", "Secondary", hbSecondary1, "MYSE", "", exempt, bfHib_dict[d]['XY']))
-                if count >= 5:
-                    row_values.append((key, sName, forest, orgC, "Hibernacula", "Tertiary", hbTertiary1, "MYSE", "", exempt, bfHib_dict[d]['XY']))
-            else: #external count
-                if count == 0:
-                    #SiteCN, SiteName, OrgCode, BlufferClass, BufferType, BufferDistance, Species, Comments, Exempt, XY Coords(Token)
-                    row_values.append((key, sName, forest, orgC, "Hibernacula", "Primary", hbPrimary, "MYSE","", exempt, bfHib_dict[d]['XY']))
-                    row_values.append((key, sName, forest, orgC, "Hibernacula", "Secondary", hbSecondary1, "MYSE", "", exempt, bfHib_dict[d]['XY']))
-                    row_values.append((key, sName, forest, orgC, "Hibernacula", "Tertiary", hbTertiary1, "MYSE", "", exempt, bfHib_dict[d]['XY']))
-                
-                if count >= 1:
-                    row_values.append((key, sName, forest, orgC, "Hibernacula", "Primary", hbPrimary, "MYSE","", exempt, bfHib_dict[d]['XY']))
-                if count >= 10:
-                    row_values.append((key, sName, forest, orgC, "Hibernacula", "Secondary", hbSecondary1, "MYSE", "", exempt, bfHib_dict[d]['XY']))
-                if count >= 20:
-                    row_values.append((key, sName, forest, orgC, "Hibernacula", "Tertiary", hbTertiary1, "MYSE", "", exempt, bfHib_dict[d]['XY']))
-        
-        if 'COMB' in bfHib_dict[d]:
-            count = bfHib_dict[d]['COMB']
-            if count == 0:
-                #SiteCN, SiteName, OrgCode, BlufferClass, BufferType, BufferDistance, Species, Comments, Exempt, XY Coords(Token)
-                row_values.append((key, sName, forest, orgC, "Hibernacula", "Primary", hbPrimary, "MYSO/MYLU","", exempt, bfHib_dict[d]['XY']))
-                row_values.append((key, sName, forest, orgC, "Hibernacula", "Secondary", hbSecondary2, "MYSO/MYLU", "", exempt, bfHib_dict[d]['XY']))
-                row_values.append((key, sName, forest, orgC, "Hibernacula", "Tertiary", hbTertiary2, "MYSO/MYLU", "", exempt, bfHib_dict[d]['XY']))
-            if count >= 1:
-                row_values.append((key, sName, forest, orgC, "Hibernacula", "Primary", hbPrimary, "MYSO/MYLU","", exempt, bfHib_dict[d]['XY']))
-            if count >= 20:
-                row_values.append((key, sName, forest, orgC, "Hibernacula", "Secondary", hbSecondary2, "MYSO/MYLU", "", exempt, bfHib_dict[d]['XY']))
-            if count >= 5000:
-                row_values.append((key, sName, forest, orgC, "Hibernacula", "Tertiary", hbTertiary2, "MYSO/MYLU", "", exempt, bfHib_dict[d]['XY']))
-            
-                
-    #insert data from row_values list into the new line feature class
-    with arcpy.da.InsertCursor('ptBufferFC', ['Site_CN', 'SiteName', 'ForestName', 'OrgCode', 'BufferClass', 'BufferType', 'BufferDistance', 'Species', 'BufferComments', 'Exempt', 'SHAPE@XY']) as cursor:
+            if row[0] in values:
+                cursor.updateRow((row[0],) + values[row[0]])
+
+#Function to resolve a layer or dataset to its catalog path (a dataset that does not exist yet is already a path)
+def catalogPath(dataset):
+    return arcpy.Describe(dataset).catalogPath if arcpy.Exists(dataset) else dataset
+
+#Function to load buffer rows in the pt Buffer Layer
+def insertBufferRows(da, row_values):
+    with da.InsertCursor('ptBufferFC', bufferFields) as cursor:
         for row in row_values:
             cursor.insertRow(row)
 
-#Function to process Roost data and snags to determine if active snag's most recent visit is less than 10 years, and update FC only if younger than 
-def SnagTime():
-    
-    with arcpy.da.UpdateCursor('RoostData',["VISIT_SITE_CONDITION", "VISIT_START_DATE", "SITE_TYPE", "VISIT_SITE_STATUS", "PrePostWNS", "SnagDays", "SnagProcess"]) as cursor:
+#Function to build the buffer polygons from the buffer rows (numeric distances, no ptBufferFC) and write them in one pass
+#With rings, each buffer is the ring between it and the next smaller buffer at the same point
+#create=False appends to an existing buffer layer.  sR is the spatial reference of the buffer rows' XY
+def writeBufferPolygons(da, featureClass, row_values, sR, rings=False, create=True):
+    if create:
+        outPath, outName = os.path.split(catalogPath(featureClass))
+        arcpy.management.CreateFeatureclass(outPath, outName, 'POLYGON', spatial_reference=sR)
+        arcpy.management.AddFields(featureClass, bufferFieldDefs)
+    geographic = sR.type == "Geographic"
+    metersPerUnit = 1.0 if geographic else sR.metersPerUnit
+    outerRings = buffer_rings(row_values, geographic=geographic, meters_per_unit=metersPerUnit)
+    if rings:
+        innerFeet = ring_distances(row_values)
+        innerRings = buffer_rings(row_values, geographic=geographic, meters_per_unit=metersPerUnit, feet=innerFeet)
+    with da.InsertCursor(featureClass, bufferFields[:-1] + ['SHAPE@']) as cursor:
+        for index, row in enumerate(row_values):
+            if row[-1] is None: #no point location to buffer
+                continue
+            parts = [arcpy.Array([arcpy.Point(x, y) for x, y in outerRings[index]])]
+            if rings and innerFeet[index] > 0:
+                parts.append(arcpy.Array([arcpy.Point(x, y) for x, y in innerRings[index][::-1]])) #counterclockwise hole
+            polygon = arcpy.Polygon(arcpy.Array(parts) if len(parts) > 1 else parts[0], sR)
+            cursor.insertRow(tuple(row[:-1]) + (polygon,))
+
+#Function to read the site fingerprints stored by the last incremental run ({(source, key): fingerprint})
+def readState(da, stateTable):
+    with da.SearchCursor(stateTable, stateFields) as cursor:
+        return dict(((source, key), fingerprint) for source, key, fingerprint in cursor)
+
+#Function to replace the stored site fingerprints
+def writeState(da, stateTable, fingerprints):
+    outPath, outName = os.path.split(catalogPath(stateTable))
+    arcpy.management.CreateTable(outPath, outName)
+    arcpy.management.AddFields(stateTable, [['Source', 'TEXT', '', 10], ['SiteKey', 'TEXT'], ['Fingerprint', 'TEXT', '', 40]])
+    with da.InsertCursor(stateTable, stateFields) as cursor:
+        for (source, key), fingerprint in fingerprints.items():
+            cursor.insertRow((source, key, fingerprint))
+
+#Function to delete the buffers built from the given (source, key) keys from a buffer layer
+def deleteBuffers(da, featureClass, keys):
+    deleted = 0
+    with da.UpdateCursor(featureClass, ["BufferClass", "Site_CN", "SiteName"]) as cursor:
         for row in cursor:
-            
-            if row[0] == "Usable" and row[3] == "Active" and row[2] == "Snag":
-                if len(row[1]) == 10:
-                    vDate = datetime.strptime(row[1], "%Y/%m/%d")
-                elif len(row[1]) == 16:
-                    vDate = datetime.strptime(row[1], "%Y/%m/%d %H:%M")
-                    
-                timeDiff = currentDate - vDate
-                
-                row[5] = timeDiff.days
-                
-                if timeDiff <= timedelta(days = 3650):
-                    row[6] = "Yes"
-                    
-                cursor.updateRow(row)
-
-#Function to process Roost data to determine counts
-def roCountIndividuals():
-
-    with arcpy.da.SearchCursor('RoostData',["SITE_CN", "VISIT_CN", "OBS_COUNT","OBS_SCIENTIFIC_NAME","FS_UNIT_ID","Historic", "PrePostWNS", "SnagProcess", "SITE_TYPE", "REPRO_STATUS", "VISIT_SITE_CONDITION","VISIT_SITE_STATUS"]) as cursor:
-        for row in cursor:
-            key = (row[0], row[1])
-            if ((row[10] == "Usable" and row[11] == "Active") and row[6] != "PreWNS" and row[8] != "Snag") or ((row[10] == "Usable" and row[11] == "Active") and row[6] != "PreWNS" and row[8] == "Snag" and row[7] == "Yes"):
-                
-                if key in roSpecies_dict:
-                    if row[3] in PESU:
-                        if "PESU" in roSpecies_dict[key]:
-                            roSpecies_dict[key]["PESU"] += row[2]
-                        else:
-                            roSpecies_dict[key]["PESU"] = row[2]
-                    elif row[3] == MYSE:
-                        if "MYSE" in roSpecies_dict[key]:
-                            roSpecies_dict[key]["MYSE"] += row[2]
-                        else:
-                            roSpecies_dict[key]["MYSE"] = row[2]
-                    elif row[3] in MYSO:
-                        if "MYSO" in roSpecies_dict[key]:
-                            roSpecies_dict[key]["MYSO"] += row[2]
-                        else:
-                            roSpecies_dict[key]["MYSO"] = row[2]
-                    elif row[3] == MYLU:
-                        if "MYLU" in roSpecies_dict[key]:
-                            roSpecies_dict[key]["MYLU"] += row[2]
-                        else:
-                            roSpecies_dict[key]["MYLU"] = row[2]
-                    elif row[3] == BATS:
-                        if "BATS" in roSpecies_dict[key]:
-                            roSpecies_dict[key]["BATS"] += row[2]
-                        else:
-                            roSpecies_dict[key]["BATS"] = row[2]   
-                else:
-                    if row[3] in PESU:
-                        value1 = {"PESU":row[2]}
-                    elif row[3] == MYSE:
-                        value1 = {"MYSE":row[2]}
-                    elif row[3] == MYSO:
-                        value1 = {"MYSO":row[2]}
-                    elif row[3] == MYLU:
-                        value1 = {"MYLU":row[2]}
-                    elif row[3] == BATS:
-                        value1 = {"BATS":row[2]}
-                                                
-                    if "value1" in locals():
-                        roSpecies_dict[key] = value1
-                        
-                    if row[9] == "Reproducing":
-                        roSpecies_dict[key]['Repro'] = "Yes"
-                        
-    #           
-    with arcpy.da.UpdateCursor('RoostData',["SITE_CN", "VISIT_CN", "haMYSE","haPESU","haCOMB","haMYSO","haMYLU","haBATS","PrePostWNS", "FS_UNIT_ID","VisitNum"]) as cursor:
-        for row in cursor:
-            key = (row[0], row[1])
-            if key in roSpecies_dict:
-                if 'MYSE' in roSpecies_dict[key]:
-                    row[2] = roSpecies_dict[key]['MYSE']
-                if 'PESU' in roSpecies_dict[key]:
-                    row[3] = roSpecies_dict[key]['PESU']
-                if 'MYSO' in roSpecies_dict[key]:
-                    row[5] = roSpecies_dict[key]['MYSO']
-                if 'MYLU' in roSpecies_dict[key]:
-                    row[6] = roSpecies_dict[key]['MYLU']
-                if 'BATS' in roSpecies_dict[key]:
-                    row[7] = roSpecies_dict[key]['BATS']    
-                    
-                if 'MYSO' in roSpecies_dict[key] or 'MYLU' in roSpecies_dict[key]:
-                    value1C=0
-                    if 'MYSO' in roSpecies_dict[key]: 
-                        value1C += row[5]
-                    if 'MYLU' in roSpecies_dict[key]:
-                        value1C += row[6]
-                    if value1C >0:
-                        row[4] = value1C
-                    
-                cursor.updateRow(row)  
-
-#Function to process Roost data and populate the maternity field in the roost data layer
-def maternityRoost():
-    with arcpy.da.UpdateCursor('RoostData',["SITE_CN", "VISIT_CN", "Maternity"]) as cursor:
-        for row in cursor:
-            key = (row[0], row[1])
-            if key in roSpecies_dict and 'Repro' in roSpecies_dict[key]:
-                row[2] = "Yes"
-                
-            cursor.updateRow(row)
-
-#Function to process Roost data to the pt Feature Layer
-def ptBufferLayerRoost():
-    processedList = [] #list to hold unique processed records
-    mList = [] #list to hold which records have reproducing
-    row_values = []  #list to hold values to be added to the pt buffer layer
-
-    with arcpy.da.SearchCursor('RoostData', ["SITE_CN", "FS_UNIT_ID", "EXEMPT_FROM_PUBLIC", 
-                                            "Historic", "PrePostWNS", "haMYSE", "haPESU", 
-                                            "haMYSO", "haMYLU", "SnagProcess", 
-                                            "REPRO_STATUS", "SHAPE@XY", "OBS_SCIENTIFIC_NAME", 
-                                            "SITE_NAME", "FS_UNIT_NAME", "SITE_TYPE",
-                                            "VISIT_SITE_CONDITION", "VISIT_SITE_STATUS"]) as cursor:
-        for row in cursor:
-            key = row[0]
-            key2 = (row[0], row[12])
-            orgC = row[1]
-            if row[2] is not None:
-                if row[2] == "Y":
-                    exempt = "Y"
-                else:
-                    exempt = "N"
-            else:
-                exempt = "N"
-            xy = row[11]
-            sName = row[13]
-            forest =row[14]
-            
-            if row[3] == "Act" and row[4] == "PostWNS" and (row[15] != "Snag" or (row[15] == "Snag" and row[9] == "Yes")):
-                if key not in processedList:
-                    row_values.append((key, sName, forest, orgC, "Roost", "Primary", rbPrimary, "", "", exempt, xy))
-                    processedList.append(key)
-            
-            
-            
-            
-            if any(item is not None for item in (row[5], row[6], row[7], row[8])) and row[16] == "Usable" and row[17] == "Active" and row[4] == "PostWNS" and (row[15] != "Tree" or (row[15] == "Tree" and row[9] == "Yes")):         
-                
-                if row[10] == "Reproducing" and key2 not in mList:
-                    if row[6] is not None:
-                        row_values.append((key, sName, forest, orgC, "Roost", "Maternity", rbPESU, 'PESU', '', exempt, xy))                    
-                    if row[5] is not None:
-                        row_values.append((key, sName, forest, orgC, "Roost", "Maternity", rbMYSE, 'MYSE', '', exempt, xy))                    
-                    if row[7] is not None:
-                        row_values.append((key, sName, forest, orgC, "Roost", "Maternity", rbMYSO, 'MYSO', '', exempt, xy))                    
-                    if row[8] is not None:
-                        row_values.append((key, sName, forest, orgC, "Roost", "Maternity", rbMYLU, 'MYLU', '', exempt, xy))                    
-                    mList.append(key2)
-
-
-
-    with arcpy.da.InsertCursor('ptBufferFC', ['Site_CN', 'SiteName', 'ForestName', 'OrgCode', 
-                                'BufferClass', 'BufferType', 'BufferDistance', 'Species', 'BufferComments', 'Exempt', 'SHAPE@XY']) as cursor:
-            for row in row_values:
-                cursor.insertRow(row)      
-
-#Function to process Capture data to the pt Feature layer
-def ptBufferLayerCapture():
-    row_values = []  #List to hold values to be added to the ptBuffer Layer
-    cList = [] #List that will hold which uniques values were processed
-
-    #loop thorugh the Capture Data with the search cursor
-    with arcpy.da.SearchCursor('CaptureData',['OBS_CN', 'OBS_DATE', 'PrePostWNS', 
-                                        'REPRODUCTIVE_STATUS', 'SCIENTIFIC_NAME', 'EXEMPT_FROM_PUBLIC', 
-                                        'SHAPE@XY', 'FS_UNIT_ID', 'SITE_NAME', 'FS_UNIT_NAME', 
-                                        'AGE', 'OBS_METHOD', 'SITE_TYPE']) as cursor:
-        for row in cursor:
-
-            key = row[0] #Observation Number
-            key2 = (row[8], row[4]) #Combination of Observation Number & Scientific Name
-            #determine if record is exempt from public distribution or not
-            if row[5] is not None:
-                if row[5] == "Y":
-                    exempt = "Y"
-                else:
-                    exempt = "N"
-            else:
-                exempt = "N"
-            xy = row[6] #XY Coords Token
-            orgC =row[7] #Org Code
-            sName = row[8] #Site Name
-            forest = row[9] #Forest Name
-
-            #Determine the Visit Date
-            #is the length of the value is 10 then there is no time in the value
-            if len(row[1]) == 10:
-                vDate = datetime.strptime(row[1], "%Y/%m/%d")
-            #if the length of the row is 16 there there is time in the value
-            elif len(row[1]) == 16:
-                vDate = datetime.strptime(row[1], "%Y/%m/%d %H:%M")
-            #For the next 3 variables, the year (2000) is irrelevant but has to be added for the process to work.
-            targetDate = datetime(2000, vDate.month, vDate.day)  #this is the visit date from the data
-            startDate = datetime(2000, 4, 15) #start date from the BCS
-            endDate = datetime(2000, 8, 15)  #end date from the BCS
-
-            #if records has not been processed, and visit date falls within date range, and the visit is not PreWNS or error, and is reproductive or a juvenile, and a BCS species
-            if key2 not in cList and (startDate <= targetDate <= endDate) and row[2] not in ("PreWNS", "error") and (row[3] == "Reproducing" or row[10] == "Juvenile" )and row[4] in ('Myotis septentrionalis','Myotis sodalis', 'Myotis lucifugus', 'Perimyotis subflavus', 'Pipistrellus subflavus') and row[11] == 'In Hand' and row[12] == 'Sample Point':
-                
-                if row[4] in PESU:
-                    row_values.append((key, sName, forest, orgC, "Capture", "Maternity", cbPESU, 'PESU', '', exempt, xy))
-                elif row[4] == MYSE:
-                    row_values.append((key, sName, forest, orgC, "Capture", "Maternity", cbMYSE, 'MYSE', '', exempt, xy))
-                elif row[4] == MYSO:
-                    row_values.append((key, sName, forest, orgC, "Capture", "Maternity", cbMYSO, 'MYSO', '', exempt, xy))
-                elif row[4] == MYLU:
-                    row_values.append((key, sName, forest, orgC, "Capture", "Maternity", cbMYLU, 'MYLU', '', exempt, xy))
-                    
-                cList.append(key2)
-    # with the insert cursor loop through the list of row values and add each item as a record in the pt buffer layer            
-    with arcpy.da.InsertCursor('ptBufferFC', ['Site_CN', 'SiteName', 'ForestName', 'OrgCode', 'BufferClass', 'BufferType', 'BufferDistance', 'Species', 'BufferComments', 'Exempt', 'SHAPE@XY']) as cursor:
-                for row in row_values:
-                    cursor.insertRow(row) 
+            if buffer_key(*row) in keys:
+                cursor.deleteRow()
+                deleted += 1
+    return deleted
+
+#Function to run the engine, in worker processes partitioned by org when Worker Processes is more than 1
+def runEngine(sites, captures, currentDate, wns, workers, recorder):
+    from bcs import engine, parallel
+    if workers > 1:
+        arcpy.AddMessage("Running the engine in {} worker processes".format(workers))
+        return parallel.run(sites, captures, currentDate, workers=workers, wns=wns, recorder=recorder)
+    return engine.run(sites, captures, currentDate, wns=wns, recorder=recorder)
 
 ''' End Functions '''
 
 
-''' Start Workflow for Hibernacula '''
-arcpy.AddMessage("Starting thre Hibernacula Data Process")
-
-#Process Hibernacula data to determine visit sequence
-VisitSequence('HibData')
-
-#Process Hibernacula data to determine if sites are historic or not
-HistAct('HibData')
-
-#Process Hibernacula Data to determine PrePostWNSDates
-PrePostWNSDate('HibData',"VISIT_START_DATE")
-
-#Process Hibernacula data individual counts
-haCountIndividuals()
-
-#Process Hibernacula data and load the unique buffers as individual records in the pt Buffer Layer
-ptBufferLayerHib()
-
-''' End Workflow for Hibernacula Data '''
-
-
-''' Start Workflow for Roost Data '''
-arcpy.AddMessage("Starting the Roost Data Process")
-
-#Process the Roost data to determine visit sequence
-VisitSequence('RoostData') #run the function
-
-#Process Roost data to determine if the roosts are historic 
-HistAct('RoostData')
-
-#Process Roost data to determine PrePostWNSDates
-PrePostWNSDate('RoostData',"VISIT_START_DATE")
-
-#Process Roost data to determine if snags are 10 years old or not
-SnagTime()
-
-#Process Roost data individual counts
-roCountIndividuals()
-
-#Process roosts with maternity records in the roost data layer
-maternityRoost()
-
-#Process Roost data and load the unique buffers as individual records in the pt Buffer Layer
-ptBufferLayerRoost()
-
-''' End Workflow for Roost Data'''
-
-
-''' Start Workflow for Capture Data '''
-arcpy.AddMessage("Starting the Capture Data Process")
-
-#Process capture data and determine where the dates fall in regards to the WNS Detection Date table and dictionary.
-#Populate results in the Capture Data layer
-PrePostWNSDate('CaptureData', 'OBS_DATE')
-
-#Process the capture data and load the unique buffers as indivdual records in the pt Buffer Layer
-ptBufferLayerCapture()
-
-''' End Workflor for Capture Data '''
-
-
-''' Start Workflow for Buffer '''
-arcpy.AddMessage("Starting the Buffering Process")
-
-#create the physical buffers from the ptBuffer layer
-arcpy.analysis.Buffer('ptBufferFC', bufferDataExport, 'BufferDistance')
-
-#delete fields created by buffer tool
-arcpy.management.DeleteField(bufferDataExport,['BUFF_DIST','ORIG_FID'])
-
-''' End Workflow for Buffer '''
+#The tool runs in main() so worker processes, which import this script again, do not run it
+def main():
+    #add Arc Message
+    arcpy.AddMessage("Starting the script")
+
+    #Determine Current Date
+    currentDate = datetime.now()
+
+    #Time every stage of the run and count its rows and cursors (the cursor helpers are passed the counting da)
+    recorder = Recorder()
+    da = recorder.cursors(arcpy.da)
+
+    #Species, buffer distances, the WNS detection dates dictionary, and the GIS queries are defined in bcs/constants.py
+    #The WNS detection dates can be replaced by a CSV of BCS Table D-1 (see bcs/wns.py)
+
+
+    ''' Get Data and Make Copies '''
+    #Add Arc Message
+    arcpy.AddMessage("Setting User Inputed Values")
+
+    #Define User User Input Values from ArcPro Python Script tool parameters
+    roostHibDataNRM = arcpy.GetParameterAsText(0) #Roost/Site NRM GI Data Layer
+    captureDataNRM = arcpy.GetParameterAsText(1)  #Capture/Observation NRM GI Data Layer
+    workspace = arcpy.GetParameterAsText(2)       #Set FGDB to output all temp and final data output layers
+    useLegacy = arcpy.GetParameterAsText(3) == "true" #Optional: run the cursor per function workflow instead of the columnar engine
+    wnsTableCSV = arcpy.GetParameterAsText(4)     #Optional: CSV of org codes and WNS detection years (BCS Table D-1)
+    directBuffers = arcpy.GetParameterAsText(5) == "true" #Optional: build the buffer polygons in memory instead of staging ptBufferFC
+    bufferOutput = arcpy.GetParameterAsText(6) or "One Per Buffer" #Optional: One Per Buffer, Deduplicated, Concentric Rings or Dissolved By Class
+    incrementalLayer = arcpy.GetParameterAsText(7) #Optional: buffer layer to patch with only the sites that changed since its last run
+    workers = int(arcpy.GetParameterAsText(8) or 1) #Optional: worker processes for the engine, one partition of orgs (FS_UNIT_ID) each
+
+    #The legacy workflow writes its buffer points to ptBufferFC, so it always uses the staging feature class and one buffer per record
+    if useLegacy and (directBuffers or bufferOutput != "One Per Buffer"):
+        arcpy.AddWarning("The legacy workflow stages one buffer point per record in ptBufferFC; ignoring Build Buffers In Memory and Buffer Output")
+        directBuffers, bufferOutput = False, "One Per Buffer"
+
+    #Incremental runs patch one buffer per record into an existing layer with the engine
+    if incrementalLayer and useLegacy:
+        arcpy.AddWarning("The legacy workflow always rebuilds every site; ignoring Incremental Buffer Layer")
+        incrementalLayer = ""
+    if incrementalLayer and bufferOutput != "One Per Buffer":
+        arcpy.AddWarning("Incremental runs write one buffer per record; ignoring Buffer Output")
+        bufferOutput = "One Per Buffer"
+
+    #Only the engine runs in worker processes
+    if useLegacy and workers > 1:
+        arcpy.AddWarning("The legacy workflow runs in one process; ignoring Worker Processes")
+        workers = 1
+    if workers > 1 and sys.executable.lower().endswith("arcgispro.exe"):
+        #inside ArcGIS Pro the worker processes have to be started with the Pro python, not the application
+        multiprocessing.set_executable(os.path.join(sys.exec_prefix, "python.exe"))
+
+    #Concentric rings are built from the buffer rows, so they are always built in memory
+    if bufferOutput == "Concentric Rings":
+        directBuffers = True
+
+    #Load the WNS detection table
+    if wnsTableCSV:
+        wnsTable = WNSTable.from_csv(wnsTableCSV)
+        arcpy.AddMessage("Loaded {} WNS detection dates from {}".format(len(wnsTable), wnsTableCSV))
+    else:
+        wnsTable = DEFAULT_TABLE
+    #NA orgs were PreWNS in earlier versions of the tool, so say how they are classified now
+    for note in wnsTable.notes():
+        arcpy.AddMessage(note)
+
+    #Set ArcPro Enviromental Settings
+    #Overwite output, add layers to the map, set workspace
+    arcpy.env.overwriteOutput = True
+    arcpy.addOutputsToMap = True
+    arcpy.env.workspace = workspace
+
+    #Add Arc Message
+    arcpy.AddMessage("Defined Workspace = {}".format(arcpy.env.workspace))
+
+    #Export User Inputed Layers to Maintain Integrity of Original Dataset
+    captureDataExport = str(arcpy.env.workspace + "\\captureDataLayer") #create export path
+    rstHibDataExport = str(arcpy.env.workspace + "\\rstHibDataLayer") #create export path
+    bufferDataExport = str(arcpy.env.workspace + "\\BCSBuffers_" + currentDate.strftime("%d%b%Y")) #create export path
+
+    #Incremental runs read the GI layers directly and patch the incremental buffer layer, so nothing is exported
+    recorder.begin("Export")
+    if incrementalLayer:
+        sR = arcpy.Describe(roostHibDataNRM).spatialReference
+    else:
+        arcpy.conversion.ExportFeatures(roostHibDataNRM, rstHibDataExport, pyqrySiteCatBio) #export Roost & Hibernacula Data to new layer
+        arcpy.conversion.ExportFeatures(captureDataNRM, captureDataExport, pyqryCapture)  #export capture data to new layer
+        recorder.add(rows_written=int(arcpy.management.GetCount(rstHibDataExport)[0]) + int(arcpy.management.GetCount(captureDataExport)[0]))
+
+        #Create New Feature Layers from the newly exported data layers (from user inputed GI data)
+        arcpy.management.MakeFeatureLayer(rstHibDataExport,"HibData", pyqryHibernacula) #Hibernacula Layer
+        arcpy.management.MakeFeatureLayer(rstHibDataExport,"RoostData", pyqryRoost) #Roost Layer
+        arcpy.management.MakeFeatureLayer(captureDataExport,"CaptureData") #Capture Layer
+
+        #Create new feature class to store individual lines data to create poly buffers from (not needed when buffers are built in memory)
+        #get the spatial reference from the Hibernacula data layer
+        sR = arcpy.Describe(rstHibDataExport).spatialReference 
+        if not directBuffers:
+            arcpy.management.CreateFeatureclass(arcpy.env.workspace,'ptBufferFC','POINT', spatial_reference=sR)
+    recorder.end()
+
+    ''' End Get Data and Make New Layers ''' 
+
+    ''' Add fields to Feature Layers and Feature Classes'''
+    arcpy.AddMessage("Adding fields to FCs")
+    recorder.begin("AddFields")
+
+    if not incrementalLayer:
+        #Add fields to the exported data layers
+        #Add fields to rstHibDataLayer which replicates to the Hib and Roost Feature Layers
+        arcpy.management.AddFields(rstHibDataExport,[['Historic','TEXT','',10],
+                                            ['VisitNum','TEXT','',5], 
+                                            ['PrePostWNS','TEXT','',10],
+                                            ['haMYSE','DOUBLE'],
+                                            ['haPESU','DOUBLE'],
+                                            ['haMYSO','DOUBLE'],
+                                            ['haMYLU','DOUBLE'],
+                                            ['haCOMB','DOUBLE'],
+                                            ['haBATS','DOUBLE'],
+                                            ['SnagDays','DOUBLE'],
+                                            ['SnagProcess','TEXT', '', 5],
+                                            ['Maternity', 'TEXT', '', 5]
+                                            ])
+
+        #Add field to capture data layer
+        arcpy.management.AddFields(captureDataExport,[['PrePostWNS','TEXT','',10]
+                                            ])
+
+    #Add fiels to the new pt Buffer layer
+    if not directBuffers and not incrementalLayer:
+        arcpy.management.AddFields('ptBufferFC', bufferFieldDefs)
+    recorder.end()
+
+    ''' End Add Fields '''
+
+
+
+    if useLegacy:
+        ''' Start Legacy Workflow '''
+        arcpy.AddMessage("Running the legacy cursor workflow")
+        recorder.begin("Legacy")
+        from bcs import legacy
+
+        #Process the Hibernacula, Roost, and Capture layers function by function into the pt Buffer Layer
+        warnings = legacy.run(arcpy.da, currentDate, wnsTable, recorder)
+        recorder.end()
+
+        ''' End Legacy Workflow '''
+
+    elif incrementalLayer:
+        ''' Start Incremental Workflow '''
+        arcpy.AddMessage("Reading the Site and Capture Data")
+        recorder.begin("Incremental")
+        from bcs import engine, incremental
+
+        #Fingerprint every site from the GI layers and compare with the fingerprints stored by the last run
+        stateTable = catalogPath(incrementalLayer) + "_State"
+        recorder.begin("Read")
+        sites = engine.read_rows(readTable(da, roostHibDataNRM, siteFields, pyqrySiteCatBio), siteFields)
+        captures = engine.read_rows(readTable(da, captureDataNRM, captureFields, pyqryCapture), captureFields)
+        recorder.end()
+        recorder.begin("Fingerprint")
+        fingerprints = incremental.fingerprints(sites, captures, currentDate, wnsTable)
+        patch = arcpy.Exists(incrementalLayer) and arcpy.Exists(stateTable)
+        changed, removed = incremental.compare(readState(da, stateTable) if patch else {}, fingerprints)
+        recorder.end()
+        arcpy.AddMessage("{} of {} sites changed and {} were removed since the last run".format(len(changed), len(fingerprints), len(removed)))
+
+        #Classify and buffer only the changed sites, then replace their buffers in the incremental buffer layer
+        changedSites, changedCaptures = incremental.select(sites, captures, changed)
+        result = runEngine(changedSites, changedCaptures, currentDate, wnsTable, workers, recorder)
+        recorder.begin("Patch")
+        if patch:
+            deleted = deleteBuffers(da, incrementalLayer, changed | removed)
+            arcpy.AddMessage("Replacing {} buffers with {}".format(deleted, len(result.buffer_rows)))
+        writeBufferPolygons(da, incrementalLayer, result.buffer_rows, sR, create=not patch)
+        writeState(da, stateTable, fingerprints)
+        recorder.end()
+        warnings = result.warnings
+        recorder.end()
+
+        ''' End Incremental Workflow '''
+
+    else:
+        ''' Start Columnar Engine Workflow '''
+        arcpy.AddMessage("Reading the Site and Capture Data")
+        recorder.begin("Engine")
+        from bcs import engine
+
+        #Read the exported site and capture data once, then classify and build the buffer rows
+        recorder.begin("Read")
+        sites, captures = readTable(da, rstHibDataExport, siteFields), readTable(da, captureDataExport, captureFields)
+        recorder.end()
+        result = runEngine(sites, captures, currentDate, wnsTable, workers, recorder)
+
+        #write the derived fields back to the exported data and load the buffer rows in the pt Buffer Layer
+        arcpy.AddMessage("Writing derived fields and pt Buffer records")
+        recorder.begin("Write")
+        siteValues = engine.derived_values(result.hibernacula, siteDerivedFields)
+        siteValues.update(engine.derived_values(result.roosts, siteDerivedFields))
+        writeValues(da, rstHibDataExport, siteDerivedFields, siteValues)
+        writeValues(da, captureDataExport, captureDerivedFields, engine.derived_values(result.captures, captureDerivedFields))
+
+        #merge buffers with the same point and distance (species etc. are kept as merged attributes), dissolving merges them by class instead
+        bufferRows = result.buffer_rows
+        if bufferOutput in ("Deduplicated", "Concentric Rings"):
+            bufferRows = merge_buffer_rows(bufferRows)
+            arcpy.AddMessage("Merged {} buffers into {} with distinct point and distance".format(len(result.buffer_rows), len(bufferRows)))
+        if not directBuffers:
+            insertBufferRows(da, bufferRows)
+        recorder.end()
+        warnings = result.warnings
+        recorder.end()
+
+        ''' End Columnar Engine Workflow '''
+
+    #Report GI dates that could not be parsed and were left out of the date rules
+    for warning in warnings:
+        arcpy.AddWarning(warning)
+
+
+    ''' Start Workflow for Buffer '''
+    arcpy.AddMessage("Starting the Buffering Process")
+    recorder.begin("Buffer")
+
+    #Incremental runs have already patched their buffer layer
+    if not incrementalLayer:
+        #buffers to be dissolved by class are built in the memory workspace first
+        bufferTarget = "memory\\BCSBuffers" if bufferOutput == "Dissolved By Class" else bufferDataExport
+
+        if directBuffers:
+            #build the physical buffers from the buffer rows in memory
+            writeBufferPolygons(da, bufferTarget, bufferRows, sR, rings=bufferOutput == "Concentric Rings")
+        else:
+            #create the physical buffers from the ptBuffer layer
+            arcpy.analysis.Buffer('ptBufferFC', bufferTarget, 'BufferDistance')
+
+            #delete fields created by buffer tool
+            arcpy.management.DeleteField(bufferTarget,['BUFF_DIST','ORIG_FID'])
+
+        #one multipart polygon per buffer class, type and distance with the number of buffers dissolved into it
+        if bufferOutput == "Dissolved By Class":
+            arcpy.analysis.PairwiseDissolve(bufferTarget, bufferDataExport, ["BufferClass", "BufferType", "BufferDistance"],
+                                            [["Site_CN", "COUNT"]], "MULTI_PART")
+        recorder.add(rows_written=int(arcpy.management.GetCount(bufferDataExport)[0]))
+    recorder.end()
+
+    ''' End Workflow for Buffer '''
+
+    #Write the run report (JSON and CSV) next to the output FGDB and summarize it in the messages
+    recorder.end_all()
+    reportFolder = os.path.dirname(workspace) if workspace.lower().endswith(".gdb") else workspace
+    reportPaths = recorder.write(reportFolder, "BCSBuffering_Report_" + currentDate.strftime("%Y%m%d_%H%M%S"),
+                                 {"sites": roostHibDataNRM, "captures": captureDataNRM, "workspace": workspace,
+                                  "useLegacy": useLegacy, "wnsTable": wnsTableCSV, "directBuffers": directBuffers,
+                                  "bufferOutput": bufferOutput, "incrementalLayer": incrementalLayer, "workers": workers})
+    for line in recorder.summary():
+        arcpy.AddMessage(line)
+    arcpy.AddMessage("Run report written to {}".format(" and ".join(reportPaths)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+'''
+Clips for ProjectClipReprojectTool_ArcGIS_PRO.pyt, including the worker process side of its pipelined mode.
+
+A .pyt cannot be imported by a worker process, so the clip run in the workers lives here, next to the toolbox.
+Each worker clips whole layers (their data source and definition query) to the boundary into its own scratch
+geodatabase under unique names; the toolbox process is the only one that writes to the output geodatabase and
+folders.  candidate_count and clip are also used by the toolbox for the layers it clips itself.
+'''
+
+import os
+import time
+
+import arcpy
+
+
+def candidate_count(layer, polygon):
+    """The number of features of a layer whose envelopes intersect polygon, the boundary extent projected to the
+    layer's spatial reference.  This is a separate pass over the data source that reads only object IDs; it counts
+    the candidates a clip limited to the boundary extent has to fetch, not what the clip itself read."""
+    with arcpy.da.SearchCursor(layer, ["OID@"], spatial_filter=polygon, spatial_relationship="ENVELOPE_INTERSECTS") as rows:
+        return sum(1 for row in rows)
+
+
+def clip(layer, boundary, extent, out_fc):
+    """Clips layer to boundary with the processing extent set to the boundary's extent, so only candidate features
+    are fetched from the data source."""
+    env_extent = arcpy.env.extent
+    arcpy.env.extent = extent
+    try:
+        return arcpy.Clip_analysis(layer, boundary, out_fc)[0]
+    finally:
+        arcpy.env.extent = env_extent
+
+
+def clip_layer(task):
+    """Clips one layer's data source, filtered by its definition query, to the boundary feature class in this
+    worker's scratch geodatabase.  task is (index, data source, definition query, boundary, scratch folder, count
+    candidates).  Returns (index, clipped feature class, candidate features or None when they are not counted,
+    feature count, seconds)."""
+    index, data_source, definition_query, boundary, scratch_folder, count_candidates = task
+    start = time.perf_counter()
+    arcpy.env.overwriteOutput = True
+    scratch_gdb = os.path.join(scratch_folder, "clip_{}.gdb".format(os.getpid()))
+    if not arcpy.Exists(scratch_gdb):
+        arcpy.CreateFileGDB_management(scratch_folder, os.path.basename(scratch_gdb))
+
+    layer = arcpy.MakeFeatureLayer_management(data_source, "layer_{}".format(index), definition_query or None)[0]
+    extent = arcpy.Describe(boundary).extent
+    candidates = None
+    if count_candidates:
+        candidates = candidate_count(layer, extent.polygon.projectAs(arcpy.Describe(layer).spatialReference))
+    clipped = clip(layer, boundary, extent, os.path.join(scratch_gdb, "clip_{}".format(index)))
+    arcpy.Delete_management(layer)
+    return index, clipped, candidates, int(arcpy.GetCount_management(clipped)[0]), time.perf_counter() - start
@@ -1,16 +1,565 @@
 import arcpy
+import csv
+import glob
+import json
+import multiprocessing
 import os
 import re
-from openpyxl import Workbook
+import shutil
+import sys
+import tempfile
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+CLIP_MODES = ("Per Sale", "Batch")
+ATTRIBUTIONS = ("Intersect", "Calculate Field", "Update Cursor")
+DEFAULT_ATTRIBUTION = "Intersect"
 
 def sanitize_name(value):
     return re.sub(r"[^a-zA-Z0-9_]", "_", str(value))[:50]
 
+class ExtentIndex:
+    """Static R-tree over (xmin, ymin, xmax, ymax) extents, packed sort-tile-recursive."""
+
+    def __init__(self, items, node_size=16):
+        # items are (key, extent) pairs; nodes are (extent, key, children) with children None for leaves
+        level = [(tuple(extent), key, None) for key, extent in items]
+        while len(level) > node_size:
+            level = self._pack(level, node_size)
+        self._root = (self._union([node[0] for node in level]), None, level) if level else None
+
+    @staticmethod
+    def _union(extents):
+        return (min(e[0] for e in extents), min(e[1] for e in extents), max(e[2] for e in extents), max(e[3] for e in extents))
+
+    @classmethod
+    def _pack(cls, nodes, node_size):
+        # sort by x center into vertical slices, then by y center into nodes of node_size
+        parents = []
+        node_count = -(-len(nodes) // node_size)
+        slice_size = node_size * max(1, int(round(node_count ** 0.5)))
+        nodes = sorted(nodes, key=lambda node: node[0][0] + node[0][2])
+        for start in range(0, len(nodes), slice_size):
+            column = sorted(nodes[start:start + slice_size], key=lambda node: node[0][1] + node[0][3])
+            for chunk_start in range(0, len(column), node_size):
+                chunk = column[chunk_start:chunk_start + node_size]
+                parents.append((cls._union([node[0] for node in chunk]), None, chunk))
+        return parents
+
+    def query(self, extent):
+        """Keys of the items whose extents intersect extent (touching counts)."""
+        xmin, ymin, xmax, ymax = extent
+        keys = []
+        stack = [self._root] if self._root else []
+        while stack:
+            box, key, children = stack.pop()
+            if box[0] > xmax or box[2] < xmin or box[1] > ymax or box[3] < ymin:
+                continue
+            if children is None:
+                keys.append(key)
+            else:
+                stack.extend(children)
+        return keys
+
+def read_sales(timber_sale_fc, match_field):
+    # {sale_id: polygon} with the polygons of each sale unioned, in the order each sale first appears
+    sales = {}
+    with arcpy.da.SearchCursor(timber_sale_fc, [match_field, "SHAPE@"]) as cursor:
+        for sale_id, polygon in cursor:
+            if sale_id is None:
+                continue
+            if sale_id not in sales:
+                sales[sale_id] = polygon
+            elif polygon is not None:
+                sales[sale_id] = polygon if sales[sale_id] is None else sales[sale_id].union(polygon)
+    return sales
+
+def extent_of(extent):
+    return (extent.XMin, extent.YMin, extent.XMax, extent.YMax)
+
+def dissolved_sales(timber_sale_fc, match_field, sale_ids, name="timber_sales"):
+    # memory feature class of one dissolved polygon per sale with its id as text in match_field, which is what the
+    # per sale clips write to it.  Returns (path, {sale_id: OID}, {sale_id: polygon}); sales without polygons are left out
+    polygons = read_sales(timber_sale_fc, match_field)
+    sales_fc = os.path.join("memory", name)
+    arcpy.CreateFeatureclass_management("memory", name, "POLYGON", spatial_reference=arcpy.Describe(timber_sale_fc).spatialReference)
+    arcpy.AddField_management(sales_fc, match_field, "TEXT")
+    sale_oids = {}
+    with arcpy.da.InsertCursor(sales_fc, [match_field, "SHAPE@"]) as cursor:
+        for sale_id in sale_ids:
+            if polygons.get(sale_id) is not None:
+                sale_oids[sale_id] = cursor.insertRow([str(sale_id), polygons[sale_id]])
+    return sales_fc, sale_oids, polygons
+
+def attribute_sale(out_path, match_field, sale_id, attribution):
+    # writes sale_id to every row of a clipped output, with one Calculate Field or (as it always was) an Update Cursor
+    if attribution == "Update Cursor":
+        if match_field not in [f.name for f in arcpy.ListFields(out_path)]:
+            arcpy.AddField_management(out_path, match_field, "TEXT")
+
+        with arcpy.da.UpdateCursor(out_path, [match_field]) as cursor:
+            for row in cursor:
+                row[0] = sale_id
+                cursor.updateRow(row)
+    else:
+        arcpy.CalculateField_management(out_path, match_field, repr(sale_id), "PYTHON3", field_type="TEXT")
+
+# One finished (sale, feature class) pair.  out_path is None when nothing intersected; input_count is the number of
+# input features that intersect the sale and output_bytes the size of the output's table files
+ClipResult = namedtuple("ClipResult", ["input_fc", "out_path", "attribution", "clip_seconds", "attribute_seconds",
+                                       "input_count", "output_count", "output_bytes"])
+
+# files of one file geodatabase table, a<table id in hex> plus these extensions
+TABLE_FILES = (".gdbtable", ".gdbtablx", ".gdbindexes", ".freelist", ".spx", ".horizon")
+
+def table_bytes(output_workspace, out_path):
+    # size of a feature class in a file geodatabase: only the files of its own table (named from its DSID), so the
+    # rest of the geodatabase is never listed
+    stem = os.path.join(output_workspace, "a{:08x}".format(arcpy.Describe(out_path).DSID))
+    return sum(os.path.getsize(stem + ext) for ext in TABLE_FILES if os.path.exists(stem + ext))
+
+def source_state(path):
+    # cheap fingerprint of a feature class that reads none of its rows: the modification time of its own files (the
+    # table files named from its DSID in a file geodatabase, or the files of a shapefile) with its feature count and
+    # extent.  Enterprise geodatabases have no files to look at, so only the count and extent are compared there
+    described = arcpy.Describe(path)
+    catalog_path = described.catalogPath
+    workspace = os.path.dirname(catalog_path)
+    if not workspace.lower().endswith(".gdb"):
+        workspace = os.path.dirname(workspace)  # in a feature dataset
+    if workspace.lower().endswith(".gdb"):
+        stem = os.path.join(workspace, "a{:08x}".format(described.DSID))
+        files = [stem + ext for ext in TABLE_FILES if os.path.exists(stem + ext)]
+    else:
+        files = [f for f in glob.glob(glob.escape(os.path.splitext(catalog_path)[0]) + ".*") if not f.lower().endswith(".lock")]
+    if not files and os.path.exists(catalog_path):
+        files = [catalog_path]
+    modified = max(os.path.getmtime(f) for f in files) if files else None
+    count = int(arcpy.GetCount_management(path)[0])
+    return "{}/{}/{}".format(modified, count, ",".join(repr(value) for value in extent_of(described.extent)))
+
+class Checkpoints:
+    """Journal of the finished (sale, feature class) pairs of an output geodatabase, so a run that dies can be run
+    again and only clip what is missing.
+
+    Every pair is appended to the journal as a JSON line as soon as it finishes, with its ClipResult and the
+    fingerprint of its inputs: the source_state of the input feature class and of the timber sale feature class.
+    A pair is skipped when its journal line has the same fingerprint and its output is still in the output
+    geodatabase with the same feature count.  close() rewrites the journal with only the latest line of each pair.
+    """
+
+    def __init__(self, path, output_workspace, input_fc_workspace, timber_sale_fc):
+        self.path = path
+        self.output_workspace = os.path.normcase(os.path.abspath(output_workspace))
+        self.input_fc_workspace = input_fc_workspace
+        self.timber_sale_fc = timber_sale_fc
+        self.fc_states = {}
+        self.sale_state = None
+
+        self.records = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # the last line of a run that died while writing it
+                    self.records[(str(record["sale_id"]), record["input_fc"])] = record
+        self._file = open(path, "a")
+        self._done = {}
+
+    def fingerprint(self, input_fc):
+        if input_fc not in self.fc_states:
+            self.fc_states[input_fc] = source_state(os.path.join(self.input_fc_workspace, input_fc))
+        if self.sale_state is None:
+            self.sale_state = source_state(self.timber_sale_fc)
+        return f"{self.fc_states[input_fc]}|{self.sale_state}"
+
+    def done(self, sale_id, input_fc):
+        # the ClipResult of a pair from the journal, or None when it has to be clipped.  Checked once per run
+        key = (str(sale_id), input_fc)
+        if key not in self._done:
+            self._done[key] = self._check(sale_id, input_fc)
+        return self._done[key]
+
+    def _check(self, sale_id, input_fc):
+        record = self.records.get((str(sale_id), input_fc))
+        if record is None or record["fingerprint"] != self.fingerprint(input_fc):
+            return None
+        out_path = record["out_path"]
+        if out_path is not None:
+            if not os.path.normcase(os.path.abspath(out_path)).startswith(self.output_workspace + os.sep) or not arcpy.Exists(out_path):
+                return None
+            if int(arcpy.GetCount_management(out_path)[0]) != record.get("output_count"):
+                return None
+        return ClipResult(*[record.get(field) for field in ClipResult._fields])
+
+    def finish(self, sale_id, result):
+        # journals a finished pair and flushes it to disk, so it survives the run dying right after
+        record = dict(result._asdict(), sale_id=sale_id, fingerprint=self.fingerprint(result.input_fc),
+                      finished=datetime.now().isoformat(timespec="seconds"))
+        self.records[(str(sale_id), result.input_fc)] = record
+        self._file.write(json.dumps(record, default=str) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        # compacts the journal to the latest line of each pair, through a temporary file so it is never half written
+        self._file.close()
+        compact_path = self.path + ".tmp"
+        with open(compact_path, "w") as f:
+            for record in self.records.values():
+                f.write(json.dumps(record, default=str) + "\n")
+        os.replace(compact_path, self.path)
+
+class ClipLog:
+    """Clip log written as the clips finish, which never keeps the entries in memory.
+
+    An .xlsx path is written with openpyxl in write-only (streaming) mode, with a Clip Log sheet of one row per
+    output, a Warnings sheet of the skipped (sale, feature class) pairs and sales without polygons, and an
+    Attribution Timing sheet of totals per attribution.  The workbook is only saved by close(), so it is lost when a
+    run dies.  A .csv path is written as three CSV files, <name>.csv, <name>_warnings.csv and <name>_timing.csv,
+    flushed after every row, so they hold everything done so far even when a run dies, and needs no openpyxl.
+    """
+
+    def __init__(self, path, match_field):
+        self.path = path
+        self.entries = 0
+        self.totals = {}
+        if path.lower().endswith(".csv"):
+            base = os.path.splitext(path)[0]
+            self.paths = [path, base + "_warnings.csv", base + "_timing.csv"]
+            self._files = [open(sheet_path, "w", newline="") for sheet_path in self.paths]
+            self._sheets = [csv.writer(f).writerow for f in self._files]
+            self._workbook = None
+        else:
+            from openpyxl import Workbook
+            self.paths = [path]
+            self._files = []
+            self._workbook = Workbook(write_only=True)
+            self._sheets = [self._workbook.create_sheet(title).append for title in ("Clip Log", "Warnings", "Attribution Timing")]
+        self._append(0, ["OutputFeatureClassPath", match_field, "Attribution", "ClipSeconds", "AttributionSeconds",
+                         "InputFeatureClass", "InputFeatures", "OutputFeatures", "OutputBytes"])
+        self._append(1, [match_field, "InputFeatureClass", "Warning"])
+        self._append(2, ["Attribution", "Outputs", "ClipSeconds", "AttributionSeconds", "TotalSeconds", "OutputFeatures", "OutputBytes"])
+
+    def _append(self, sheet, row):
+        self._sheets[sheet](row)
+        if self._files:
+            self._files[sheet].flush()
+
+    def add(self, sale_id, result):
+        self.entries += 1
+        self._append(0, [result.out_path, sale_id, result.attribution, round(result.clip_seconds, 3), round(result.attribute_seconds, 3),
+                         result.input_fc, result.input_count, result.output_count, result.output_bytes])
+        totals = self.totals.setdefault(result.attribution, [0, 0.0, 0.0, 0, 0])
+        for i, value in enumerate((1, result.clip_seconds, result.attribute_seconds, result.output_count or 0, result.output_bytes or 0)):
+            totals[i] += value
+
+    def warning(self, sale_id, input_fc, message):
+        self._append(1, [sale_id, input_fc, message])
+
+    def close(self):
+        # writes the timing totals and closes the log.  Returns False (and removes it) when nothing was clipped
+        for method in ATTRIBUTIONS:
+            if method in self.totals:
+                outputs, clip_seconds, attribute_seconds, features, size = self.totals[method]
+                self._append(2, [method, outputs, round(clip_seconds, 3), round(attribute_seconds, 3),
+                                 round(clip_seconds + attribute_seconds, 3), features, size])
+        for f in self._files:
+            f.close()
+        if self._workbook is not None and self.entries:
+            self._workbook.save(self.path)
+        if not self.entries:
+            for sheet_path in self.paths:
+                if os.path.exists(sheet_path):
+                    os.remove(sheet_path)
+        return bool(self.entries)
+
+def report(sale_id, result, clip_log):
+    # message and log row of one finished pair
+    if result.out_path is None:
+        message = f"No intersecting features in {result.input_fc} for {sale_id}"
+        arcpy.AddWarning(message)
+        if clip_log is not None:
+            clip_log.warning(sale_id, result.input_fc, message)
+        return
+    arcpy.AddMessage(f"Clipped {result.input_fc} to {sale_id} -> {result.out_path}")
+    if clip_log is not None:
+        clip_log.add(sale_id, result)
+
+def no_polygons(sale_id, clip_log):
+    message = f"No polygons found for Sale Name: {sale_id}"
+    arcpy.AddWarning(message)
+    if clip_log is not None:
+        clip_log.warning(sale_id, None, message)
+
+def resume(checkpoints, sale_id, input_feature_classes):
+    # ({input_fc: journaled ClipResult} of the pairs of a sale that are still valid, the feature classes left to clip)
+    done = {}
+    if checkpoints is not None:
+        for input_fc in input_feature_classes:
+            result = checkpoints.done(sale_id, input_fc)
+            if result is not None:
+                done[input_fc] = result
+    return done, [input_fc for input_fc in input_feature_classes if input_fc not in done]
+
+def clip_sale(input_fc_workspace, input_feature_classes, sales_fc, output_workspace, match_field, sale_id, attribution=DEFAULT_ATTRIBUTION, suffix="", finished=None):
+    # Clips every input feature class to one sale into output_workspace/Sale_<id>.  With the Intersect attribution
+    # sales_fc has to be the dissolved_sales feature class, so the sale_name of its one polygon is carried into the
+    # output by a Pairwise Intersect and the output is written once; inputs that have their own sale_name field are
+    # clipped and calculated instead.  Returns a ClipResult per feature class, or None when the sale has no
+    # polygons, instead of messaging, so it can run in a worker process; finished is called with each result as it
+    # is done.  suffix keeps the layer names of each process apart
+    sale_layer, input_layer = "sale_layer" + suffix, "input_layer" + suffix
+    results = []
+    safe_id = sanitize_name(sale_id)
+    query_value = str(sale_id).replace("'", "''")
+    sale_query = f"{arcpy.AddFieldDelimiters('', match_field)} = '{query_value}'"
+    arcpy.MakeFeatureLayer_management(sales_fc, sale_layer, sale_query)
+
+    if int(arcpy.GetCount_management(sale_layer)[0]) == 0:
+        return None
+
+    group_path = os.path.join(output_workspace, f"Sale_{safe_id}")
+    if not arcpy.Exists(group_path):
+        arcpy.CreateFeatureDataset_management(output_workspace, f"Sale_{safe_id}", arcpy.Describe(sales_fc).spatialReference)
+
+    for input_fc in input_feature_classes:
+        input_fc_path = os.path.join(input_fc_workspace, input_fc)
+        arcpy.MakeFeatureLayer_management(input_fc_path, input_layer)
+
+        arcpy.SelectLayerByLocation_management(input_layer, "INTERSECT", sale_layer)
+
+        input_count = int(arcpy.GetCount_management(input_layer)[0])
+        if input_count == 0:
+            result = ClipResult(input_fc, None, attribution, 0.0, 0.0, 0, 0, 0)
+        else:
+            out_name = f"{os.path.splitext(input_fc)[0]}_{safe_id}_clip".replace(" ", "_")
+            out_path = os.path.join(group_path, out_name)
+
+            method = attribution
+            if method == "Intersect" and match_field in [f.name for f in arcpy.ListFields(input_fc_path)]:
+                method = "Calculate Field"
+
+            start = time.perf_counter()
+            if method == "Intersect":
+                arcpy.PairwiseIntersect_analysis([input_layer, sale_layer], out_path, "NO_FID")
+                clip_seconds, attribute_seconds = time.perf_counter() - start, 0.0
+            else:
+                arcpy.Clip_analysis(input_layer, sale_layer, out_path)
+                clip_seconds = time.perf_counter() - start
+                attribute_sale(out_path, match_field, sale_id, method)
+                attribute_seconds = time.perf_counter() - start - clip_seconds
+            result = ClipResult(input_fc, out_path, method, clip_seconds, attribute_seconds, input_count,
+                                int(arcpy.GetCount_management(out_path)[0]), table_bytes(output_workspace, out_path))
+
+        results.append(result)
+        if finished is not None:
+            finished(result)
+
+    arcpy.Delete_management(input_layer)
+    arcpy.Delete_management(sale_layer)
+    return results
+
+def clip_per_sale(input_fc_workspace, input_feature_classes, timber_sale_fc, output_workspace, match_field, sale_ids, attribution=DEFAULT_ATTRIBUTION, checkpoints=None, clip_log=None):
+    # Returns [(sale_id, ClipResult)] of every pair, in sale by feature class order
+    finished_pairs = []
+    sales_fc = dissolved_sales(timber_sale_fc, match_field, sale_ids)[0] if attribution == "Intersect" else timber_sale_fc
+
+    def finished(sale_id, result):
+        if checkpoints is not None and result.input_fc not in done:
+            checkpoints.finish(sale_id, result)
+        report(sale_id, result, clip_log)
+        finished_pairs.append((sale_id, result))
+
+    for sale_id in sale_ids:
+        done, todo = resume(checkpoints, sale_id, input_feature_classes)
+        for input_fc in input_feature_classes:
+            if input_fc in done:
+                finished(sale_id, done[input_fc])
+        if todo:
+            results = clip_sale(input_fc_workspace, todo, sales_fc, output_workspace, match_field, sale_id, attribution,
+                                finished=lambda result: finished(sale_id, result))
+            if results is None:
+                no_polygons(sale_id, clip_log)
+
+    if sales_fc != timber_sale_fc:
+        arcpy.Delete_management(sales_fc)
+    return finished_pairs
+
+def clip_sales_worker(task):
+    # Runs in a worker process: clips a batch of [(sale_id, input feature classes)] into the worker's own scratch
+    # geodatabase, so the output geodatabase is only written by the main process.  Returns [(sale_id, results)]
+    input_fc_workspace, timber_sale_fc, match_field, sales, attribution, scratch_folder, number = task
+    arcpy.env.overwriteOutput = True
+    scratch_gdb = arcpy.CreateFileGDB_management(scratch_folder, f"clip_{number}.gdb")[0]
+    sale_ids = [sale_id for sale_id, input_feature_classes in sales]
+    sales_fc = dissolved_sales(timber_sale_fc, match_field, sale_ids)[0] if attribution == "Intersect" else timber_sale_fc
+    return [(sale_id, clip_sale(input_fc_workspace, input_feature_classes, sales_fc, scratch_gdb, match_field, sale_id, attribution, f"_{number}"))
+            for sale_id, input_feature_classes in sales]
+
+def clip_parallel(input_fc_workspace, input_feature_classes, timber_sale_fc, output_workspace, match_field, sale_ids, workers, attribution=DEFAULT_ATTRIBUTION, checkpoints=None, clip_log=None):
+    # Sales are independent, so they are dealt out in about two batches per worker and clipped in a process pool.
+    # As each batch finishes its outputs are copied from the worker's scratch geodatabase into the Sale_<id>
+    # datasets here, the only process that writes to the output geodatabase (and the journal and log).  Returns
+    # [(sale_id, ClipResult)] of every pair, in the order they finished
+    if sys.executable.lower().endswith("arcgispro.exe"):
+        # inside ArcGIS Pro the worker processes have to be started with the Pro python, not the application
+        multiprocessing.set_executable(os.path.join(sys.exec_prefix, "python.exe"))
+
+    finished_pairs, sales = [], []
+    for sale_id in sale_ids:
+        done, todo = resume(checkpoints, sale_id, input_feature_classes)
+        for input_fc in input_feature_classes:
+            if input_fc in done:
+                report(sale_id, done[input_fc], clip_log)
+                finished_pairs.append((sale_id, done[input_fc]))
+        if todo:
+            sales.append((sale_id, todo))
+
+    count = max(1, min(len(sales), workers * 2))
+    scratch_folder = tempfile.mkdtemp(prefix="timber_clip_")
+    tasks = [(input_fc_workspace, timber_sale_fc, match_field, sales[number::count], attribution, scratch_folder, number)
+             for number in range(count)]
+    sale_sr = arcpy.Describe(timber_sale_fc).spatialReference
+    try:
+        with ProcessPoolExecutor(workers) as pool:
+            for future in as_completed([pool.submit(clip_sales_worker, task) for task in tasks if task[3]]):
+                for sale_id, results in future.result():
+                    if results is None:
+                        no_polygons(sale_id, clip_log)
+                        continue
+
+                    safe_id = sanitize_name(sale_id)
+                    group_path = os.path.join(output_workspace, f"Sale_{safe_id}")
+                    if not arcpy.Exists(group_path):
+                        arcpy.CreateFeatureDataset_management(output_workspace, f"Sale_{safe_id}", sale_sr)
+                    for result in results:
+                        if result.out_path is not None:
+                            out_path = os.path.join(group_path, os.path.basename(result.out_path))
+                            arcpy.ExportFeatures_conversion(result.out_path, out_path)
+                            result = result._replace(out_path=out_path, output_bytes=table_bytes(output_workspace, out_path))
+                        if checkpoints is not None:
+                            checkpoints.finish(sale_id, result)
+                        report(sale_id, result, clip_log)
+                        finished_pairs.append((sale_id, result))
+    finally:
+        shutil.rmtree(scratch_folder, ignore_errors=True)
+
+    return finished_pairs
+
+def clip_batch(input_fc_workspace, input_feature_classes, timber_sale_fc, output_workspace, match_field, sale_ids, checkpoints=None, clip_log=None):
+    # One Pairwise Intersect per input feature class against all the sales its extent can reach (from an R-tree of
+    # the sale extents) that are not already done, split into the same Sale_<id> outputs and sale_name values as
+    # clip_per_sale.  Returns [(sale_id, ClipResult)] of every pair, in feature class by sale order
+    sale_sr = arcpy.Describe(timber_sale_fc).spatialReference
+    sales_fc, sale_oids, polygons = dissolved_sales(timber_sale_fc, match_field, sale_ids)
+    for sale_id in sale_ids:
+        if sale_id not in sale_oids:
+            no_polygons(sale_id, clip_log)
+    sale_ids = [sale_id for sale_id in sale_ids if sale_id in sale_oids]
+    index = ExtentIndex((sale_id, extent_of(polygons[sale_id].extent)) for sale_id in sale_ids)
+    sale_oid_field = arcpy.AddFieldDelimiters(sales_fc, arcpy.Describe(sales_fc).OIDFieldName)
+
+    group_paths = {}
+    finished_pairs = []
+    for input_fc in input_feature_classes:
+        input_fc_path = os.path.join(input_fc_workspace, input_fc)
+        todo = []
+        for sale_id in sale_ids:
+            done = checkpoints.done(sale_id, input_fc) if checkpoints is not None else None
+            if done is None:
+                todo.append(sale_id)
+            else:
+                report(sale_id, done, clip_log)
+                finished_pairs.append((sale_id, done))
+        if not todo:
+            continue
+
+        described = arcpy.Describe(input_fc_path)
+        extent = described.extent
+        if described.spatialReference.name != sale_sr.name:
+            extent = extent.projectAs(sale_sr)
+        candidates = set(index.query(extent_of(extent))).intersection(todo)
+
+        counts, inputs = {}, {}
+        intersect_fc = os.path.join("memory", "timber_intersect")
+        start = time.perf_counter()
+        if candidates:
+            oids = ",".join(str(sale_oids[sale_id]) for sale_id in todo if sale_id in candidates)
+            input_fields = [f.name for f in arcpy.ListFields(input_fc_path)]
+            arcpy.MakeFeatureLayer_management(sales_fc, "batch_sale_layer", f"{sale_oid_field} IN ({oids})")
+            arcpy.PairwiseIntersect_analysis([input_fc_path, "batch_sale_layer"], intersect_fc, "ALL")
+
+            # the FID_<input name> field counts the input features of each sale, then the FID_ fields are dropped.
+            # When the input's FID_ field is named otherwise, it is the one FID_ field that is not the sales layer's;
+            # failing that, output rows are counted (OID@) as the input features
+            intersect_fields = [f.name for f in arcpy.ListFields(intersect_fc)]
+            fid_fields = [f for f in intersect_fields if f.startswith("FID_") and f not in input_fields]
+            input_fid_field = next((f for f in fid_fields if f.lower() == f"fid_{described.baseName}".lower()), None)
+            if input_fid_field is None:
+                sale_fid_fields = {f"fid_{arcpy.Describe(sales_fc).baseName}".lower(), "fid_batch_sale_layer"}
+                other_fid_fields = [f for f in fid_fields if f.lower() not in sale_fid_fields]
+                input_fid_field = other_fid_fields[0] if len(other_fid_fields) == 1 else "OID@"
+
+            # the sale id lands in match_field, or match_field_1 when the input has its own match_field
+            sale_field = match_field
+            if match_field in input_fields:
+                sale_field = [f for f in intersect_fields if f.startswith(match_field + "_")][-1]
+
+            with arcpy.da.SearchCursor(intersect_fc, [sale_field, input_fid_field]) as cursor:
+                for value, fid in cursor:
+                    counts[value] = counts.get(value, 0) + 1
+                    inputs.setdefault(value, set()).add(fid)
+
+            if sale_field != match_field:
+                arcpy.CalculateField_management(intersect_fc, match_field, f"!{sale_field}!")
+            arcpy.DeleteField_management(intersect_fc, fid_fields + ([sale_field] if sale_field != match_field else []))
+        # the one intersect is shared by the outputs of the feature class
+        intersect_seconds = (time.perf_counter() - start) / max(1, sum(1 for sale_id in todo if counts.get(str(sale_id))))
+
+        for sale_id in todo:
+            if not counts.get(str(sale_id)):
+                result = ClipResult(input_fc, None, "Intersect", 0.0, 0.0, 0, 0, 0)
+            else:
+                safe_id = sanitize_name(sale_id)
+                group_path = os.path.join(output_workspace, f"Sale_{safe_id}")
+                if sale_id not in group_paths:
+                    if not arcpy.Exists(group_path):
+                        arcpy.CreateFeatureDataset_management(output_workspace, f"Sale_{safe_id}", sale_sr)
+                    group_paths[sale_id] = group_path
+
+                out_name = f"{os.path.splitext(input_fc)[0]}_{safe_id}_clip".replace(" ", "_")
+                out_path = os.path.join(group_path, out_name)
+                query_value = str(sale_id).replace("'", "''")
+                start = time.perf_counter()
+                arcpy.ExportFeatures_conversion(intersect_fc, out_path, f"{arcpy.AddFieldDelimiters(intersect_fc, match_field)} = '{query_value}'")
+                result = ClipResult(input_fc, out_path, "Intersect", intersect_seconds + time.perf_counter() - start, 0.0,
+                                    len(inputs[str(sale_id)]), counts[str(sale_id)], table_bytes(output_workspace, out_path))
+
+            if checkpoints is not None:
+                checkpoints.finish(sale_id, result)
+            report(sale_id, result, clip_log)
+            finished_pairs.append((sale_id, result))
+
+        if candidates:
+            arcpy.Delete_management(intersect_fc)
+
+    arcpy.Delete_management(sales_fc)
+    return finished_pairs
+
 def main():
     input_fc_workspace = arcpy.GetParameterAsText(0)
     timber_sale_fc = arcpy.GetParameterAsText(1)
     output_workspace = arcpy.GetParameterAsText(2)
-    output_log_xlsx = arcpy.GetParameterAsText(3)
+    output_log = arcpy.GetParameterAsText(3)
+    clip_mode = arcpy.GetParameterAsText(4) or "Per Sale"
+    workers = int(arcpy.GetParameterAsText(5) or 1)
+    attribution = arcpy.GetParameterAsText(6) or DEFAULT_ATTRIBUTION
+    journal_path = arcpy.GetParameterAsText(7)
     match_field = "sale_name"
 
     arcpy.env.workspace = input_fc_workspace
@@ -20,69 +569,60 @@ def main():
         arcpy.AddError("Output workspace must exist and be a File Geodatabase (.gdb)")
         return
 
-    input_feature_classes = arcpy.ListFeatureClasses()
-    if not input_feature_classes:
-        arcpy.AddError("No input feature classes found.")
+    if clip_mode not in CLIP_MODES:
+        arcpy.AddError(f"Clip mode must be one of: {', '.join(CLIP_MODES)}")
         return
 
-    sale_ids = {row[0] for row in arcpy.da.SearchCursor(timber_sale_fc, [match_field]) if row[0] is not None}
-    log_entries = []
-
-    for sale_id in sale_ids:
-        safe_id = sanitize_name(sale_id)
-        query_value = str(sale_id).replace("'", "''")
-        sale_query = f"{arcpy.AddFieldDelimiters('', match_field)} = '{query_value}'"
-        arcpy.MakeFeatureLayer_management(timber_sale_fc, "sale_layer", sale_query)
+    if attribution not in ATTRIBUTIONS:
+        arcpy.AddError(f"Sale attribution must be one of: {', '.join(ATTRIBUTIONS)}")
+        return
 
-        if int(arcpy.GetCount_management("sale_layer")[0]) == 0:
-            arcpy.AddWarning(f"No polygons found for Sale Name: {sale_id}")
-            continue
+    if clip_mode == "Batch" and attribution != "Intersect":
+        arcpy.AddWarning("Batch mode always carries sale_name through its intersect; ignoring Sale Attribution")
+        attribution = "Intersect"
 
-        group_path = os.path.join(output_workspace, f"Sale_{safe_id}")
-        if not arcpy.Exists(group_path):
-            arcpy.CreateFeatureDataset_management(output_workspace, f"Sale_{safe_id}", arcpy.Describe(timber_sale_fc).spatialReference)
+    if clip_mode == "Batch" and workers > 1:
+        arcpy.AddWarning("Batch mode runs one intersect per feature class in one process; ignoring Worker Processes")
+        workers = 1
 
-        for input_fc in input_feature_classes:
-            input_fc_path = os.path.join(input_fc_workspace, input_fc)
-            arcpy.MakeFeatureLayer_management(input_fc_path, "input_layer")
+    input_feature_classes = arcpy.ListFeatureClasses()
+    if not input_feature_classes:
+        arcpy.AddError("No input feature classes found.")
+        return
 
-            arcpy.SelectLayerByLocation_management("input_layer", "INTERSECT", "sale_layer")
+    sale_ids = list({row[0] for row in arcpy.da.SearchCursor(timber_sale_fc, [match_field]) if row[0] is not None})
 
-            if int(arcpy.GetCount_management("input_layer")[0]) == 0:
-                arcpy.AddWarning(f"No intersecting features in {input_fc} for {sale_id}")
-                continue
+    # checkpointing is opt in: only a run with a Checkpoint Journal can be resumed
+    checkpoints = None
+    if journal_path:
+        checkpoints = Checkpoints(journal_path, output_workspace, input_fc_workspace, timber_sale_fc)
+        valid = sum(1 for sale_id in sale_ids for input_fc in input_feature_classes if checkpoints.done(sale_id, input_fc) is not None)
+        if valid:
+            arcpy.AddMessage(f"Resuming from {journal_path}: {valid} of {len(sale_ids) * len(input_feature_classes)} clips are unchanged and will be skipped")
 
-            out_name = f"{os.path.splitext(input_fc)[0]}_{safe_id}_clip".replace(" ", "_")
-            out_path = os.path.join(group_path, out_name)
+    clip_log = ClipLog(output_log, match_field)
+    try:
+        if clip_mode == "Batch":
+            clip_batch(input_fc_workspace, input_feature_classes, timber_sale_fc, output_workspace, match_field, sale_ids, checkpoints, clip_log)
+        elif workers > 1:
+            arcpy.AddMessage(f"Clipping sales in {workers} worker processes")
+            clip_parallel(input_fc_workspace, input_feature_classes, timber_sale_fc, output_workspace, match_field, sale_ids, workers, attribution, checkpoints, clip_log)
+        else:
+            clip_per_sale(input_fc_workspace, input_feature_classes, timber_sale_fc, output_workspace, match_field, sale_ids, attribution, checkpoints, clip_log)
+    finally:
+        if checkpoints is not None:
+            checkpoints.close()
+        written = clip_log.close()
 
-            arcpy.Clip_analysis("input_layer", "sale_layer", out_path)
-
-            if match_field not in [f.name for f in arcpy.ListFields(out_path)]:
-                arcpy.AddField_management(out_path, match_field, "TEXT")
-
-            with arcpy.da.UpdateCursor(out_path, [match_field]) as cursor:
-                for row in cursor:
-                    row[0] = sale_id
-                    cursor.updateRow(row)
-
-            log_entries.append([out_path, sale_id])
-            arcpy.AddMessage(f"Clipped {input_fc} to {sale_id} -> {out_path}")
-
-    if log_entries:
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Clip Log"
-        ws.append(["OutputFeatureClassPath", match_field])
-        for entry in log_entries:
-            ws.append(entry)
-        wb.save(output_log_xlsx)
-        arcpy.AddMessage(f"Excel log written to {output_log_xlsx}")
-        try:
-            os.startfile(output_log_xlsx)
-        except Exception as e:
-            arcpy.AddWarning(f"Could not open Excel file: {e}")
+    if written:
+        arcpy.AddMessage(f"Clip log written to {', '.join(clip_log.paths)}")
+        if sys.platform == "win32" and not output_log.lower().endswith(".csv"):
+            try:
+                os.startfile(output_log)
+            except Exception as e:
+                arcpy.AddWarning(f"Could not open Excel file: {e}")
     else:
-        arcpy.AddWarning("No clips performed. No Excel log created.")
+        arcpy.AddWarning("No clips performed. No clip log created.")
 
     arcpy.AddMessage("All processing completed.")
 
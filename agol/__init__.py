@@ -0,0 +1,9 @@
+'''
+ArcGIS Online helpers for the AGOL notebooks.
+
+agol.members - group member details from batched, concurrent user searches with retry/backoff
+agol.mock    - a local mock portal with per-request latency and failures, for testing without AGOL
+
+Submodules are not imported here and neither needs the ArcGIS API for Python to be imported; agol.members works on
+any GIS object with the gis.users.search/get interface.
+'''
@@ -0,0 +1,78 @@
+'''
+Group member details for 1_AGOLGroupMembers.ipynb.
+
+Looking members up one gis.users.get(username) at a time is one REST round trip per member, which for a 3,000 member
+group is thousands of sequential requests.  member_rows instead asks for the members in batches with
+gis.users.search and a username:"a" OR username:"b" ... query, runs the batches in a bounded thread pool (the
+requests spend their time waiting on the portal, so threads are enough) and retries a failed request with
+exponential backoff.  Members a search does not return (the search index can lag behind new accounts) are looked up
+with gis.users.get, like before.
+'''
+
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+#Excel columns of the member export, in order
+COLUMNS = ["Username", "Fullname", "Email", "Group Role", "Level", "Last Login"]
+
+#Most users one batch search returns, the portal's own search limit.  The search also returns users whose names only
+#start with a requested one, so capping it at the batch size could push exact matches out of the results
+MAX_SEARCH_USERS = 10000
+
+
+def retry(request, retries=4, backoff=1.0):
+    """Calls request(), retrying on any exception up to retries times with exponential backoff (backoff, 2 *
+    backoff, ... seconds, with jitter).  The last exception is raised."""
+    for attempt in range(retries + 1):
+        try:
+            return request()
+        except Exception:
+            if attempt == retries:
+                raise
+            time.sleep(backoff * 2 ** attempt * random.uniform(0.5, 1.5))
+
+
+def username_query(usernames):
+    """A user search query for exactly these usernames."""
+    return " OR ".join('username:"{}"'.format(username) for username in usernames)
+
+
+def search_users(gis, usernames, retries=4, backoff=1.0):
+    """{username: User} of one batch of usernames, from a single search.  The search matches usernames loosely, so
+    only exact matches are kept; usernames it did not return are looked up one by one."""
+    found = retry(lambda: gis.users.search(query=username_query(usernames), max_users=MAX_SEARCH_USERS), retries, backoff)
+    wanted = set(usernames)
+    users = dict((user.username, user) for user in found if user.username in wanted)
+    for username in usernames:
+        if username not in users:
+            user = retry(lambda: gis.users.get(username), retries, backoff)
+            if user:
+                users[username] = user
+    return users
+
+
+def member_row(user, role):
+    """The export row of a group member."""
+    last_login = (
+        datetime.utcfromtimestamp(user.lastLogin / 1000).strftime('%Y-%m-%d %H:%M:%S')
+        if getattr(user, 'lastLogin', None) else "Never"
+    )
+    return {"Username": user.username, "Fullname": user.fullName, "Email": getattr(user, 'email', 'Not Available'),
+            "Group Role": role, "Level": getattr(user, 'level', 'Unknown'), "Last Login": last_login}
+
+
+def member_rows(gis, admins, users, batch_size=50, workers=8, retries=4, backoff=1.0):
+    """Export rows (COLUMNS) of the group's admins and users, in that order, skipping usernames the portal does not
+    return.  Usernames are searched batch_size at a time with up to workers requests in flight."""
+    usernames = list(dict.fromkeys(admins + users))
+    batches = [usernames[start:start + batch_size] for start in range(0, len(usernames), batch_size)]
+    found = {}
+    with ThreadPoolExecutor(max(1, min(workers, len(batches)))) as pool:
+        for batch_users in pool.map(lambda batch: search_users(gis, batch, retries, backoff), batches):
+            found.update(batch_users)
+
+    admin_names = set(admins)
+    return [member_row(found[username], "Admin" if username in admin_names else "User")
+            for username in admins + users if username in found]
@@ -0,0 +1,87 @@
+'''
+A local mock of the parts of an ArcGIS Online portal the member export uses, for throughput tests without AGOL.
+
+MockGIS has gis.groups.get(group_id).get_members(), gis.users.get(username) and gis.users.search(query, max_users)
+over synthetic users.  Every request sleeps for latency seconds, like a REST round trip, and fails with
+failure_rate probability, so the retry/backoff path runs too.  Searches understand the username:"a" OR
+username:"b" queries of agol.members, and like the real search they also return users whose names only start with
+a requested one.  Requests are counted in requests, which is safe to read after threaded use.
+'''
+
+import random
+import re
+import threading
+import time
+from collections import Counter, namedtuple
+
+MockUser = namedtuple("MockUser", ["username", "fullName", "email", "level", "lastLogin"])
+
+
+class MockGroup(object):
+    def __init__(self, title, admins, users):
+        self.title = title
+        self._members = {"owner": admins[0] if admins else None, "admins": admins, "users": users}
+
+    def get_members(self):
+        return dict(self._members)
+
+
+class _Groups(object):
+    def __init__(self, portal):
+        self._portal = portal
+
+    def get(self, group_id):
+        self._portal._request("groups.get")
+        return self._portal.groups_by_id.get(group_id)
+
+
+class _Users(object):
+    def __init__(self, portal):
+        self._portal = portal
+
+    def get(self, username):
+        self._portal._request("users.get")
+        return self._portal.users_by_name.get(username)
+
+    def search(self, query=None, max_users=100):
+        self._portal._request("users.search")
+        prefixes = re.findall(r'username:"([^"]*)"', query or "")
+        found = [user for name, user in self._portal.users_by_name.items() if any(name.startswith(p) for p in prefixes)]
+        return found[:max_users]
+
+
+class MockGIS(object):
+    def __init__(self, users, groups, latency=0.05, failure_rate=0.0, seed=0):
+        """users are MockUser records and groups {group_id: MockGroup}."""
+        self.users_by_name = dict((user.username, user) for user in users)
+        self.groups_by_id = groups
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.requests = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.users = _Users(self)
+        self.groups = _Groups(self)
+
+    def _request(self, name):
+        with self._lock:
+            self.requests[name] += 1
+            fail = self._random.random() < self.failure_rate
+        time.sleep(self.latency)
+        if fail:
+            raise Exception("Mock portal: {} failed (simulated error)".format(name))
+
+
+def mock_portal(members=3000, admins=5, missing=0, latency=0.05, failure_rate=0.0, seed=0):
+    """A MockGIS with one group, "mockgroup", of members users (the first admins of them group admins), plus
+    users whose names extend a member's (so searches return extra users).  The last missing members are left out of
+    the portal's users, like deleted accounts.  Returns (gis, group_id)."""
+    rand = random.Random(seed)
+    names = ["user{:05d}_usfs".format(number) for number in range(members)]
+    users = [MockUser(name, "User {}".format(number), "{}@usda.gov".format(name), rand.choice(["1", "2"]),
+                      None if number % 10 == 0 else 1700000000000 + number * 60000)
+             for number, name in enumerate(names)]
+    extra = [user._replace(username=user.username + "x") for user in users[::7]]
+    portal_users = users[:members - missing] if missing else users
+    group = MockGroup("Mock group", names[:admins], names[admins:])
+    return MockGIS(portal_users + extra, {"mockgroup": group}, latency, failure_rate, seed), "mockgroup"
@@ -0,0 +1,23 @@
+'''
+BCS buffer rules as an importable package that does not depend on arcpy.
+
+bcs.constants   - species, buffer distances, WNS detection dates, GI queries and field lists
+bcs.engine      - columnar rule engine (pandas/NumPy): DataFrames or row iterables in, BufferRow records out
+bcs.abundance   - grouped per-visit abundance aggregation and the highest-abundance / last-3-visits rules
+bcs.dates       - memoized GI date parsing and the datetime64 column path
+bcs.wns         - compiled WNS detection table (BCS Table D-1), loadable from CSV
+bcs.buffers     - numeric buffer distances and circle polygons built from BufferRow records
+bcs.parallel    - engine runs over org (FS_UNIT_ID) partitions in a process pool, merged in a fixed order
+bcs.incremental - per-site input fingerprints and change detection for incremental runs
+bcs.instrument  - stage timing, row/cursor counts and peak memory for the run report
+bcs.synthetic   - seeded synthetic GI Site and Capture tables (1k to 10M rows) for benchmarks and checks
+bcs.golden      - golden-output comparison of a candidate engine with the original tool's output, per site
+bcs.index       - hashed index of buffers already written
+bcs.legacy      - the cursor-per-rule workflow (same rules as the engine), run against arcpy.da or a stand-in
+bcs.memoryda    - in-memory stand-in for the arcpy.da cursors
+
+BCSBuffering.py is the ArcGIS Pro script tool adapter over this package.  Submodules are not imported here,
+so importing bcs stays cheap and pandas is only loaded along with bcs.engine.
+'''
+
+__version__ = "0.0.2"
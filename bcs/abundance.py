@@ -0,0 +1,90 @@
+'''
+Grouped abundance aggregation for the hibernacula and roost counts.
+
+Observations come in as integer columns: a visit code per row (e.g. a (SITE_CN, VISIT_CN) group number), a species
+code from species_index and OBS_COUNT.  visit_abundance sums them into a visits x SPECIES matrix with one np.bincount
+per chunk, so memory is the output matrix plus one chunk of rows no matter how many observations there are.
+counted_visits and site_highest apply the abundance rules on top of the visit values: every visit counts for orgs
+with no WNS date (highest abundance), and only the last 3 visits count for PostWNS orgs.
+'''
+
+import numpy as np
+import pandas as pd
+
+from .constants import speciesCodes
+from .wns import NO_WNS, POST_WNS
+
+#Column order of the abundance matrices
+SPECIES = ("MYSE", "PESU", "MYSO", "MYLU", "BATS")
+SPECIES_INDEX = dict((code, index) for index, code in enumerate(SPECIES))
+
+#Rows aggregated per bincount pass
+CHUNK_SIZE = 1000000
+
+
+def species_index(names):
+    """Integer species code (index into SPECIES) per scientific name, -1 for names that are not a BCS species."""
+    codes, uniques = pd.factorize(np.asarray(names, dtype=object))
+    lookup = np.array([SPECIES_INDEX.get(speciesCodes.get(name), -1) for name in uniques] + [-1], dtype=np.int8)
+    return lookup[codes]  # code -1 (null name) picks the trailing -1
+
+
+class AbundanceAccumulator(object):
+    def __init__(self, n_visits):
+        """Sums counts per visit and species for visit codes 0 to n_visits - 1, fed in chunks with add()."""
+        self.n_visits = n_visits
+        self._totals = np.zeros(n_visits * len(SPECIES), dtype=np.float64)
+        self._seen = np.zeros(n_visits * len(SPECIES), dtype=bool)
+
+    def add(self, visit, species, count):
+        """Adds one chunk of observations.  Rows with a species code of -1 or a null count are ignored."""
+        species = np.asarray(species)
+        count = np.asarray(count, dtype=np.float64)
+        keep = (species >= 0) & ~np.isnan(count)
+        flat = np.asarray(visit)[keep].astype(np.int64) * len(SPECIES) + species[keep]
+        if not len(flat):
+            return
+        #bincount over the span of codes in this chunk rather than the whole matrix
+        low = flat.min()
+        sums = np.bincount(flat - low, weights=count[keep])
+        self._totals[low:low + len(sums)] += sums
+        self._seen[flat] = True
+
+    def matrix(self):
+        """visits x SPECIES matrix of summed counts, NaN where a visit had no counts for a species."""
+        totals = np.where(self._seen, self._totals, np.nan)
+        return totals.reshape(self.n_visits, len(SPECIES))
+
+
+def visit_abundance(visit, species, count, n_visits=None, chunk_size=CHUNK_SIZE):
+    """Sums count per (visit, species) for integer visit and species codes.  Returns a visits x SPECIES matrix,
+    NaN where a visit had no counts for a species."""
+    visit, species, count = np.asarray(visit), np.asarray(species), np.asarray(count, dtype=np.float64)
+    if n_visits is None:
+        n_visits = int(visit.max()) + 1 if len(visit) else 0
+    accumulator = AbundanceAccumulator(n_visits)
+    for start in range(0, len(visit), chunk_size):
+        end = start + chunk_size
+        accumulator.add(visit[start:end], species[start:end], count[start:end])
+    return accumulator.matrix()
+
+
+def counted_visits(pre_post_wns, visit_num):
+    """Rows that count toward a site's abundance: every visit for NoWNS orgs (highest abundance rule) and
+    VisitNum 1-3 for PostWNS orgs (last 3 visits rule)."""
+    pre_post_wns = np.asarray(pre_post_wns, dtype=object)
+    with np.errstate(invalid="ignore"):
+        last_3 = np.asarray(visit_num, dtype=np.float64) <= 3
+    return (pre_post_wns == NO_WNS) | ((pre_post_wns == POST_WNS) & last_3)
+
+
+def site_highest(site, values, n_sites=None):
+    """Highest value of each column of values per integer site code, ignoring NaN.  Returns a sites x columns
+    matrix, NaN where a site had no values."""
+    site = np.asarray(site)
+    values = np.asarray(values, dtype=np.float64)
+    if n_sites is None:
+        n_sites = int(site.max()) + 1 if len(site) else 0
+    highest = np.full((n_sites,) + values.shape[1:], np.nan)
+    np.fmax.at(highest, site, values)
+    return highest
@@ -0,0 +1,118 @@
+'''
+Buffer polygons built straight from BufferRow records.
+
+The staging workflow writes every BufferRow to the ptBufferFC point feature class and lets arcpy.analysis.Buffer
+read it back and parse the text BufferDistance ("500 Feet") per feature.  buffer_rings instead turns the rows into
+closed circle vertex arrays in the rows' coordinate system with numeric distances, so the adapter can write the
+BCSBuffers polygons in one InsertCursor pass without the point feature class.  Geographic coordinates (degrees)
+are offset with the local ellipsoid radii of curvature, which is well within a foot of a geodesic circle at the
+BCS buffer distances (5 miles at most).
+'''
+
+from functools import lru_cache
+
+import numpy as np
+
+#Linear units allowed in the buffer distance text, in feet
+FEET_PER_UNIT = {"FEET": 1.0, "FOOT": 1.0, "MILES": 5280.0, "MILE": 5280.0, "METERS": 1 / 0.3048, "METER": 1 / 0.3048}
+METERS_PER_FOOT = 0.3048
+
+#GRS 1980 ellipsoid (NAD83), used for geographic coordinates
+SEMI_MAJOR_AXIS = 6378137.0
+FLATTENING = 1 / 298.257222101
+
+#Vertices per circle (3 degree steps, under 10 feet from the true circle at 5 miles)
+CIRCLE_VERTICES = 120
+
+
+@lru_cache(maxsize=None)
+def distance_feet(text):
+    """Parses a buffer distance like "500 Feet" into a number of feet."""
+    value, unit = str(text).split()
+    try:
+        return float(value) * FEET_PER_UNIT[unit.upper()]
+    except KeyError:
+        raise ValueError("unknown buffer distance unit in {!r}".format(text))
+
+
+def buffer_distances(rows):
+    """Numeric buffer distances in feet for BufferRow records (or tuples in the order of constants.bufferFields)."""
+    return np.array([distance_feet(row[6]) for row in rows], dtype=np.float64)
+
+
+def circle_rings(x, y, feet, geographic=False, meters_per_unit=1.0, vertices=CIRCLE_VERTICES):
+    """Closed clockwise circle rings around points x, y with radii in feet.  Returns an (n, vertices + 1, 2) array.
+
+    Projected coordinates are in units of meters_per_unit meters.  Geographic coordinates are longitude/latitude
+    degrees."""
+    x, y = np.asarray(x, dtype=np.float64)[:, None], np.asarray(y, dtype=np.float64)[:, None]
+    meters = np.asarray(feet, dtype=np.float64)[:, None] * METERS_PER_FOOT
+    angle = np.linspace(0, 2 * np.pi, vertices + 1)  # clockwise from north, last vertex closes the ring
+    north, east = meters * np.cos(angle), meters * np.sin(angle)
+    if geographic:
+        #offset with the radii of curvature at the mid latitude of each vertex, refined twice
+        e2 = FLATTENING * (2 - FLATTENING)
+        ring_y = y
+        for _ in range(3):
+            mid = np.radians((y + ring_y) / 2)
+            w = np.sqrt(1 - e2 * np.sin(mid) ** 2)
+            meridian = SEMI_MAJOR_AXIS * (1 - e2) / w ** 3
+            ring_y = y + np.degrees(north / meridian)
+        ring_x = x + np.degrees(east / (SEMI_MAJOR_AXIS / w * np.cos(mid)))
+    else:
+        ring_y = y + north / meters_per_unit
+        ring_x = x + east / meters_per_unit
+    rings = np.stack([ring_x, ring_y], axis=-1)
+    rings[:, -1] = rings[:, 0]
+    return rings
+
+
+def buffer_rings(rows, geographic=False, meters_per_unit=1.0, vertices=CIRCLE_VERTICES, feet=None):
+    """Circle rings for BufferRow records, one per row, from their XY and BufferDistance (or the radii in feet).
+    Rows without an XY get a ring of NaN."""
+    xy = np.array([row[10] if row[10] is not None else (np.nan, np.nan) for row in rows], dtype=np.float64).reshape(-1, 2)
+    feet = buffer_distances(rows) if feet is None else feet
+    return circle_rings(xy[:, 0], xy[:, 1], feet, geographic, meters_per_unit, vertices)
+
+
+def _merged(values, separator=", "):
+    #distinct values in first-seen order, joined
+    distinct = []
+    for value in values:
+        if value not in distinct and value not in (None, ""):
+            distinct.append(value)
+    return separator.join(str(value) for value in distinct)
+
+
+def merge_buffer_rows(rows):
+    """Merges BufferRow records that share a point XY and buffer distance into one record per circle, in order of
+    each circle's first record.  Text attributes that differ (e.g. Species "PESU, MYSE") are joined, and a merged
+    record is Exempt if any of its records are."""
+    groups = {}
+    for row in rows:
+        groups.setdefault((row[10], distance_feet(row[6])), []).append(row)
+    merged = []
+    for group in groups.values():
+        first = group[0]
+        if len(group) == 1:
+            merged.append(first)
+            continue
+        values = [_merged(column) for column in list(zip(*group))[:9]]
+        values += ["Y" if "Y" in [row[9] for row in group] else first[9], first[10]]
+        merged.append(first._make(values) if hasattr(first, "_make") else tuple(values))
+    return merged
+
+
+def ring_distances(rows):
+    """Inner radius in feet of the concentric ring for each BufferRow: the next smaller buffer distance at the same
+    XY, or 0 for the smallest.  Rows should already be merged so each XY has one row per distance."""
+    outer = buffer_distances(rows)
+    inner = np.zeros(len(rows))
+    by_point = {}
+    for index, row in enumerate(rows):
+        by_point.setdefault(row[10], []).append(index)
+    for indexes in by_point.values():
+        indexes = sorted(indexes, key=lambda index: outer[index])
+        for smaller, index in zip(indexes, indexes[1:]):
+            inner[index] = outer[smaller]
+    return inner
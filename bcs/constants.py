@@ -0,0 +1,113 @@
+'''
+Hardcoded BCS values shared by the columnar engine and the legacy cursor workflow.
+See BCSBuffering.py for the species, abundance thresholds and buffer distances these encode.
+'''
+
+#Species Variables
+MYSE = "Myotis septentrionalis"
+MYSO = "Myotis sodalis"
+MYLU = "Myotis lucifugus"
+PESU = ["Perimyotis subflavus", "Pipistrellus subflavus"] # in case the taxa list isnt updated
+BATS = "Chiroptera"
+
+#Hibernacula Buffers
+hbPrimary = "500 Feet" # 500 feet
+hbSecondary1 = "1320 Feet" # 1,320 feet | .25 miles
+hbSecondary2 = "10560 Feet" # 10,560 feet | 2 miles
+hbTertiary1 = "4488 Feet" # 4,488 feet | 0.85 miles
+hbTertiary2 = "26400 Feet" # 26,400 feet | 5 miles
+
+#Roost Buffers
+rbPrimary = "150 Feet"
+rbPESU = "300 Feet"
+rbMYSE = "1320 Feet"
+rbMYSO = rbMYLU = "3696 Feet"
+
+#Capture Buffers
+cbPESU = cbMYSE = "3960 Feet"
+cbMYSO = cbMYLU = "9540 Feet"
+
+#Define White Nose Syndrome(WNS) Detection Dates Dictionary.  Based on BCS Document Table D-1 with addition of R8 and R9 to handle errors
+wns_dict = {'0903':'2015',
+            '0904':'2016',
+            '0905':'2016',
+            '0907':'2017',
+            '0908':'2016',
+            '0909':'2016',
+            '0910':'2016',
+            '0912':'2014',
+            '0913':'2015',
+            '0914':'2015',
+            '0915':'2016',
+            '0919':'2014',
+            '0920':'2011',
+            '0921':'2011',
+            '0922':'2014',
+            '0801':'2016',
+            '0802':'2014',
+            '0803':'2015',
+            '0804':'2013',
+            '0805':'NA',
+            '0806':'NA',
+            '0807':'NA',
+            '0808':'2013',
+            '0809':'NA',
+            '0810':'NA',
+            '0811':'NA',
+            '0812':'NA',
+            '0813':'NA',
+            '0816':'NA',
+            '0860':'2013',
+            '09':'2021',
+            '08':'ERR'
+           }
+
+#Set GIS Queries in hardcoded
+pyqryHibernacula = "BIOLOGICAL_SITE_USE = 'Hibernating'"
+pyqryRoost = "BIOLOGICAL_SITE_USE = 'Perch or Roost'"
+pyqrySiteCatBio = "SITE_CATEGORY = 'Biological' and OBS_SCIENTIFIC_NAME in ('Myotis septentrionalis','Myotis sodalis', 'Myotis lucifugus', 'Perimyotis subflavus', 'Pipistrellus subflavus', 'Chiroptera')"
+pyqryCapture = "SCIENTIFIC_NAME in ('Myotis septentrionalis','Myotis sodalis', 'Myotis lucifugus', 'Perimyotis subflavus', 'Pipistrellus subflavus') and OBS_METHOD in ('In Hand', 'Visual')"
+
+#Fields read from the exported Roost & Hibernacula data (rstHibDataLayer)
+siteFields = ["OID@", "SITE_CN", "VISIT_CN", "VISIT_START_DATE", "FS_UNIT_ID", "FS_UNIT_NAME", "SITE_NAME", "SITE_TYPE",
+              "EXEMPT_FROM_PUBLIC", "BIOLOGICAL_SITE_USE", "VISIT_SITE_STATUS", "VISIT_SITE_CONDITION", "VISIT_COMMENTS",
+              "OBS_METHOD_TYPE", "OBS_SCIENTIFIC_NAME", "OBS_COUNT", "REPRO_STATUS", "SHAPE@XY"]
+
+#Fields read from the exported Capture data (captureDataLayer)
+captureFields = ["OID@", "OBS_CN", "OBS_DATE", "REPRODUCTIVE_STATUS", "SCIENTIFIC_NAME", "EXEMPT_FROM_PUBLIC", "SHAPE@XY",
+                 "FS_UNIT_ID", "SITE_NAME", "FS_UNIT_NAME", "AGE", "OBS_METHOD", "SITE_TYPE"]
+
+#Fields derived by the engine and written back to the exported data
+siteDerivedFields = ["VisitNum", "Historic", "PrePostWNS", "haMYSE", "haPESU", "haMYSO", "haMYLU", "haCOMB", "haBATS",
+                     "SnagDays", "SnagProcess", "Maternity"]
+captureDerivedFields = ["PrePostWNS"]
+
+#Fields of the pt Buffer layer in the order the buffer rows are built
+bufferFields = ['Site_CN', 'SiteName', 'ForestName', 'OrgCode', 'BufferClass', 'BufferType', 'BufferDistance', 'Species',
+                'BufferComments', 'Exempt', 'SHAPE@XY']
+
+#Scientific name to species code
+speciesCodes = {MYSE: "MYSE", MYSO: "MYSO", MYLU: "MYLU", BATS: "BATS"}
+speciesCodes.update({name: "PESU" for name in PESU})
+
+#Hibernacula buffer rules per abundance field: (species, abundance field, rows when count is 0, [(min count, type, distance)])
+hibRules = [("PESU", "haPESU",
+             [("Primary", hbPrimary), ("Secondary", hbSecondary1), ("Tertiary", hbTertiary1)],
+             [(1, "Primary", hbPrimary), (10, "Secondary", hbSecondary1), (20, "Tertiary", hbTertiary1)]),
+            ("MYSE", "haMYSE",
+             [("Primary", hbPrimary), ("Secondary", hbSecondary1), ("Tertiary", hbTertiary1)],
+             [(1, "Primary", hbPrimary), (10, "Secondary", hbSecondary1), (20, "Tertiary", hbTertiary1)]),
+            ("MYSO/MYLU", "haCOMB",
+             [("Primary", hbPrimary), ("Secondary", hbSecondary2), ("Tertiary", hbTertiary2)],
+             [(1, "Primary", hbPrimary), (20, "Secondary", hbSecondary2), (5000, "Tertiary", hbTertiary2)])]
+
+#MYSE internal counts (VISIT_COMMENTS mention "internal") use their own thresholds and have no Primary buffer
+hibRuleMYSEInternal = ("MYSE", "haMYSE",
+                       [("Primary", hbPrimary), ("Secondary", hbSecondary1), ("Tertiary", hbTertiary1)],
+                       [(1, "Secondary", hbSecondary1), (5, "Tertiary", hbTertiary1)])
+
+#Roost maternity buffers per abundance field, in the order they are added
+roostMaternityRules = [("haPESU", "PESU", rbPESU), ("haMYSE", "MYSE", rbMYSE), ("haMYSO", "MYSO", rbMYSO), ("haMYLU", "MYLU", rbMYLU)]
+
+#Capture maternity buffers per species code
+captureDistances = {"PESU": cbPESU, "MYSE": cbMYSE, "MYSO": cbMYSO, "MYLU": cbMYLU}
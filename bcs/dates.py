@@ -0,0 +1,67 @@
+'''
+Date normalization for GI VISIT_START_DATE / OBS_DATE values.
+
+GI exports dates as text, either 'YYYY/MM/DD' or 'YYYY/MM/DD HH:MM'.  A DateParser parses each distinct value once
+(memoized), has a bulk path that turns a whole column into a NumPy datetime64 array, and records every value it
+could not parse so the caller can report them instead of silently reusing the previous row's date.
+'''
+
+from datetime import datetime
+
+#GI date formats by string length
+GI_FORMATS = {10: "%Y/%m/%d", 16: "%Y/%m/%d %H:%M"}
+
+
+def parse_gi_date(value):
+    """Returns value as a datetime, or None if it is not a GI date string (or already a datetime)."""
+    if isinstance(value, datetime):
+        return value
+    if not isinstance(value, str) or len(value) not in GI_FORMATS:
+        return None
+    try:
+        return datetime.strptime(value, GI_FORMATS[len(value)])
+    except ValueError:
+        return None
+
+
+class DateParser(object):
+    def __init__(self):
+        self._cache = {}
+        self.unparseable = {}  # field -> set of values that could not be parsed
+
+    def parse(self, value, field=None):
+        """Memoized parse_gi_date.  Records value under field if it can not be parsed."""
+        try:
+            parsed = self._cache[value]
+        except KeyError:
+            parsed = self._cache[value] = parse_gi_date(value)
+        except TypeError:  # unhashable
+            parsed = parse_gi_date(value)
+        if parsed is None:
+            self.unparseable.setdefault(field, set()).add(value)
+        return parsed
+
+    def column(self, values, field=None):
+        """Parses a whole column, each distinct value once.  Returns a datetime64[m] array with NaT where the
+        value could not be parsed."""
+        #imported here so the legacy cursor workflow can use the parser without pandas
+        import numpy as np
+        import pandas as pd
+
+        codes, uniques = pd.factorize(pd.Series(values, dtype=object))
+        parsed = np.array([self.parse(value, field) for value in uniques], dtype="datetime64[m]")
+        dates = np.full(len(codes), np.datetime64("NaT"), dtype="datetime64[m]")
+        dates[codes >= 0] = parsed[codes[codes >= 0]]
+        if (codes < 0).any():
+            self.unparseable.setdefault(field, set()).add(None)
+        return dates
+
+    def report(self, limit=10):
+        """Returns one message per field with values that could not be parsed."""
+        messages = []
+        for field, values in sorted(self.unparseable.items(), key=lambda item: str(item[0])):
+            shown = sorted(values, key=str)[:limit]
+            more = " ..." if len(values) > limit else ""
+            messages.append("{} {} value(s) could not be parsed as dates and were left out of the date rules: {}{}".format(
+                len(values), field or "date", ", ".join(repr(value) for value in shown), more))
+        return messages
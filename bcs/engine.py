@@ -0,0 +1,299 @@
+'''
+Columnar BCS rule engine.
+
+Reads the site and capture tables once into DataFrames, derives VisitNum, Historic, PrePostWNS, the per-species
+abundances, SnagDays and Maternity as vectorized columns, and builds the pt Buffer rows.  Nothing here touches
+arcpy; rows come in as DataFrames or plain row iterables and buffer rows go out as BufferRow tuples.
+'''
+
+import re
+from collections import namedtuple
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from . import abundance
+from .dates import DateParser
+from .instrument import NULL_RECORDER
+from .wns import DEFAULT_TABLE, MISSING
+from .constants import (hbPrimary, rbPrimary, siteFields, captureFields, speciesCodes, hibRules, hibRuleMYSEInternal,
+                        roostMaternityRules, captureDistances)
+
+#One pt Buffer record.  Field order matches constants.bufferFields so a BufferRow can be passed straight to an InsertCursor
+BufferRow = namedtuple("BufferRow", ["Site_CN", "SiteName", "ForestName", "OrgCode", "BufferClass", "BufferType",
+                                     "BufferDistance", "Species", "BufferComments", "Exempt", "XY"])
+
+#Classified tables, the buffer rows built from them and warning messages (e.g. unparseable dates)
+EngineResult = namedtuple("EngineResult", ["hibernacula", "roosts", "captures", "buffer_rows", "warnings"])
+
+VISIT_KEYS = ["SITE_CN", "VISIT_CN"]
+
+#Normalized datetime64 columns derived from the GI date text fields
+DATE_COLUMNS = {"VISIT_START_DATE": "VisitDate", "OBS_DATE": "ObsDate"}
+
+
+def read_rows(rows, fields=None):
+    """Returns a DataFrame copy of rows.  rows may be a DataFrame, an iterable of dicts, or an iterable of
+    tuples in the order of fields."""
+    if isinstance(rows, pd.DataFrame):
+        return rows.copy()
+    return pd.DataFrame.from_records(list(rows), columns=fields)
+
+
+def derived_values(df, fields, oid_field="OID@"):
+    """Returns {ObjectID: (values of fields)} with nulls as None, for writing derived fields back in one pass."""
+    values = df.reindex(columns=fields).astype(object)
+    values = values.where(values.notna(), None)
+    return dict(zip(df[oid_field], values.itertuples(index=False, name=None)))
+
+
+def _visit_codes(df):
+    #integer code per (SITE_CN, VISIT_CN) so per visit values can be looked up with a plain reindex
+    return df.groupby(VISIT_KEYS, sort=False, dropna=False).ngroup().to_numpy()
+
+
+def _text_or(value, default):
+    return value if isinstance(value, str) and value else default
+
+
+def normalize_dates(df, field, parser=None):
+    """Adds the DATE_COLUMNS[field] datetime64 column parsed from the field text, unless it is already there.
+    Unparseable values are NaT and recorded on parser."""
+    column = DATE_COLUMNS[field]
+    if column not in df.columns:
+        parser = DateParser() if parser is None else parser
+        df[column] = parser.column(df[field].to_numpy(dtype=object), field)
+    return df[column]
+
+
+def _usable_active(df):
+    return (df["VISIT_SITE_CONDITION"] == "Usable") & (df["VISIT_SITE_STATUS"] == "Active")
+
+
+def _first_of(df, mask, keys):
+    #rows of mask that are the first masked row for their keys
+    return mask & ~df.loc[mask, keys].duplicated().reindex(df.index, fill_value=False)
+
+
+def visit_sequence(df):
+    """VisitNum: most recent visit date per SITE_CN = "1" and sequential in reverse order."""
+    vdate = df["VisitDate"].to_numpy().astype("datetime64[D]")
+    codes, uniques = pd.factorize(vdate, sort=True)  # codes follow the sorted dates, NaT = -1
+    ranks = pd.Series(codes, index=df.index).where(codes >= 0).groupby(df["SITE_CN"]).rank(method="dense", ascending=False)
+    df["VisitNum"] = np.where(ranks.isna(), None, ranks.fillna(0).astype(int).astype(str))
+
+
+def hist_act(df):
+    """Historic: status of the most recent visit per (SITE_CN, VISIT_CN), all other visits = "err"."""
+    codes = pd.Series(_visit_codes(df), index=df.index)
+    latest = df[df["VisitNum"] == "1"].assign(visit=codes).drop_duplicates("visit")
+    status, condition = latest["VISIT_SITE_STATUS"], latest["VISIT_SITE_CONDITION"]
+    hist = np.select([(status == "Inactive") & (condition == "Usable"),
+                      (status == "Active") & (condition == "Usable"),
+                      condition == "Unusable"], ["Hist", "Act", "Not"], "Unkn")
+    table = pd.Series(hist, index=latest["visit"].to_numpy(), dtype=object)
+    df["Historic"] = table.reindex(codes).fillna("err").to_numpy()
+
+
+def pre_post_wns(df, date_field, wns=DEFAULT_TABLE):
+    """PrePostWNS: classifies the year of the normalized date_field column against the WNS table year for the org code."""
+    df["PrePostWNS"] = wns.classify(df["FS_UNIT_ID"].to_numpy(), df[DATE_COLUMNS[date_field]].dt.year.to_numpy())
+
+
+def count_individuals(df, mask):
+    """ha<species>/haCOMB: sums OBS_COUNT per (SITE_CN, VISIT_CN) and species over the masked rows and writes the
+    sums to every row of that visit.  Returns the first masked row of each visit."""
+    codes = _visit_codes(df)
+    species = abundance.species_index(df["OBS_SCIENTIFIC_NAME"])
+    mask = mask.to_numpy() & (species >= 0)
+    counts = abundance.visit_abundance(codes[mask], species[mask], df["OBS_COUNT"].to_numpy(dtype=np.float64)[mask],
+                                       int(codes.max()) + 1 if len(codes) else 0)
+    values = counts[codes]
+    for index, code in enumerate(abundance.SPECIES):
+        df["ha" + code] = values[:, index]
+    myso, mylu = values[:, abundance.SPECIES_INDEX["MYSO"]], values[:, abundance.SPECIES_INDEX["MYLU"]]
+    comb = np.nan_to_num(myso) + np.nan_to_num(mylu)
+    df["haCOMB"] = np.where((~np.isnan(myso) | ~np.isnan(mylu)) & (comb > 0), comb, np.nan)
+    return df.loc[mask, VISIT_KEYS + ["REPRO_STATUS"]].assign(visit=codes[mask]).drop_duplicates("visit")
+
+
+def snag_time(df, current_date):
+    """SnagDays/SnagProcess: days since the visit for usable, active snags and whether that is within 10 years."""
+    snag = _usable_active(df) & (df["SITE_TYPE"] == "Snag")
+    time_diff = (pd.Timestamp(current_date) - df["VisitDate"]).where(snag)
+    df["SnagDays"] = time_diff.dt.days
+    df["SnagProcess"] = np.where(snag & (time_diff <= pd.Timedelta(days=3650)), "Yes", None)
+
+
+def maternity(df, first_obs):
+    """Maternity: "Yes" for every row of a visit whose first counted record is Reproducing."""
+    reproducing = first_obs.loc[first_obs["REPRO_STATUS"] == "Reproducing", "visit"]
+    df["Maternity"] = np.where(np.isin(_visit_codes(df), reproducing.to_numpy()), "Yes", None)
+
+
+def _hib_site_rows(site, values):
+    #hibernacula buffer rows for one site from its (highest) abundance values
+    rows = []
+    internal = re.search(r'\b' + re.escape("internal") + r'\b', _text_or(site["VISIT_COMMENTS"], ""), re.IGNORECASE)
+    for species, field, zero_rows, thresholds in hibRules:
+        if species == "MYSE" and internal:
+            species, field, zero_rows, thresholds = hibRuleMYSEInternal
+        count = values[field]
+        if pd.isna(count):
+            continue
+        buffer_rows = zero_rows if count == 0 else [(bType, bDist) for minCount, bType, bDist in thresholds if count >= minCount]
+        for bType, bDist in buffer_rows:
+            rows.append(BufferRow(site["SITE_CN"], site["SITE_NAME"], site["FS_UNIT_NAME"], site["FS_UNIT_ID"], "Hibernacula",
+                                  bType, bDist, species, "", _text_or(site["EXEMPT_FROM_PUBLIC"], "N"), site["SHAPE@XY"]))
+    return rows
+
+
+def hibernacula_buffer_rows(df):
+    """Hibernacula pt Buffer rows from classified hibernacula data."""
+    fields = ["haPESU", "haMYSE", "haCOMB"]
+
+    #one Historical buffer for the most recent visit of each historic site; historic sites get no other hibernacula buffers
+    historic = _first_of(df, (df["Historic"] == "Hist") & (df["VisitNum"] == "1"), ["SITE_CN"])
+    row_values = [BufferRow(site["SITE_CN"], site["SITE_NAME"], site["FS_UNIT_NAME"], site["FS_UNIT_ID"], "Hibernacula", "Historical",
+                            hbPrimary, "BCS", "", _text_or(site["EXEMPT_FROM_PUBLIC"], "N"), site["SHAPE@XY"])
+                  for site in df[historic].to_dict("records")]
+
+    hib = df[_usable_active(df) & (df["FS_UNIT_ID"].astype(object).str.len() >= 4) & (df["PrePostWNS"] != "PreWNS") &
+             ~df["SITE_CN"].isin(df.loc[historic, "SITE_CN"])]
+    site, sites = pd.factorize(hib["SITE_CN"], use_na_sentinel=False)  # site codes in order of each site's first record
+    first = ~hib["SITE_CN"].duplicated().to_numpy()
+
+    #the first record of each site seeds its values (non-zero only), later records only count if NoWNS or within the last 3 PostWNS visits
+    vnum = pd.to_numeric(hib["VisitNum"], errors="coerce")
+    counted = first | abundance.counted_visits(hib["PrePostWNS"], vnum)
+    counts = hib[fields].to_numpy(dtype=np.float64)
+    counts[first] = np.where(counts[first] == 0, np.nan, counts[first])
+    highest = abundance.site_highest(site[counted], counts[counted], len(sites))
+
+    for record, values in zip(hib[first].to_dict("records"), highest):
+        row_values.extend(_hib_site_rows(record, dict(zip(fields, values))))
+    return row_values
+
+
+def roost_buffer_rows(df):
+    """Roost pt Buffer rows from classified roost data."""
+    post_wns = df["PrePostWNS"] == "PostWNS"
+    snag_yes = df["SnagProcess"] == "Yes"
+
+    #one Primary buffer for the first active, PostWNS record of each site (snags must be younger than 10 years)
+    primary = (df["Historic"] == "Act") & post_wns & ((df["SITE_TYPE"] != "Snag") | snag_yes)
+    primary = _first_of(df, primary, ["SITE_CN"])
+
+    #Maternity buffers for the first reproducing record of each site & species with abundance values
+    has_counts = df[["haMYSE", "haPESU", "haMYSO", "haMYLU"]].notna().any(axis=1)
+    mat = has_counts & _usable_active(df) & post_wns & ((df["SITE_TYPE"] != "Tree") | snag_yes) & (df["REPRO_STATUS"] == "Reproducing")
+    mat = _first_of(df, mat, ["SITE_CN", "OBS_SCIENTIFIC_NAME"])
+
+    row_values = []
+    selected = primary | mat
+    records = df.assign(Exempt=np.where(df["EXEMPT_FROM_PUBLIC"] == "Y", "Y", "N"))[selected]
+    for is_primary, is_maternity, row in zip(primary[selected], mat[selected], records.to_dict("records")):
+        base = (row["SITE_CN"], row["SITE_NAME"], row["FS_UNIT_NAME"], row["FS_UNIT_ID"], "Roost")
+        if is_primary:
+            row_values.append(BufferRow(*base, "Primary", rbPrimary, "", "", row["Exempt"], row["SHAPE@XY"]))
+        if is_maternity:
+            for field, species, bDist in roostMaternityRules:
+                if pd.notna(row[field]):
+                    row_values.append(BufferRow(*base, "Maternity", bDist, species, "", row["Exempt"], row["SHAPE@XY"]))
+    return row_values
+
+
+def capture_buffer_rows(df):
+    """Capture pt Buffer rows from classified capture data."""
+    dates = df["ObsDate"].dt
+    month_day = dates.month * 100 + dates.day  # NaN for unparseable dates, which are never in the window
+    species = df["SCIENTIFIC_NAME"].map(speciesCodes)
+    capture = (month_day.between(415, 815) & ~df["PrePostWNS"].isin(["PreWNS", "error"]) &
+               ((df["REPRODUCTIVE_STATUS"] == "Reproducing") | (df["AGE"] == "Juvenile")) &
+               species.isin(list(captureDistances)) & (df["OBS_METHOD"] == "In Hand") & (df["SITE_TYPE"] == "Sample Point"))
+    capture = _first_of(df, capture, ["SITE_NAME", "SCIENTIFIC_NAME"])
+
+    row_values = []
+    records = df.assign(Exempt=np.where(df["EXEMPT_FROM_PUBLIC"] == "Y", "Y", "N"), species=species)[capture]
+    for row in records.to_dict("records"):
+        row_values.append(BufferRow(row["OBS_CN"], row["SITE_NAME"], row["FS_UNIT_NAME"], row["FS_UNIT_ID"], "Capture", "Maternity",
+                                    captureDistances[row["species"]], row["species"], "", row["Exempt"], row["SHAPE@XY"]))
+    return row_values
+
+
+def classify_hibernacula(hib, parser=None, wns=DEFAULT_TABLE, recorder=NULL_RECORDER):
+    """Derives VisitNum, Historic, PrePostWNS and the abundance fields for hibernacula data in place."""
+    normalize_dates(hib, "VISIT_START_DATE", parser)
+    with recorder.stage("VisitSequence"):
+        visit_sequence(hib)
+    with recorder.stage("HistAct"):
+        hist_act(hib)
+    with recorder.stage("PrePostWNSDate"):
+        pre_post_wns(hib, "VISIT_START_DATE", wns)
+    with recorder.stage("CountIndividuals"):
+        org = hib["FS_UNIT_ID"].astype(object)
+        known = wns.lookup(org.to_numpy()) != MISSING
+        count_individuals(hib, hib["OBS_COUNT"].fillna(0).astype(bool) & (org.str.len() >= 4) & known)
+    return hib
+
+
+def classify_roosts(roost, current_date, parser=None, wns=DEFAULT_TABLE, recorder=NULL_RECORDER):
+    """Derives VisitNum, Historic, PrePostWNS, SnagDays/SnagProcess, the abundance fields and Maternity for roost data in place."""
+    normalize_dates(roost, "VISIT_START_DATE", parser)
+    with recorder.stage("VisitSequence"):
+        visit_sequence(roost)
+    with recorder.stage("HistAct"):
+        hist_act(roost)
+    with recorder.stage("PrePostWNSDate"):
+        pre_post_wns(roost, "VISIT_START_DATE", wns)
+    with recorder.stage("SnagTime"):
+        snag_time(roost, current_date)
+    with recorder.stage("CountIndividuals"):
+        counted = (_usable_active(roost) & (roost["PrePostWNS"] != "PreWNS") &
+                   ((roost["SITE_TYPE"] != "Snag") | (roost["SnagProcess"] == "Yes")))
+        first_obs = count_individuals(roost, counted)
+    with recorder.stage("Maternity"):
+        maternity(roost, first_obs)
+    return roost
+
+
+def classify_captures(captures, parser=None, wns=DEFAULT_TABLE, recorder=NULL_RECORDER):
+    """Derives PrePostWNS for capture data in place."""
+    normalize_dates(captures, "OBS_DATE", parser)
+    with recorder.stage("PrePostWNSDate"):
+        pre_post_wns(captures, "OBS_DATE", wns)
+    return captures
+
+
+def run(sites, captures, current_date=None, site_fields=siteFields, capture_fields=captureFields, wns=DEFAULT_TABLE,
+        recorder=NULL_RECORDER):
+    """Classifies site and capture rows and builds the pt Buffer rows.
+
+    sites/captures are DataFrames or row iterables in the order of site_fields/capture_fields, and wns is the
+    WNS detection table (constants.wns_dict unless a wns.WNSTable is given).  Each rule is timed as a stage of
+    recorder (see bcs.instrument).
+    Returns an EngineResult of the classified hibernacula, roost and capture DataFrames, the buffer rows
+    (hibernacula, then roost, then capture) and warning messages for dates that could not be parsed."""
+    if current_date is None:
+        current_date = datetime.now()
+    parser = DateParser()
+    with recorder.stage("ReadRows"):
+        sites = read_rows(sites, site_fields)
+        normalize_dates(sites, "VISIT_START_DATE", parser)  # once for both the hibernacula and roost subsets
+        captures = read_rows(captures, capture_fields)
+        normalize_dates(captures, "OBS_DATE", parser)
+    with recorder.stage("Hibernacula"):
+        hib = classify_hibernacula(sites[sites["BIOLOGICAL_SITE_USE"] == "Hibernating"].copy(), wns=wns, recorder=recorder)
+        with recorder.stage("BufferRows"):
+            buffer_rows = hibernacula_buffer_rows(hib)
+    with recorder.stage("Roost"):
+        roost = classify_roosts(sites[sites["BIOLOGICAL_SITE_USE"] == "Perch or Roost"].copy(), current_date, wns=wns,
+                                recorder=recorder)
+        with recorder.stage("BufferRows"):
+            buffer_rows += roost_buffer_rows(roost)
+    with recorder.stage("Capture"):
+        captures = classify_captures(captures, parser, wns, recorder)
+        with recorder.stage("BufferRows"):
+            buffer_rows += capture_buffer_rows(captures)
+    return EngineResult(hib, roost, captures, buffer_rows, parser.report())
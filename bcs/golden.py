@@ -0,0 +1,167 @@
+'''
+Golden-output regression checks of a candidate BCS engine against the original tool's output.
+
+The reference is a golden CSV of buffer rows written by the original BCSBuffering.py, kept with the site and
+capture rows it ran on.  The fixture in tests/golden was written once that way on a bcs.synthetic sample (known org
+codes and parseable dates only, since the original tool stops on the others) with a run date of 2025-01-01.  A
+candidate is any function taking (sites, captures, current_date, wns) and returning an EngineResult or a list of
+BufferRows, such as engine.run or parallel.run.  Its buffer rows are compared with the golden rows as multisets of
+the COMPARE_FIELDS values, grouped per site (Site_CN), so every missing or extra buffer is reported against the
+site it belongs to.
+
+Rules changed on purpose since the original tool (historic hibernacula get their Historical buffer instead of the
+abundance buffers, and orgs whose WNS year is NA are NoWNS instead of PreWNS) are written out row by row in a rule
+change CSV: the COMPARE_FIELDS with a Change column of "removed" or "added".  They are applied to the golden rows
+before the comparison, so the expected output is stated explicitly rather than worked out by the engine under test.
+'''
+
+import csv
+import os
+import time
+from collections import Counter, namedtuple
+
+import pandas as pd
+
+from . import engine
+from .constants import MYSE, MYSO, MYLU, PESU, BATS, bufferFields, siteFields, captureFields
+from .wns import DEFAULT_TABLE
+
+#Buffer row fields that have to match
+COMPARE_FIELDS = ["Site_CN", "BufferClass", "BufferType", "BufferDistance", "Species", "Exempt"]
+
+#Site and capture rows kept by the BCSBuffering.py exports (pyqrySiteCatBio and pyqryCapture)
+SITE_SPECIES = [MYSE, MYSO, MYLU] + PESU + [BATS]
+CAPTURE_SPECIES = [MYSE, MYSO, MYLU] + PESU
+CAPTURE_METHODS = ["In Hand", "Visual"]
+
+#Files of a golden fixture folder (see read_fixture); the rule change file is optional
+FIXTURE_FILES = {"sites": "sites.csv", "captures": "captures.csv", "golden": "baseline.csv", "changes": "rule_changes.csv"}
+
+#Outcome of one comparison.  divergences is {Site_CN: (missing, extra)}: Counters of COMPARE_FIELDS tuples the
+#candidate left out or added compared with the golden rows after the rule changes; changed_sites is the number of
+#sites the rule changes touched
+Comparison = namedtuple("Comparison", ["candidate_seconds", "reference_rows", "candidate_rows", "divergences",
+                                       "changed_sites"])
+
+
+def gi_export(sites, captures):
+    """The rows of GI Site and Capture DataFrames that BCSBuffering.py exports (the pyqrySiteCatBio and
+    pyqryCapture queries).  SITE_CATEGORY is only checked when the column is there."""
+    keep = sites["OBS_SCIENTIFIC_NAME"].isin(SITE_SPECIES)
+    if "SITE_CATEGORY" in sites:
+        keep &= sites["SITE_CATEGORY"] == "Biological"
+    return (sites[keep].reset_index(drop=True),
+            captures[captures["SCIENTIFIC_NAME"].isin(CAPTURE_SPECIES) & captures["OBS_METHOD"].isin(CAPTURE_METHODS)].reset_index(drop=True))
+
+
+def read_gi_csv(path, fields, xy_fields):
+    """A GI table exported to CSV as a DataFrame with the given fields.  Text is kept as text (org codes keep
+    their leading zeros), OBS_COUNT is numeric and SHAPE@XY is built from the xy_fields columns."""
+    df = pd.read_csv(path, dtype=str, keep_default_na=False, na_values=[""])
+    if "OBS_COUNT" in df:
+        df["OBS_COUNT"] = pd.to_numeric(df["OBS_COUNT"], errors="coerce")
+    if "SHAPE@XY" not in df:
+        x, y = (pd.to_numeric(df[field], errors="coerce") for field in xy_fields)
+        df["SHAPE@XY"] = list(zip(x, y))
+    if "OID@" not in df:
+        df["OID@"] = range(1, len(df) + 1)
+    return df[[field for field in fields if field in df]]
+
+
+def candidate_rows(candidate, sites, captures, current_date, wns=DEFAULT_TABLE):
+    """Runs a candidate engine on copies of the input.  Returns (seconds, buffer rows)."""
+    sites, captures = sites.copy(), captures.copy()
+    start = time.perf_counter()
+    result = candidate(sites, captures, current_date, wns=wns)
+    seconds = time.perf_counter() - start
+    return seconds, list(getattr(result, "buffer_rows", result))
+
+
+def _by_site(rows, fields):
+    #{Site_CN: Counter of fields tuples} for buffer rows in bufferFields order (or dicts with those keys).  Values
+    #are compared as text, like they are stored in the golden CSV
+    index = [bufferFields.index(field) for field in fields]
+    sites = {}
+    for row in rows:
+        values = [row[field] for field in fields] if isinstance(row, dict) else [row[i] for i in index]
+        values = tuple("" if value is None else str(value) for value in values)
+        sites.setdefault(values[0], Counter())[values] += 1
+    return sites
+
+
+def diff(reference, candidate, fields=COMPARE_FIELDS):
+    """Per site differences between two sets of buffer rows: {Site_CN: (missing, extra)} for every site whose
+    fields tuples differ.  fields must start with Site_CN."""
+    reference, candidate = _by_site(reference, fields), _by_site(candidate, fields)
+    divergences = {}
+    for site in list(reference) + [site for site in candidate if site not in reference]:
+        expected, actual = reference.get(site, Counter()), candidate.get(site, Counter())
+        if expected != actual:
+            divergences[site] = (expected - actual, actual - expected)
+    return divergences
+
+
+def apply_changes(golden, changes):
+    """The golden rows (dicts with the COMPARE_FIELDS keys) with the rule changes applied: each "removed" row is
+    taken out once and each "added" row put in.  Raises ValueError for a removed row that is not in the golden rows."""
+    rows = Counter(tuple(row[field] for field in COMPARE_FIELDS) for row in golden)
+    for change in changes:
+        values = tuple(change[field] for field in COMPARE_FIELDS)
+        if change["Change"] == "added":
+            rows[values] += 1
+        elif change["Change"] == "removed" and rows[values]:
+            rows[values] -= 1
+        else:
+            raise ValueError("rule change {} {} does not apply to the golden rows".format(change["Change"], values))
+    return [dict(zip(COMPARE_FIELDS, values)) for values in rows.elements()]
+
+
+def compare(sites, captures, golden, current_date, candidate=engine.run, wns=DEFAULT_TABLE, changes=()):
+    """Runs the candidate on the sites and captures (exported rows with the constants.siteFields/captureFields
+    columns) and compares its buffer rows with the golden rows (from read_golden) after the rule changes.
+    current_date has to be the run date the golden rows were written with.  Returns a Comparison."""
+    sites, captures = engine.read_rows(sites, siteFields), engine.read_rows(captures, captureFields)
+    reference = apply_changes(golden, changes)
+    candidate_seconds, rows = candidate_rows(candidate, sites, captures, current_date, wns)
+    return Comparison(candidate_seconds, len(reference), len(rows), diff(reference, rows),
+                      len(set(change["Site_CN"] for change in changes)))
+
+
+def write_golden(path, rows):
+    """Writes buffer rows to a golden CSV of the COMPARE_FIELDS."""
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(COMPARE_FIELDS)
+        writer.writerows(row for site in _by_site(rows, COMPARE_FIELDS).values() for row in sorted(site.elements()))
+
+
+def read_golden(path):
+    """Reads the rows of a golden or rule change CSV as dicts, which diff and compare take like buffer rows."""
+    with open(path, newline="") as f:
+        return list(csv.DictReader(f))
+
+
+def read_fixture(folder):
+    """Reads a golden fixture folder (FIXTURE_FILES): the GI site and capture exports, the golden rows the original
+    tool wrote for them and the rule changes since.  Returns (sites, captures, golden, changes)."""
+    path = dict((key, os.path.join(folder, name)) for key, name in FIXTURE_FILES.items())
+    sites = read_gi_csv(path["sites"], siteFields, ["LONGITUDE", "LATITUDE"])
+    captures = read_gi_csv(path["captures"], captureFields, ["CENTROID_LON", "CENTROID_LAT"])
+    changes = read_golden(path["changes"]) if os.path.exists(path["changes"]) else []
+    return sites, captures, read_golden(path["golden"]), changes
+
+
+def report(comparison, limit=20):
+    """Message lines for a Comparison: the row counts and timing, the number of sites changed on purpose, then the
+    first limit diverging sites."""
+    lines = ["golden {:,} rows ({:,} sites with rule changes), candidate {:,} rows ({:.2f} s)".format(
+        comparison.reference_rows, comparison.changed_sites, comparison.candidate_rows, comparison.candidate_seconds)]
+    if not comparison.divergences:
+        lines.append("no divergence")
+        return lines
+    lines.append("{:,} sites diverge".format(len(comparison.divergences)))
+    for site, (missing, extra) in list(comparison.divergences.items())[:limit]:
+        lines.append("  site {}".format(site))
+        lines.extend("    missing {} x{}".format(row[1:], count) for row, count in sorted(missing.items()))
+        lines.extend("    extra   {} x{}".format(row[1:], count) for row, count in sorted(extra.items()))
+    return lines
@@ -0,0 +1,80 @@
+'''
+Change detection for incremental BCSBuffering runs.
+
+Every buffer depends only on the rows of one site (SITE_CN) for hibernacula and roosts, or of one capture site
+(SITE_NAME) for captures.  fingerprints hashes those rows per key, together with what the rules read from outside
+the rows (the org's WNS year and whether a snag visit is within 10 years of the run date).  compare against the
+fingerprints stored by the last run gives the keys whose buffers must be rebuilt and the keys that are gone, so a
+run only classifies and buffers the changed sites and patches the existing buffer layer.
+'''
+
+import numpy as np
+import pandas as pd
+
+from .constants import siteFields, captureFields
+from .wns import DEFAULT_TABLE
+
+#Sources of the fingerprint keys, with the key field of each
+SITE_SOURCE = "Site"
+CAPTURE_SOURCE = "Capture"
+KEY_FIELDS = {SITE_SOURCE: "SITE_CN", CAPTURE_SOURCE: "SITE_NAME"}
+
+#Fields of the state table the fingerprints are stored in
+stateFields = ["Source", "SiteKey", "Fingerprint"]
+
+
+def _key_hashes(df, key_field, columns):
+    #order independent sum of the row hashes per key, with the row count.  Numbers are hashed as floats so a column
+    #picking up a null (int -> float) does not change the fingerprint of every key
+    frame = df[columns]
+    numeric = [column for column in columns if pd.api.types.is_numeric_dtype(frame[column])]
+    frame = frame.astype(dict((column, np.float64) for column in numeric))
+    hashes = pd.util.hash_pandas_object(frame, index=False).to_numpy()
+    keys, uniques = pd.factorize(df[key_field], use_na_sentinel=False)
+    totals = np.zeros(len(uniques), dtype=np.uint64)
+    np.add.at(totals, keys, hashes)  # wraps around
+    counts = np.bincount(keys, minlength=len(uniques))
+    return dict((key, "{:016x}-{}".format(total, count)) for key, total, count in zip(uniques, totals, counts))
+
+
+def fingerprints(sites, captures, current_date=None, wns=DEFAULT_TABLE):
+    """Returns {(source, key): fingerprint} for site rows (by SITE_CN) and capture rows (by SITE_NAME).
+    sites/captures are DataFrames with the constants.siteFields/captureFields columns."""
+    from .dates import DateParser
+
+    parser = DateParser()
+    sites = sites.assign(WNS=wns.lookup(sites["FS_UNIT_ID"].to_numpy()))
+    if current_date is not None:
+        #SnagProcess changes with the run date, so snags record which visits are within 10 years
+        age = pd.Timestamp(current_date) - pd.Series(parser.column(sites["VISIT_START_DATE"].to_numpy(dtype=object)), index=sites.index)
+        sites["Recent"] = (sites["SITE_TYPE"] == "Snag") & (age <= pd.Timedelta(days=3650))
+    captures = captures.assign(WNS=wns.lookup(captures["FS_UNIT_ID"].to_numpy()))
+
+    columns = [field for field in siteFields if field != "OID@"] + [column for column in ("WNS", "Recent") if column in sites]
+    result = dict(((SITE_SOURCE, key), value) for key, value in _key_hashes(sites, KEY_FIELDS[SITE_SOURCE], columns).items())
+    columns = [field for field in captureFields if field != "OID@"] + ["WNS"]
+    result.update(((CAPTURE_SOURCE, key), value) for key, value in _key_hashes(captures, KEY_FIELDS[CAPTURE_SOURCE], columns).items())
+    return result
+
+
+def compare(previous, current):
+    """Returns (changed, removed): keys that are new or have a different fingerprint, and keys that are no longer
+    in the data."""
+    changed = set(key for key, value in current.items() if previous.get(key) != value)
+    removed = set(previous) - set(current)
+    return changed, removed
+
+
+def select(sites, captures, keys):
+    """Site and capture rows of the given (source, key) keys."""
+    site_keys = [key for source, key in keys if source == SITE_SOURCE]
+    capture_keys = [key for source, key in keys if source == CAPTURE_SOURCE]
+    return (sites[sites[KEY_FIELDS[SITE_SOURCE]].isin(site_keys)],
+            captures[captures[KEY_FIELDS[CAPTURE_SOURCE]].isin(capture_keys)])
+
+
+def buffer_key(buffer_class, site_cn, site_name):
+    """The (source, key) a buffer record was built from: capture buffers by SiteName, others by Site_CN."""
+    if buffer_class == "Capture":
+        return (CAPTURE_SOURCE, site_name)
+    return (SITE_SOURCE, site_cn)
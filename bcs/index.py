@@ -0,0 +1,28 @@
+'''
+Hashed index of what has already been buffered, shared by the hibernacula, roost and capture buffer generators.
+
+Keys are namespaced by what they track (e.g. ("Roost", "Primary", SITE_CN)) so the three generators can share one
+index without colliding.  Membership and inserts are O(1), replacing the list scans the generators used to do.
+'''
+
+
+class BufferIndex(object):
+    def __init__(self):
+        self._keys = set()
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, key):
+        self._keys.add(key)
+
+    def claim(self, key):
+        """Adds key and returns True if it was not already in the index, otherwise returns False."""
+        if key in self._keys:
+            return False
+        self._keys.add(key)
+        return True
+
@@ -0,0 +1,275 @@
+'''
+Stage level instrumentation for BCSBuffering runs.
+
+A Recorder times nested stages (wall and CPU seconds) and collects rows read, rows written, peak memory and cursor
+open/close counts for each one.  Rows and cursors are counted by wrapping the arcpy.da module (or the bcs.memoryda
+stand-in) with Recorder.cursors, so the legacy rule functions and the adapter's table helpers are measured without
+changing how they use their cursors; geoprocessing tools report their counts with Recorder.add.  Counts go to every
+open stage, so a stage includes the counts of the stages inside it.
+
+Peak memory is the high-water mark of the process at the end of each stage, so the stage a run's peak first
+appears in is the one that grew it.  With trace_memory=True it is instead the peak of the Python (and NumPy)
+allocations traced by tracemalloc during the stage, which is exact per stage but slows the run down.
+
+The report is a list of stages in the order they started, written as JSON and CSV by Recorder.write and summarized
+as message lines by Recorder.summary.
+'''
+
+import csv
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+#Columns of the CSV report, in order
+REPORT_FIELDS = ["Stage", "Depth", "WallSeconds", "CPUSeconds", "RowsRead", "RowsWritten", "PeakMemoryMB",
+                 "CursorsOpened", "CursorsClosed"]
+
+#Counters a stage collects, by the keyword Recorder.add takes
+COUNTERS = ("rows_read", "rows_written", "cursors_opened", "cursors_closed")
+
+
+def process_peak_mb():
+    """High-water mark of the memory used by this process in MB (peak working set on Windows, max RSS elsewhere)."""
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD)] + [
+                (name, ctypes.c_size_t) for name in ("PeakWorkingSetSize", "WorkingSetSize", "QuotaPeakPagedPoolUsage",
+                                                     "QuotaPagedPoolUsage", "QuotaPeakNonPagedPoolUsage",
+                                                     "QuotaNonPagedPoolUsage", "PagefileUsage", "PeakPagefileUsage")]
+
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        kernel32 = ctypes.windll.kernel32
+        kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+        if not ctypes.windll.psapi.GetProcessMemoryInfo(kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb):
+            return float("nan")
+        return counters.PeakWorkingSetSize / 1e6
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1e6 if sys.platform == "darwin" else peak / 1e3  # bytes on macOS, KB on Linux
+
+
+class StageRecord(object):
+    def __init__(self, name, depth):
+        """Measurements of one stage.  name is the path of the stage, e.g. "Legacy/Hibernacula/VisitSequence"."""
+        self.name = name
+        self.depth = depth
+        self.wall_s = self.cpu_s = 0.0
+        self.peak_mb = float("nan")
+        self.counts = dict.fromkeys(COUNTERS, 0)
+        self._start = None
+        self._traced_peak = 0
+
+    def row(self):
+        """The stage as a dict with the REPORT_FIELDS keys."""
+        return {"Stage": self.name, "Depth": self.depth, "WallSeconds": round(self.wall_s, 4),
+                "CPUSeconds": round(self.cpu_s, 4), "RowsRead": self.counts["rows_read"],
+                "RowsWritten": self.counts["rows_written"], "PeakMemoryMB": round(self.peak_mb, 1),
+                "CursorsOpened": self.counts["cursors_opened"], "CursorsClosed": self.counts["cursors_closed"]}
+
+
+class Recorder(object):
+    def __init__(self, trace_memory=False):
+        """Collects StageRecords for one run.  trace_memory measures each stage's peak with tracemalloc instead of
+        the process high-water mark."""
+        self.trace_memory = trace_memory
+        self.stages = []
+        self.started = datetime.now()
+        self._open = []
+
+    def begin(self, name):
+        """Starts a stage inside the innermost open stage.  Returns its StageRecord."""
+        path = "/".join([self._open[-1].name, name]) if self._open else name
+        record = StageRecord(path, len(self._open))
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            #fold the peak so far into the open stages before the peak is reset for this one
+            peak = tracemalloc.get_traced_memory()[1]
+            for parent in self._open:
+                parent._traced_peak = max(parent._traced_peak, peak)
+            tracemalloc.reset_peak()
+        self.stages.append(record)
+        self._open.append(record)
+        record._start = (time.perf_counter(), time.process_time())
+        return record
+
+    def end(self):
+        """Ends the innermost open stage.  Returns its StageRecord."""
+        record = self._open.pop()
+        wall, cpu = record._start
+        record.wall_s = time.perf_counter() - wall
+        record.cpu_s = time.process_time() - cpu
+        if self.trace_memory:
+            record._traced_peak = max(record._traced_peak, tracemalloc.get_traced_memory()[1])
+            record.peak_mb = record._traced_peak / 1e6
+            if self._open:
+                self._open[-1]._traced_peak = max(self._open[-1]._traced_peak, record._traced_peak)
+            else:
+                tracemalloc.stop()
+        else:
+            record.peak_mb = process_peak_mb()
+        return record
+
+    def end_all(self):
+        """Ends every open stage."""
+        while self._open:
+            self.end()
+
+    @contextmanager
+    def stage(self, name):
+        """Context manager around begin/end."""
+        record = self.begin(name)
+        try:
+            yield record
+        finally:
+            while self._open and self._open[-1] is not record:
+                self.end()  # inner stages left open by an exception
+            self.end()
+
+    def add(self, **counts):
+        """Adds counts (rows_read, rows_written, cursors_opened, cursors_closed) to every open stage."""
+        for record in self._open:
+            for key, value in counts.items():
+                record.counts[key] += value
+
+    def cursors(self, da):
+        """Wraps an arcpy.da style module so its Search/Update/InsertCursors count into this recorder."""
+        return CountingCursors(da, self)
+
+    def report(self):
+        """The stages as a list of REPORT_FIELDS dicts, in the order they started."""
+        return [record.row() for record in self.stages]
+
+    def write(self, folder, name, parameters=None):
+        """Writes the report to <folder>/<name>.json (with the run start, end and parameters) and <name>.csv.
+        Returns the two paths."""
+        json_path, csv_path = os.path.join(folder, name + ".json"), os.path.join(folder, name + ".csv")
+        stages = self.report()
+        with open(json_path, "w") as f:
+            json.dump({"started": self.started.isoformat(timespec="seconds"),
+                       "finished": datetime.now().isoformat(timespec="seconds"),
+                       "memory": "traced" if self.trace_memory else "process", "parameters": parameters or {},
+                       "stages": stages}, f, indent=2)
+        with open(csv_path, "w", newline="") as f:
+            writer = csv.DictWriter(f, REPORT_FIELDS)
+            writer.writeheader()
+            writer.writerows(stages)
+        return json_path, csv_path
+
+    def summary(self, max_depth=1):
+        """One message line per stage down to max_depth, indented by depth."""
+        lines = []
+        for record in self.stages:
+            if record.depth > max_depth:
+                continue
+            line = "{}{}: {:.1f} s ({:.1f} s CPU), peak {:.0f} MB".format(
+                "  " * record.depth, record.name.rsplit("/", 1)[-1], record.wall_s, record.cpu_s, record.peak_mb)
+            if record.counts["rows_read"] or record.counts["rows_written"]:
+                line += ", {:,} rows read, {:,} written".format(record.counts["rows_read"], record.counts["rows_written"])
+            if record.counts["cursors_opened"]:
+                line += ", {} cursors".format(record.counts["cursors_opened"])
+            lines.append(line)
+        return lines
+
+
+class NullRecorder(Recorder):
+    """A Recorder that records nothing, the default for code that can be instrumented."""
+
+    def begin(self, name):
+        return None
+
+    def end(self):
+        return None
+
+    @contextmanager
+    def stage(self, name):
+        yield None
+
+    def add(self, **counts):
+        pass
+
+    def cursors(self, da):
+        return da
+
+
+NULL_RECORDER = NullRecorder()
+
+
+class CountingCursors(object):
+    def __init__(self, da, recorder):
+        """arcpy.da style module whose cursors count opens, closes and rows into recorder.  Everything else is
+        passed through to da."""
+        self._da = da
+        self._recorder = recorder
+
+    def __getattr__(self, name):
+        return getattr(self._da, name)
+
+    def SearchCursor(self, *args, **kwargs):
+        return CountingCursor(self._da.SearchCursor(*args, **kwargs), self._recorder)
+
+    def UpdateCursor(self, *args, **kwargs):
+        return CountingCursor(self._da.UpdateCursor(*args, **kwargs), self._recorder)
+
+    def InsertCursor(self, *args, **kwargs):
+        return CountingCursor(self._da.InsertCursor(*args, **kwargs), self._recorder)
+
+
+class CountingCursor(object):
+    def __init__(self, cursor, recorder):
+        """Cursor wrapper that counts rows read and written, and adds them to recorder when it is closed."""
+        self._cursor = cursor
+        self._recorder = recorder
+        self._read = self._written = 0
+        self._closed = False
+        recorder.add(cursors_opened=1)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __enter__(self):
+        self._cursor.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        try:
+            return self._cursor.__exit__(*exc_info)
+        finally:
+            self._close()
+
+    def __iter__(self):
+        for row in self._cursor:
+            self._read += 1
+            yield row
+
+    def __next__(self):
+        row = next(self._cursor)
+        self._read += 1
+        return row
+
+    next = __next__
+
+    def updateRow(self, row):
+        self._written += 1
+        return self._cursor.updateRow(row)
+
+    def insertRow(self, row):
+        self._written += 1
+        return self._cursor.insertRow(row)
+
+    def deleteRow(self, *args):
+        self._written += 1
+        return self._cursor.deleteRow(*args)
+
+    def _close(self):
+        if not self._closed:
+            self._closed = True
+            self._recorder.add(rows_read=self._read, rows_written=self._written, cursors_closed=1)
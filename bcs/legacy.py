@@ -0,0 +1,750 @@
+'''
+Cursor workflow for the BCS rules.
+
+The BCSBuffering.py rule functions in their cursor form, walking the Hib/Roost/Capture feature layers with a
+SearchCursor/UpdateCursor pair per rule and inserting into ptBufferFC.  They started as the original script's
+functions and now carry the same rule changes as bcs.engine (historic hibernacula buffers, unparseable dates left out
+and reported, NoWNS/error for NA, ERR and unknown orgs), so both produce the same ptBufferFC rows; the tool runs this
+workflow when the engine is turned off.  The original tool's output is kept as the golden fixture (bcs.golden).  Every
+function takes the cursor module (arcpy.da or a stand-in with the same SearchCursor/UpdateCursor/InsertCursor
+interface) as its first argument, so this module does not import arcpy.
+'''
+
+import re
+from datetime import datetime, timedelta
+
+from .dates import DateParser
+from .index import BufferIndex
+from .instrument import NULL_RECORDER
+from .wns import DEFAULT_TABLE, NOT_DETECTED, MISSING, label
+from .constants import (MYSE, MYSO, MYLU, PESU, BATS, hbPrimary, hbSecondary1, hbSecondary2, hbTertiary1, hbTertiary2,
+                        rbPrimary, rbPESU, rbMYSE, rbMYSO, rbMYLU, cbPESU, cbMYSE, cbMYSO, cbMYLU)
+
+
+#Function to loop through data and determine visit order.  Most recent visit = 1 and sequential in reverse order
+def VisitSequence(da, featureLayer, parser=None):
+    parser = DateParser() if parser is None else parser #memoized GI date parser shared across the workflow
+        #Create a dictionary to hold the unique combinations and their corresponding dates 
+    visit_dict = {} 
+     
+    # Use a search cursor to iterate through the records and populate the visit_dict 
+    with da.SearchCursor(featureLayer, ["SITE_CN", "VISIT_START_DATE"]) as cursor: 
+        for row in cursor: 
+            key = (row[0]) # withCreate a unique key for SITE_CN and VISIT_CN 
+            visit_date = parser.parse(row[1], "VISIT_START_DATE") # Get the visit date 
+            if visit_date is None: # unparseable dates are recorded by the parser and the record is skipped
+                continue
+            visit_date = visit_date.date()
+            
+     
+            # If the key is not in the dictionary, initialize it with an empty list 
+            if key not in visit_dict: 
+                visit_dict[key] = [] 
+     
+            if visit_date not in visit_dict[key]:
+                # Append the visit date to the corresponding key 
+                visit_dict[key].append(visit_date) 
+            
+    # Create a dictionary to hold the visit order 
+    visit_order_dict = {} 
+
+    # Determine the visit order for each unique key 
+    for key, dates in visit_dict.items(): 
+        # Sort dates in descending order 
+        sorted_dates = sorted(dates, reverse=True) 
+     
+        # Assign visit order starting from 1 for the most recent date 
+        for idx, date in enumerate(sorted_dates): 
+            visit_order_dict[(key, date)] = idx + 1 # Start counting from 1 
+     
+    # Update the VisitNum field in the table 
+    with da.UpdateCursor(featureLayer, ["SITE_CN", "VISIT_START_DATE", "VisitNum"]) as cursor: 
+        for row in cursor: 
+            vsd = parser.parse(row[1], "VISIT_START_DATE") # Get the visit date (cached from the search pass)
+            key = (row[0], vsd.date() if vsd is not None else None) # Create the key for the current row 
+            if key in visit_order_dict: 
+                row[2] = visit_order_dict[key] # Update the VisitNum field 
+            cursor.updateRow(row) # Commit changes to the table 
+
+#Function to Loop through data and determine if most recent visit is a Historic Hib or is its Active and Usable
+#Inputs (input feature layer for processing)
+def HistAct(da, featureLayer):  
+    # Create a dictionary to hold the unique combinations and their corresponding statuses
+    hist_dict = {}
+    # Use a search cursor to iterate through the records and populate the hist_dict 
+    with da.SearchCursor(featureLayer, ["SITE_CN", "VISIT_CN", "VisitNum","VISIT_SITE_STATUS","VISIT_SITE_CONDITION"]) as cursor:
+        for row in cursor:
+            if row[2] == "1":  #determine if the records is the most recent visit.  only process the most recent visit, and ignore the others
+                key = row[0], row[1]  #Create a unique key for SITE_CN and VISIT_CN
+                if key not in hist_dict:
+                    if row[3] == "Inactive" and row[4] == "Usable": # Determine if record is Historic
+                        hist_dict[key] = "Hist"
+                    elif row[3] == "Active" and row[4] == "Usable": # Determine if record is Active
+                        hist_dict[key] = "Act"
+                    elif row[4] == "Unusable": # Determine if record is Unsuable
+                        hist_dict[key] = "Not"
+                    else:                    #Determine if records doesnt meet above criteria
+                        hist_dict[key] = "Unkn"
+                        
+    
+    # Update the Historic field in the table 
+    with da.UpdateCursor(featureLayer, ["SITE_CN", "VISIT_CN", "VisitNum","VISIT_SITE_STATUS","VISIT_SITE_CONDITION","Historic"]) as cursor:
+        for row in cursor:
+            key = (row[0], row[1])  # Create the key for the current row
+            if key in hist_dict:  # process records that the key is found in hist_dict
+                row[5] = hist_dict[key]  # Update the Historic field 
+            else:   # process records whose key is NOT in hist_dict
+                row[5] = "err"  # Update the Historic field 
+            cursor.updateRow(row)   # Commit changes to the table
+
+#Function to process data to determine PrePostWNSDates
+#Inputs (input feature layer for processing, date field (column) name where the date is stored, WNS detection table)
+def PrePostWNSDate(da, featureLayer, vDateLayer, parser=None, wns=DEFAULT_TABLE):
+    parser = DateParser() if parser is None else parser
+    
+    #Loop through input feature class with update cursor
+    with da.UpdateCursor(featureLayer,["FS_UNIT_ID", vDateLayer,"PrePostWNS"]) as cursor:
+        for row in cursor:
+            visit = parser.parse(row[1], vDateLayer) #date column
+            #PreWNS/PostWNS against the org's WNS year, NoWNS for orgs with no WNS date ('NA'), error for 'ERR' and unknown orgs
+            row[2] = label(wns.year(row[0]), visit.year if visit is not None else None)
+            cursor.updateRow(row)
+
+#Function to process Hibernacula Data and populate a dictionary with individual counts per species for orgs with no post wns date
+def haCountIndividuals(da, featureLayer='HibData', wns=DEFAULT_TABLE):        
+    haSpecies_dict = {}     #highest abundance (for orgs with no WNS dates)
+    l3Species_dict = {}     #Last 3 visits (for orgs with a WNS date)
+    
+    value1 = value2 = ''
+    #loops through and populate dictionary with species counts
+    with da.SearchCursor(featureLayer,["SITE_CN", "VISIT_CN", "OBS_COUNT","OBS_SCIENTIFIC_NAME","FS_UNIT_ID","VisitNum"]) as cursor:
+        for row in cursor:
+            key = (row[0], row[1])  # Site Cn number & Visit CN number
+            if row[2]:
+                wnsYear = wns.year(row[4]) #compiled WNS year of the org code (or NOT_DETECTED/INVALID/MISSING)
+                #process if org code has no wns date.
+                if wnsYear == NOT_DETECTED and len(row[4]) >= 4:
+                    #is the key in the haSpecies Dict?
+                    if key in haSpecies_dict:
+                        if row[3] in PESU:
+                            if "PESU" in haSpecies_dict[key]:
+                                haSpecies_dict[key]["PESU"] += row[2]
+                            else:
+                                haSpecies_dict[key]["PESU"] = row[2]
+                        elif row[3] == MYSE:
+                            if "MYSE" in haSpecies_dict[key]:
+                                haSpecies_dict[key]["MYSE"] += row[2]
+                            else:
+                                haSpecies_dict[key]["MYSE"] = row[2]
+                        elif row[3] == MYSO:
+                            if "MYSO" in haSpecies_dict[key]:
+                                haSpecies_dict[key]["MYSO"] += row[2]
+                            else:
+                                haSpecies_dict[key]["MYSO"] = row[2]
+                        elif row[3] == MYLU:
+                            if "MYLU" in haSpecies_dict[key]:
+                                haSpecies_dict[key]["MYLU"] += row[2]
+                            else:
+                                haSpecies_dict[key]["MYLU"] = row[2]
+                        elif row[3] == BATS:
+                            if "BATS" in haSpecies_dict[key]:
+                                haSpecies_dict[key]["BATS"] += row[2]
+                            else:
+                                haSpecies_dict[key]["BATS"] = row[2]   
+                    else:
+                        if row[3] in PESU:
+                            value1 = {"PESU":row[2]}
+                        elif row[3] == MYSE:
+                            value1 = {"MYSE":row[2]}
+                        elif row[3] == MYSO:
+                            value1 = {"MYSO":row[2]}
+                        elif row[3] == MYLU:
+                            value1 = {"MYLU":row[2]}
+                        elif row[3] == BATS:
+                            value1 = {"BATS":row[2]}
+                                                    
+                        if "value1" in locals():
+                            haSpecies_dict[key] = value1
+                        
+                elif wnsYear != NOT_DETECTED and wnsYear != MISSING and len(row[4]) >= 4:
+                    #print("key:{} | Starting WNS Date process".format(key))
+                    if key in l3Species_dict:
+                        if row[3] in PESU:
+                            if "PESU" in l3Species_dict[key]:
+                                if l3Species_dict[key]["PESU"]:
+                                    l3Species_dict[key]["PESU"] += row[2]
+                            else:
+                                l3Species_dict[key]["PESU"] = row[2]
+                        elif row[3] == MYSE:
+                            if "MYSE" in l3Species_dict[key]:
+                                if l3Species_dict[key]["MYSE"]:
+                                    l3Species_dict[key]["MYSE"] += row[2]
+                            else:
+                                l3Species_dict[key]["MYSE"] = row[2]
+                        elif row[3] in MYSO:
+                            if "MYSO" in l3Species_dict[key]:
+                                if l3Species_dict[key]["MYSO"]:
+                                    l3Species_dict[key]["MYSO"] += row[2]
+                            else:
+                                l3Species_dict[key]["MYSO"] = row[2]
+                        elif row[3] == MYLU:
+                            if "MYLU" in l3Species_dict[key]:
+                                if l3Species_dict[key]["MYLU"]:
+                                    l3Species_dict[key]["MYLU"] += row[2]
+                            else:
+                                l3Species_dict[key]["MYLU"] = row[2]  
+                        elif row[3] == BATS:
+                            if "BATS" in l3Species_dict[key]:
+                                if l3Species_dict[key]["BATS"]:
+                                    l3Species_dict[key]["BATS"] += row[2]
+                            else:
+                                 l3Species_dict[key]["BATS"] = row[2]   
+                    else:
+                        if row[3] in PESU:
+                            value2 = {"PESU":row[2]}
+                        elif row[3] == MYSE:
+                            value2 = {"MYSE":row[2]}
+                        elif row[3] == MYSO:
+                            value2 = {"MYSO":row[2]}
+                        elif row[3] == MYLU:
+                            value2 = {"MYLU":row[2]}
+                        elif row[3] == BATS:
+                            value2 = {"BATS":row[2]}
+                            
+                        if "value2" in locals():
+                            l3Species_dict[key] = value2
+
+   #update cursor           
+    with da.UpdateCursor(featureLayer,["SITE_CN", "VISIT_CN", "haMYSE","haPESU","haCOMB","haMYSO","haMYLU","haBATS","PrePostWNS", "FS_UNIT_ID","VisitNum"]) as cursor:
+        for row in cursor:
+            key = (row[0], row[1])
+            if key in haSpecies_dict:
+                if 'MYSE' in haSpecies_dict[key]:
+                    row[2] = haSpecies_dict[key]['MYSE']
+                if 'PESU' in haSpecies_dict[key]:
+                    row[3] = haSpecies_dict[key]['PESU']
+                if 'MYSO' in haSpecies_dict[key]:
+                    row[5] = haSpecies_dict[key]['MYSO']
+                if 'MYLU' in haSpecies_dict[key]:
+                    row[6] = haSpecies_dict[key]['MYLU']
+                if 'BATS' in haSpecies_dict[key]:
+                    row[7] = haSpecies_dict[key]['BATS']    
+                    
+                if 'MYSO' in haSpecies_dict[key] or 'MYLU' in haSpecies_dict[key]:
+                    value1C=0
+                    if 'MYSO' in haSpecies_dict[key]: 
+                        value1C += row[5]
+                    if 'MYLU' in haSpecies_dict[key]:
+                        value1C += row[6]
+                    if value1C >0:
+                        row[4] = value1C
+                    
+                cursor.updateRow(row)  
+            elif key in l3Species_dict:
+                if 'MYSE' in l3Species_dict[key]:
+                    row[2] = l3Species_dict[key]['MYSE']
+                if 'PESU' in l3Species_dict[key]:
+                    row[3] = l3Species_dict[key]['PESU']
+                if 'MYSO' in l3Species_dict[key]:
+                    row[5] = l3Species_dict[key]['MYSO']
+                if 'MYLU' in l3Species_dict[key]:
+                    row[6] = l3Species_dict[key]['MYLU']
+                if 'BATS' in l3Species_dict[key]:
+                    row[7] = l3Species_dict[key]['BATS'] 
+                    
+                if 'MYSO' in l3Species_dict[key] or 'MYLU' in l3Species_dict[key]:
+                    value2C=0
+                    if 'MYSO' in l3Species_dict[key]: 
+                        value2C += row[5]
+                    if 'MYLU' in l3Species_dict[key]:
+                        value2C += row[6]
+                    if value2C >0:
+                        row[4] = value2C
+                    
+                cursor.updateRow(row)
+
+#Function to process Hibernacula data to the pt Feature Layer
+def ptBufferLayerHib(da, featureLayer='HibData', ptBufferFC='ptBufferFC', index=None):
+    #Define in function variables
+    bfHib_dict = {} #Dict to store Hib Buffer Data
+    index = BufferIndex() if index is None else index # Hashed index of what has been processed so we arnt double buffering
+    row_values=[] # list to store the physical records which will be added to the ptBuffer Layer
+
+    #Search Cursor to loop through Hib data for hibernacula
+    with da.SearchCursor(featureLayer,["SITE_CN", "VISIT_CN","VISIT_START_DATE","FS_UNIT_ID",
+                                   "EXEMPT_FROM_PUBLIC","VisitNum","Historic","PrePostWNS","haMYSE",
+                                   "haPESU","haCOMB","haMYSO","haMYLU","haBATS", "OBS_METHOD_TYPE", 
+                                   "VISIT_COMMENTS", "SHAPE@XY", "SITE_NAME", "FS_UNIT_NAME",
+                                   "VISIT_SITE_CONDITION", "VISIT_SITE_STATUS"]) as cursor:
+        #loop through HibData and populate  dictionary with the site_cn and visit_cn as key, and then values as items from the FC
+        for row in cursor:
+            key = row[0] #Site Num
+            orgC = row[3]
+            xy = row[16] #XY Coord Token
+            sName = row[17] #SiteName
+            forest = row[18]
+            
+            #process the historic hib records that havnt been processed yet (looking at the index)
+            #where historic records and the visit is most recent (VisitNum is a text field)
+            if row[6] == "Hist" and str(row[5]) == "1" and index.claim(("Hibernacula", "Historical", key)):
+                
+                #SiteCN, SiteName, Forest, OrgCode, BlufferClass, BufferType, BufferDistance, Species, Comments, Exempt, XY Coords(Token)
+                #add row datato the row value list 
+                row_values.append((key, sName, forest, orgC, "Hibernacula", "Historical", hbPrimary, "BCS", "", row[4] or "N", xy))
+
+
+    #Search Cursor to loop through Hib data of non hibernacula data
+    with da.SearchCursor(featureLayer,["SITE_CN", "VISIT_CN","VISIT_START_DATE","FS_UNIT_ID",
+                                   "EXEMPT_FROM_PUBLIC","VisitNum","Historic","PrePostWNS","haMYSE",
+                                   "haPESU","haCOMB","haMYSO","haMYLU","haBATS", "OBS_METHOD_TYPE", 
+                                   "VISIT_COMMENTS", "SHAPE@XY", "SITE_NAME", "FS_UNIT_NAME",
+                                   "VISIT_SITE_CONDITION", "VISIT_SITE_STATUS"]) as cursor:
+        #loop through HibData and populate  dictionary with the site_cn and visit_cn as key, and then values as items from the FC
+        for row in cursor:
+            key = row[0] #Site Num
+            orgC = row[3]
+            xy = row[16] #XY Coord Token
+            sName = row[17] #SiteName
+            forest = row[18]
+            
+            #loop through records that havnt been processed yet (looking at the index)
+            if ("Hibernacula", "Historical", key) not in index:
+            
+                if row[19] == "Usable" and row[20] == "Active":
+                                
+                    if len(row[3]) >=4 and row[7] != "PreWNS":
+                        if key in bfHib_dict:
+                            if row[7] == "NoWNS":
+                                
+                                '''??? should the following elifs under this if statement and the next elif statment be if statements?'''
+                                if row[9] is not None:
+                                    if 'PESU' in bfHib_dict[key]:
+                                        if row[9] > bfHib_dict[key]['PESU']:
+                                            bfHib_dict[key]['PESU'] = row[9]
+                                    else:
+                                        bfHib_dict[key]['PESU'] = row[9]
+                                
+                                if row[8] is not None:
+                                    if 'MYSE' in bfHib_dict[key]: 
+                                        if row[8] > bfHib_dict[key]['MYSE']:
+                                            bfHib_dict[key]['MYSE'] = row[8]
+                                    else:
+                                        bfHib_dict[key]['MYSE'] = row[8]
+                                if row[10] is not None:
+                                    if 'COMB' in bfHib_dict[key]: 
+                                        if row[10] > bfHib_dict[key]['COMB']:
+                                            bfHib_dict[key]['COMB'] = row[10]
+                                    else:
+                                        bfHib_dict[key]['COMB'] = row[10]
+                                if row[13] is not None:
+                                    if 'BATS' in bfHib_dict[key]:
+                                        if row[13] > bfHib_dict[key]['BATS']:
+                                            bfHib_dict[key]['BATS'] = row[13]
+                                    else:
+                                        bfHib_dict[key]['BATS'] = row[13]
+                            elif row[7] == "PostWNS" and int(row[5]) <= 3:
+                                
+                                if row[9] is not None:
+                                    if 'PESU' in bfHib_dict[key]:
+                                        if row[9] > bfHib_dict[key]['PESU']:
+                                            bfHib_dict[key]['PESU'] = row[9]
+                                    else:
+                                        bfHib_dict[key]['PESU'] = row[9]
+                                
+                                if row[8] is not None:
+                                    if 'MYSE' in bfHib_dict[key]: 
+                                        if row[8] > bfHib_dict[key]['MYSE']:
+                                            bfHib_dict[key]['MYSE'] = row[8]
+                                    else:
+                                        bfHib_dict[key]['MYSE'] = row[8]
+                                if row[10] is not None:
+                                    if 'COMB' in bfHib_dict[key]: 
+                                        if row[10] > bfHib_dict[key]['COMB']:
+                                            bfHib_dict[key]['COMB'] = row[10]
+                                    else:
+                                        bfHib_dict[key]['COMB'] = row[10]
+                                if row[13] is not None:
+                                    if 'BATS' in bfHib_dict[key]:
+                                        if row[13] > bfHib_dict[key]['BATS']:
+                                            bfHib_dict[key]['BATS'] = row[13]
+                                    else:
+                                        bfHib_dict[key]['BATS'] = row[13]
+                        else:
+                            
+                            if row[2]:
+                                bfHib_dict[key] = {'date':row[2]}
+                            if row[3]:
+                                bfHib_dict[key]['org'] = row[3]                                           
+                            if row[4]:
+                                bfHib_dict[key]['exempt'] = row[4]
+                            if row[5]:
+                                bfHib_dict[key]['vnum'] = row[5]
+                            if row[6]:
+                                bfHib_dict[key]['hist'] = row[6]
+                            if row[7]:
+                                bfHib_dict[key]['wns'] = row[7]
+                            if row[8]:
+                                bfHib_dict[key]['MYSE'] = row[8]
+                            if row[9]:
+                                bfHib_dict[key]['PESU'] = row[9]
+                            if row[10]:
+                                bfHib_dict[key]['COMB'] = row[10]
+                            if row[11]:
+                                bfHib_dict[key]['MYSO'] = row[11]
+                            if row[12]:
+                                bfHib_dict[key]['MYLU'] = row[12]
+                            if row[13]:
+                                bfHib_dict[key]['BATS'] = row[13]
+                            if row[14]:
+                                bfHib_dict[key]['OMT'] = row[14] # OBS_METHOD_TYPE field
+                            if row[15]:
+                                bfHib_dict[key]['VLID'] = row[15] # VISIT_LOCAL_ID field
+                            if row[17]:
+                                bfHib_dict[key]['name'] = row[17]
+                            if row[18]:
+                                bfHib_dict[key]['forest'] = row[18]
+                            
+                            bfHib_dict[key]['XY'] = xy
+                            
+    #loop through bfHib_dict (which should be a record per site) and process the key values into rews and 
+    #append to the row_values list to be proceessed into the new FC    
+    for d in bfHib_dict:
+        key = d
+        orgC = bfHib_dict[d]['org']
+        sName = bfHib_dict[d]['name']
+        forest = bfHib_dict[key]['forest']
+        if 'exempt' in bfHib_dict[d]:
+            exempt = bfHib_dict[d]['exempt']
+        else:
+            exempt = "N"
+        #if bfHib_dict[d]['hist']=='Act':
+        if 'PESU' in bfHib_dict[d]:
+            count = bfHib_dict[d]['PESU']
+            if count == 0:
+                #SiteCN, SiteName, OrgCode, BlufferClass, BufferType, BufferDistance, Species, Comments, Exempt, XY Coords(Token)
+                row_values.append((key, sName, forest, orgC, "Hibernacula", "Primary", hbPrimary, "PESU","", exempt, bfHib_dict[d]['XY']))
+                row_values.append((key, sName, forest, orgC, "Hibernacula", "Secondary", hbSecondary1, "PESU", "", exempt, bfHib_dict[d]['XY']))
+                row_values.append((key, sName, forest, orgC, "Hibernacula", "Tertiary", hbTertiary1, "PESU", "", exempt, bfHib_dict[d]['XY']))
+            if count >= 1:
+                row_values.append((key, sName, forest, orgC, "Hibernacula", "Primary", hbPrimary, "PESU","", exempt, bfHib_dict[d]['XY']))
+            if count >= 10:
+                row_values.append((key, sName, forest, orgC, "Hibernacula", "Secondary", hbSecondary1, "PESU", "", exempt, bfHib_dict[d]['XY']))
+            if count >= 20:
+                row_values.append((key, sName, forest, orgC, "Hibernacula", "Tertiary", hbTertiary1, "PESU", "", exempt, bfHib_dict[d]['XY']))
+            
+        if 'MYSE' in bfHib_dict[d]:
+            count = bfHib_dict[d]['MYSE']
+            if 'VLID' in bfHib_dict[d] and re.search(r'\b' + re.escape("internal") + r'\b',bfHib_dict[d]['VLID'], re.IGNORECASE):#internal count
+                if count == 0:
+                    #SiteCN, SiteName, OrgCode, BlufferClass, BufferType, BufferDistance, Species, Comments, Exempt, XY Coords(Token)
+                    row_values.append((key, sName, forest, orgC, "Hibernacula", "Primary", hbPrimary, "MYSE","", exempt, bfHib_dict[d]['XY']))
+                    row_values.append((key, sName, forest, orgC, "Hibernacula", "Secondary", hbSecondary1, "MYSE", "", exempt, bfHib_dict[d]['XY']))
+                    row_values.append((key, sName, forest, orgC, "Hibernacula", "Tertiary", hbTertiary1, "MYSE", "", exempt, bfHib_dict[d]['XY']))
+            
+                if count >= 1:
+                    row_values.append((key, sName, forest, orgC, "Hibernacula", "Secondary", hbSecondary1, "MYSE", "", exempt, bfHib_dict[d]['XY']))
+                if count >= 5:
+                    row_values.append((key, sName, forest, orgC, "Hibernacula", "Tertiary", hbTertiary1, "MYSE", "", exempt, bfHib_dict[d]['XY']))
+            else: #external count
+                if count == 0:
+                    #SiteCN, SiteName, OrgCode, BlufferClass, BufferType, BufferDistance, Species, Comments, Exempt, XY Coords(Token)
+                    row_values.append((key, sName, forest, orgC, "Hibernacula", "Primary", hbPrimary, "MYSE","", exempt, bfHib_dict[d]['XY']))
+                    row_values.append((key, sName, forest, orgC, "Hibernacula", "Secondary", hbSecondary1, "MYSE", "", exempt, bfHib_dict[d]['XY']))
+                    row_values.append((key, sName, forest, orgC, "Hibernacula", "Tertiary", hbTertiary1, "MYSE", "", exempt, bfHib_dict[d]['XY']))
+                
+                if count >= 1:
+                    row_values.append((key, sName, forest, orgC, "Hibernacula", "Primary", hbPrimary, "MYSE","", exempt, bfHib_dict[d]['XY']))
+                if count >= 10:
+                    row_values.append((key, sName, forest, orgC, "Hibernacula", "Secondary", hbSecondary1, "MYSE", "", exempt, bfHib_dict[d]['XY']))
+                if count >= 20:
+                    row_values.append((key, sName, forest, orgC, "Hibernacula", "Tertiary", hbTertiary1, "MYSE", "", exempt, bfHib_dict[d]['XY']))
+        
+        if 'COMB' in bfHib_dict[d]:
+            count = bfHib_dict[d]['COMB']
+            if count == 0:
+                #SiteCN, SiteName, OrgCode, BlufferClass, BufferType, BufferDistance, Species, Comments, Exempt, XY Coords(Token)
+                row_values.append((key, sName, forest, orgC, "Hibernacula", "Primary", hbPrimary, "MYSO/MYLU","", exempt, bfHib_dict[d]['XY']))
+                row_values.append((key, sName, forest, orgC, "Hibernacula", "Secondary", hbSecondary2, "MYSO/MYLU", "", exempt, bfHib_dict[d]['XY']))
+                row_values.append((key, sName, forest, orgC, "Hibernacula", "Tertiary", hbTertiary2, "MYSO/MYLU", "", exempt, bfHib_dict[d]['XY']))
+            if count >= 1:
+                row_values.append((key, sName, forest, orgC, "Hibernacula", "Primary", hbPrimary, "MYSO/MYLU","", exempt, bfHib_dict[d]['XY']))
+            if count >= 20:
+                row_values.append((key, sName, forest, orgC, "Hibernacula", "Secondary", hbSecondary2, "MYSO/MYLU", "", exempt, bfHib_dict[d]['XY']))
+            if count >= 5000:
+                row_values.append((key, sName, forest, orgC, "Hibernacula", "Tertiary", hbTertiary2, "MYSO/MYLU", "", exempt, bfHib_dict[d]['XY']))
+            
+                
+    #insert data from row_values list into the new line feature class
+    with da.InsertCursor(ptBufferFC, ['Site_CN', 'SiteName', 'ForestName', 'OrgCode', 'BufferClass', 'BufferType', 'BufferDistance', 'Species', 'BufferComments', 'Exempt', 'SHAPE@XY']) as cursor:
+        for row in row_values:
+            cursor.insertRow(row)
+
+#Function to process Roost data and snags to determine if active snag's most recent visit is less than 10 years, and update FC only if younger than 
+def SnagTime(da, currentDate, featureLayer='RoostData', parser=None):
+    parser = DateParser() if parser is None else parser
+    
+    with da.UpdateCursor(featureLayer,["VISIT_SITE_CONDITION", "VISIT_START_DATE", "SITE_TYPE", "VISIT_SITE_STATUS", "PrePostWNS", "SnagDays", "SnagProcess"]) as cursor:
+        for row in cursor:
+            
+            vDate = parser.parse(row[1], "VISIT_START_DATE") if row[0] == "Usable" and row[3] == "Active" and row[2] == "Snag" else None
+            if vDate is not None:
+                    
+                timeDiff = currentDate - vDate
+                
+                row[5] = timeDiff.days
+                
+                if timeDiff <= timedelta(days = 3650):
+                    row[6] = "Yes"
+                    
+                cursor.updateRow(row)
+
+#Function to process Roost data to determine counts
+def roCountIndividuals(da, featureLayer='RoostData'):
+    roSpecies_dict = {} #Dictionary to hold Roost Data for processing
+
+    with da.SearchCursor(featureLayer,["SITE_CN", "VISIT_CN", "OBS_COUNT","OBS_SCIENTIFIC_NAME","FS_UNIT_ID","Historic", "PrePostWNS", "SnagProcess", "SITE_TYPE", "REPRO_STATUS", "VISIT_SITE_CONDITION","VISIT_SITE_STATUS"]) as cursor:
+        for row in cursor:
+            key = (row[0], row[1])
+            if ((row[10] == "Usable" and row[11] == "Active") and row[6] != "PreWNS" and row[8] != "Snag") or ((row[10] == "Usable" and row[11] == "Active") and row[6] != "PreWNS" and row[8] == "Snag" and row[7] == "Yes"):
+                
+                if key in roSpecies_dict:
+                    if row[3] in PESU:
+                        if "PESU" in roSpecies_dict[key]:
+                            roSpecies_dict[key]["PESU"] += row[2]
+                        else:
+                            roSpecies_dict[key]["PESU"] = row[2]
+                    elif row[3] == MYSE:
+                        if "MYSE" in roSpecies_dict[key]:
+                            roSpecies_dict[key]["MYSE"] += row[2]
+                        else:
+                            roSpecies_dict[key]["MYSE"] = row[2]
+                    elif row[3] in MYSO:
+                        if "MYSO" in roSpecies_dict[key]:
+                            roSpecies_dict[key]["MYSO"] += row[2]
+                        else:
+                            roSpecies_dict[key]["MYSO"] = row[2]
+                    elif row[3] == MYLU:
+                        if "MYLU" in roSpecies_dict[key]:
+                            roSpecies_dict[key]["MYLU"] += row[2]
+                        else:
+                            roSpecies_dict[key]["MYLU"] = row[2]
+                    elif row[3] == BATS:
+                        if "BATS" in roSpecies_dict[key]:
+                            roSpecies_dict[key]["BATS"] += row[2]
+                        else:
+                            roSpecies_dict[key]["BATS"] = row[2]   
+                else:
+                    if row[3] in PESU:
+                        value1 = {"PESU":row[2]}
+                    elif row[3] == MYSE:
+                        value1 = {"MYSE":row[2]}
+                    elif row[3] == MYSO:
+                        value1 = {"MYSO":row[2]}
+                    elif row[3] == MYLU:
+                        value1 = {"MYLU":row[2]}
+                    elif row[3] == BATS:
+                        value1 = {"BATS":row[2]}
+                                                
+                    if "value1" in locals():
+                        roSpecies_dict[key] = value1
+                        
+                    if row[9] == "Reproducing":
+                        roSpecies_dict[key]['Repro'] = "Yes"
+                        
+    #           
+    with da.UpdateCursor(featureLayer,["SITE_CN", "VISIT_CN", "haMYSE","haPESU","haCOMB","haMYSO","haMYLU","haBATS","PrePostWNS", "FS_UNIT_ID","VisitNum"]) as cursor:
+        for row in cursor:
+            key = (row[0], row[1])
+            if key in roSpecies_dict:
+                if 'MYSE' in roSpecies_dict[key]:
+                    row[2] = roSpecies_dict[key]['MYSE']
+                if 'PESU' in roSpecies_dict[key]:
+                    row[3] = roSpecies_dict[key]['PESU']
+                if 'MYSO' in roSpecies_dict[key]:
+                    row[5] = roSpecies_dict[key]['MYSO']
+                if 'MYLU' in roSpecies_dict[key]:
+                    row[6] = roSpecies_dict[key]['MYLU']
+                if 'BATS' in roSpecies_dict[key]:
+                    row[7] = roSpecies_dict[key]['BATS']    
+                    
+                if 'MYSO' in roSpecies_dict[key] or 'MYLU' in roSpecies_dict[key]:
+                    value1C=0
+                    if 'MYSO' in roSpecies_dict[key]: 
+                        value1C += row[5]
+                    if 'MYLU' in roSpecies_dict[key]:
+                        value1C += row[6]
+                    if value1C >0:
+                        row[4] = value1C
+                    
+                cursor.updateRow(row)  
+
+    return roSpecies_dict
+
+#Function to process Roost data and populate the maternity field in the roost data layer
+def maternityRoost(da, roSpecies_dict, featureLayer='RoostData'):
+    with da.UpdateCursor(featureLayer,["SITE_CN", "VISIT_CN", "Maternity"]) as cursor:
+        for row in cursor:
+            key = (row[0], row[1])
+            if key in roSpecies_dict and 'Repro' in roSpecies_dict[key]:
+                row[2] = "Yes"
+                
+            cursor.updateRow(row)
+
+#Function to process Roost data to the pt Feature Layer
+def ptBufferLayerRoost(da, featureLayer='RoostData', ptBufferFC='ptBufferFC', index=None):
+    index = BufferIndex() if index is None else index #hashed index of processed sites and which site/species have reproducing
+    row_values = []  #list to hold values to be added to the pt buffer layer
+
+    with da.SearchCursor(featureLayer, ["SITE_CN", "FS_UNIT_ID", "EXEMPT_FROM_PUBLIC", 
+                                            "Historic", "PrePostWNS", "haMYSE", "haPESU", 
+                                            "haMYSO", "haMYLU", "SnagProcess", 
+                                            "REPRO_STATUS", "SHAPE@XY", "OBS_SCIENTIFIC_NAME", 
+                                            "SITE_NAME", "FS_UNIT_NAME", "SITE_TYPE",
+                                            "VISIT_SITE_CONDITION", "VISIT_SITE_STATUS"]) as cursor:
+        for row in cursor:
+            key = row[0]
+            key2 = (row[0], row[12])
+            orgC = row[1]
+            if row[2] is not None:
+                if row[2] == "Y":
+                    exempt = "Y"
+                else:
+                    exempt = "N"
+            else:
+                exempt = "N"
+            xy = row[11]
+            sName = row[13]
+            forest =row[14]
+            
+            if row[3] == "Act" and row[4] == "PostWNS" and (row[15] != "Snag" or (row[15] == "Snag" and row[9] == "Yes")):
+                if index.claim(("Roost", "Primary", key)):
+                    row_values.append((key, sName, forest, orgC, "Roost", "Primary", rbPrimary, "", "", exempt, xy))
+            
+            
+            
+            
+            if any(item is not None for item in (row[5], row[6], row[7], row[8])) and row[16] == "Usable" and row[17] == "Active" and row[4] == "PostWNS" and (row[15] != "Tree" or (row[15] == "Tree" and row[9] == "Yes")):         
+                
+                if row[10] == "Reproducing" and index.claim(("Roost", "Maternity") + key2):
+                    if row[6] is not None:
+                        row_values.append((key, sName, forest, orgC, "Roost", "Maternity", rbPESU, 'PESU', '', exempt, xy))                    
+                    if row[5] is not None:
+                        row_values.append((key, sName, forest, orgC, "Roost", "Maternity", rbMYSE, 'MYSE', '', exempt, xy))                    
+                    if row[7] is not None:
+                        row_values.append((key, sName, forest, orgC, "Roost", "Maternity", rbMYSO, 'MYSO', '', exempt, xy))                    
+                    if row[8] is not None:
+                        row_values.append((key, sName, forest, orgC, "Roost", "Maternity", rbMYLU, 'MYLU', '', exempt, xy))                    
+
+
+
+    with da.InsertCursor(ptBufferFC, ['Site_CN', 'SiteName', 'ForestName', 'OrgCode', 
+                                'BufferClass', 'BufferType', 'BufferDistance', 'Species', 'BufferComments', 'Exempt', 'SHAPE@XY']) as cursor:
+            for row in row_values:
+                cursor.insertRow(row)      
+
+#Function to process Capture data to the pt Feature layer
+def ptBufferLayerCapture(da, featureLayer='CaptureData', ptBufferFC='ptBufferFC', index=None, parser=None):
+    parser = DateParser() if parser is None else parser
+    row_values = []  #List to hold values to be added to the ptBuffer Layer
+    index = BufferIndex() if index is None else index #Hashed index that will hold which uniques values were processed
+
+    #loop thorugh the Capture Data with the search cursor
+    with da.SearchCursor(featureLayer,['OBS_CN', 'OBS_DATE', 'PrePostWNS', 
+                                        'REPRODUCTIVE_STATUS', 'SCIENTIFIC_NAME', 'EXEMPT_FROM_PUBLIC', 
+                                        'SHAPE@XY', 'FS_UNIT_ID', 'SITE_NAME', 'FS_UNIT_NAME', 
+                                        'AGE', 'OBS_METHOD', 'SITE_TYPE']) as cursor:
+        for row in cursor:
+
+            key = row[0] #Observation Number
+            key2 = (row[8], row[4]) #Combination of Observation Number & Scientific Name
+            #determine if record is exempt from public distribution or not
+            if row[5] is not None:
+                if row[5] == "Y":
+                    exempt = "Y"
+                else:
+                    exempt = "N"
+            else:
+                exempt = "N"
+            xy = row[6] #XY Coords Token
+            orgC =row[7] #Org Code
+            sName = row[8] #Site Name
+            forest = row[9] #Forest Name
+
+            #Determine the Visit Date (with or without time in the value), skipping records whose date can not be parsed
+            vDate = parser.parse(row[1], "OBS_DATE")
+            if vDate is None:
+                continue
+            #For the next 3 variables, the year (2000) is irrelevant but has to be added for the process to work.
+            targetDate = datetime(2000, vDate.month, vDate.day)  #this is the visit date from the data
+            startDate = datetime(2000, 4, 15) #start date from the BCS
+            endDate = datetime(2000, 8, 15)  #end date from the BCS
+
+            #if records has not been processed, and visit date falls within date range, and the visit is not PreWNS or error, and is reproductive or a juvenile, and a BCS species
+            if ("Capture", "Maternity") + key2 not in index and (startDate <= targetDate <= endDate) and row[2] not in ("PreWNS", "error") and (row[3] == "Reproducing" or row[10] == "Juvenile" )and row[4] in ('Myotis septentrionalis','Myotis sodalis', 'Myotis lucifugus', 'Perimyotis subflavus', 'Pipistrellus subflavus') and row[11] == 'In Hand' and row[12] == 'Sample Point':
+                
+                if row[4] in PESU:
+                    row_values.append((key, sName, forest, orgC, "Capture", "Maternity", cbPESU, 'PESU', '', exempt, xy))
+                elif row[4] == MYSE:
+                    row_values.append((key, sName, forest, orgC, "Capture", "Maternity", cbMYSE, 'MYSE', '', exempt, xy))
+                elif row[4] == MYSO:
+                    row_values.append((key, sName, forest, orgC, "Capture", "Maternity", cbMYSO, 'MYSO', '', exempt, xy))
+                elif row[4] == MYLU:
+                    row_values.append((key, sName, forest, orgC, "Capture", "Maternity", cbMYLU, 'MYLU', '', exempt, xy))
+                    
+                index.add(("Capture", "Maternity") + key2)
+    # with the insert cursor loop through the list of row values and add each item as a record in the pt buffer layer            
+    with da.InsertCursor(ptBufferFC, ['Site_CN', 'SiteName', 'ForestName', 'OrgCode', 'BufferClass', 'BufferType', 'BufferDistance', 'Species', 'BufferComments', 'Exempt', 'SHAPE@XY']) as cursor:
+                for row in row_values:
+                    cursor.insertRow(row)
+
+
+#Function to run the full legacy workflow over the HibData, RoostData and CaptureData layers into ptBufferFC
+#Returns warning messages (e.g. dates that could not be parsed)
+def run(da, currentDate=None, wns=DEFAULT_TABLE, recorder=NULL_RECORDER):
+    if currentDate is None:
+        currentDate = datetime.now()
+    index = BufferIndex() #shared by the three buffer generators
+    parser = DateParser() #shared GI date parser, each distinct date string is parsed once
+    da = recorder.cursors(da) #count the cursors and rows of each function (see bcs.instrument)
+
+    #Hibernacula
+    recorder.begin("Hibernacula")
+    with recorder.stage("VisitSequence"):
+        VisitSequence(da, 'HibData', parser)
+    with recorder.stage("HistAct"):
+        HistAct(da, 'HibData')
+    with recorder.stage("PrePostWNSDate"):
+        PrePostWNSDate(da, 'HibData', "VISIT_START_DATE", parser, wns)
+    with recorder.stage("haCountIndividuals"):
+        haCountIndividuals(da, wns=wns)
+    with recorder.stage("ptBufferLayerHib"):
+        ptBufferLayerHib(da, index=index)
+    recorder.end()
+
+    #Roost
+    recorder.begin("Roost")
+    with recorder.stage("VisitSequence"):
+        VisitSequence(da, 'RoostData', parser)
+    with recorder.stage("HistAct"):
+        HistAct(da, 'RoostData')
+    with recorder.stage("PrePostWNSDate"):
+        PrePostWNSDate(da, 'RoostData', "VISIT_START_DATE", parser, wns)
+    with recorder.stage("SnagTime"):
+        SnagTime(da, currentDate, parser=parser)
+    with recorder.stage("roCountIndividuals"):
+        roSpecies_dict = roCountIndividuals(da)
+    with recorder.stage("maternityRoost"):
+        maternityRoost(da, roSpecies_dict)
+    with recorder.stage("ptBufferLayerRoost"):
+        ptBufferLayerRoost(da, index=index)
+    recorder.end()
+
+    #Capture
+    recorder.begin("Capture")
+    with recorder.stage("PrePostWNSDate"):
+        PrePostWNSDate(da, 'CaptureData', 'OBS_DATE', parser, wns)
+    with recorder.stage("ptBufferLayerCapture"):
+        ptBufferLayerCapture(da, index=index, parser=parser)
+    recorder.end()
+
+    return parser.report()
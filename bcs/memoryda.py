@@ -0,0 +1,104 @@
+'''
+In-memory stand-in for the arcpy.da cursors used by bcs.legacy.
+
+Tables are lists of dicts and layers are filtered views of a table, like MakeFeatureLayer with a where clause.
+A MemoryWorkspace has SearchCursor/UpdateCursor/InsertCursor methods, so it can be passed to the legacy
+functions in place of arcpy.da to run the cursor workflow headless (benchmarks, regression checks).
+'''
+
+from .constants import siteDerivedFields, captureDerivedFields, bufferFields
+
+
+class _Cursor(object):
+    def __init__(self, workspace, name, fields):
+        self.fields = list(fields)
+        self._workspace = workspace
+        self._table, self._rows = workspace._resolve(name)
+        workspace.cursor_count += 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+class _SearchCursor(_Cursor):
+    def __iter__(self):
+        fields = self.fields
+        for row in self._rows:
+            yield tuple([row.get(field) for field in fields])
+
+
+class _UpdateCursor(_Cursor):
+    def __iter__(self):
+        fields = self.fields
+        for row in self._rows:
+            self._current = row
+            yield [row.get(field) for field in fields]
+
+    def updateRow(self, values):
+        text_fields = self._workspace.text_fields.get(self._table, ())
+        for field, value in zip(self.fields, values):
+            #text fields store what is written as text, like a geodatabase TEXT field
+            if field in text_fields and value is not None:
+                value = str(value)
+            self._current[field] = value
+
+
+class _InsertCursor(_Cursor):
+    def insertRow(self, values):
+        self._workspace.tables[self._table].append(dict(zip(self.fields, values)))
+
+
+class MemoryWorkspace(object):
+    def __init__(self):
+        self.tables = {}
+        self.layers = {}
+        self.text_fields = {}
+        self.cursor_count = 0
+
+    def add_table(self, name, rows=(), fields=(), text_fields=()):
+        """Adds a table of rows (dicts).  fields are added as nulls, and rows get an "OID@" if they have none."""
+        table = []
+        for oid, row in enumerate(rows, 1):
+            row = dict(row)
+            row.setdefault("OID@", oid)
+            for field in fields:
+                row.setdefault(field, None)
+            table.append(row)
+        self.tables[name] = table
+        self.text_fields[name] = set(text_fields)
+        return table
+
+    def make_layer(self, name, table, where=None):
+        """Adds a layer over table.  where is a function of the row dict, or None for all rows."""
+        self.layers[name] = (table, where)
+
+    def _resolve(self, name):
+        table, where = self.layers.get(name, (name, None))
+        rows = self.tables[table]
+        return table, (rows if where is None else [row for row in rows if where(row)])
+
+    def SearchCursor(self, name, fields):
+        return _SearchCursor(self, name, fields)
+
+    def UpdateCursor(self, name, fields):
+        return _UpdateCursor(self, name, fields)
+
+    def InsertCursor(self, name, fields):
+        return _InsertCursor(self, name, fields)
+
+
+def load_bcs(sites, captures):
+    """Returns a MemoryWorkspace laid out like BCSBuffering.py after its exports: rstHibDataLayer and
+    captureDataLayer tables with the derived fields added, the HibData/RoostData/CaptureData layers,
+    and an empty ptBufferFC.  sites and captures are iterables of dicts in the GI output schema."""
+    ws = MemoryWorkspace()
+    ws.add_table("rstHibDataLayer", sites, siteDerivedFields, text_fields=["VisitNum"])
+    ws.add_table("captureDataLayer", captures, captureDerivedFields)
+    ws.add_table("ptBufferFC", fields=bufferFields)
+    ws.make_layer("HibData", "rstHibDataLayer", lambda row: row.get("BIOLOGICAL_SITE_USE") == "Hibernating")
+    ws.make_layer("RoostData", "rstHibDataLayer", lambda row: row.get("BIOLOGICAL_SITE_USE") == "Perch or Roost")
+    ws.make_layer("CaptureData", "captureDataLayer")
+    return ws
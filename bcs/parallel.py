@@ -0,0 +1,94 @@
+'''
+Parallel engine runs partitioned by org code (FS_UNIT_ID).
+
+Every buffer depends only on the rows of one site (SITE_CN) or capture site (SITE_NAME), so the site and capture
+rows are split into one partition per org, the orgs are batched to even out the work, and each batch is run through
+engine.run in a process pool.  The results are merged back with each org's buffer rows together in the order the org
+first appears in the input, so they do not depend on the number of workers or the order they finish in.  Dates are
+parsed once before partitioning, so unparseable values are reported once.
+'''
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from . import engine
+from .constants import siteFields, captureFields
+from .dates import DateParser
+from .instrument import NULL_RECORDER
+from .wns import DEFAULT_TABLE
+
+PARTITION_FIELD = "FS_UNIT_ID"
+
+
+def partitions(sites, captures, field=PARTITION_FIELD):
+    """Splits site and capture DataFrames into [(org, sites, captures)], one per org in order of first appearance.
+    All rows of a site (SITE_CN) or capture site (SITE_NAME) go to the org of its first row, so no site is split."""
+    site_org = sites[field].fillna("").groupby(sites["SITE_CN"].fillna(""), sort=False).transform("first")
+    capture_org = captures[field].fillna("").groupby(captures["SITE_NAME"].fillna(""), sort=False).transform("first")
+    orgs = pd.unique(pd.concat([site_org, capture_org], ignore_index=True))
+    site_groups = dict((org, rows) for org, rows in sites.groupby(site_org, sort=False))
+    capture_groups = dict((org, rows) for org, rows in captures.groupby(capture_org, sort=False))
+    return [(org, site_groups.get(org, sites.iloc[:0]), capture_groups.get(org, captures.iloc[:0])) for org in orgs]
+
+
+def batches(parts, count):
+    """Groups [(org, sites, captures)] partitions into at most count batches of about the same number of rows
+    (largest org first into the smallest batch).  Returns [(sites, captures)]."""
+    bins = [[] for _ in range(max(1, min(count, len(parts))))]
+    sizes = [0] * len(bins)
+    for org, sites, captures in sorted(parts, key=lambda part: len(part[1]) + len(part[2]), reverse=True):
+        smallest = sizes.index(min(sizes))
+        bins[smallest].append((sites, captures))
+        sizes[smallest] += len(sites) + len(captures)
+    return [(pd.concat([sites for sites, captures in group]), pd.concat([captures for sites, captures in group]))
+            for group in bins if group]
+
+
+def _run_batch(task):
+    #runs in a worker process, so it has to be a module level function
+    sites, captures, current_date, wns = task
+    return engine.run(sites, captures, current_date, wns=wns)
+
+
+def _merge(results, parts, warnings):
+    #classified tables back in input order, buffer rows grouped by org in order of first appearance.  Within an
+    #org the rows keep engine order, so the result is the same however the orgs were batched
+    tables = [pd.concat([getattr(result, name) for result in results]).sort_index() for name in ("hibernacula", "roosts", "captures")]
+    site_rank, capture_rank = {}, {}
+    for rank, (org, sites, captures) in enumerate(parts):
+        site_rank.update(dict.fromkeys(sites["SITE_CN"], rank))
+        capture_rank.update(dict.fromkeys(captures["SITE_NAME"], rank))
+    buffer_rows = [row for result in results for row in result.buffer_rows]
+    buffer_rows.sort(key=lambda row: capture_rank[row.SiteName] if row.BufferClass == "Capture" else site_rank[row.Site_CN])
+    return engine.EngineResult(tables[0], tables[1], tables[2], buffer_rows, warnings)
+
+
+def run(sites, captures, current_date=None, workers=None, site_fields=siteFields, capture_fields=captureFields,
+        wns=DEFAULT_TABLE, recorder=NULL_RECORDER):
+    """engine.run over the org partitions in a pool of workers processes (None = one per CPU, 1 = in this process).
+    Orgs are batched into about two batches per worker.  Returns an EngineResult with the classified tables in
+    input order and the buffer rows of each org together, orgs in order of first appearance.  recorder times the
+    partitioning, the workers and the merge; the stages inside the workers are not recorded."""
+    with recorder.stage("Partition"):
+        sites = engine.read_rows(sites, site_fields)
+        captures = engine.read_rows(captures, capture_fields)
+        parser = DateParser()
+        engine.normalize_dates(sites, "VISIT_START_DATE", parser)
+        engine.normalize_dates(captures, "OBS_DATE", parser)
+        parts = partitions(sites, captures)
+        workers = workers or os.cpu_count() or 1
+        tasks = [(batch_sites, batch_captures, current_date, wns) for batch_sites, batch_captures in batches(parts, workers * 2)]
+
+    with recorder.stage("Workers"):
+        if workers == 1 or len(tasks) <= 1:
+            results = [_run_batch(task) for task in tasks]
+        else:
+            with ProcessPoolExecutor(workers) as pool:
+                results = list(pool.map(_run_batch, tasks))
+        if not results:
+            results = [engine.run(sites, captures, current_date, wns=wns)]
+
+    with recorder.stage("Merge"):
+        return _merge(results, parts, parser.report())
@@ -0,0 +1,221 @@
+'''
+Seeded synthetic GI Site and Capture tables for benchmarks and regression checks.
+
+generate builds DataFrames in the Site and Capture GI output schemas (the fields documented in BCSBuffering.py)
+with NumPy (10M site rows in about 12 seconds).  Sites have one to six visits with one to five
+observations each, spread over every org code in the WNS table plus an unknown one, all the BCS species names
+(optionally mixed with non-BCS ones, as in the GI layers before the export queries), internal and external count comments, caves and mines for hibernacula and snags, trees,
+bridges and buildings for roosts.  Captures are grouped on sample points (nets) with a few records each.  Text is
+shared between the rows of a site, visit or net; generating 10M site rows peaks at about 3 GB.
+
+The same seed and sizes always give the same tables.
+'''
+
+import numpy as np
+import pandas as pd
+
+from .constants import MYSE, MYSO, MYLU, PESU, BATS, wns_dict, siteFields, captureFields
+
+#Org codes: every code in the WNS table and one that is not in it
+ORG_CODES = sorted(wns_dict) + ["0999"]
+
+#Scientific names with their share of the observations, the names the GI export queries keep
+SITE_SPECIES = [(MYSE, .25), (MYSO, .15), (MYLU, .25), (PESU[0], .2), (PESU[1], .05), (BATS, .1)]
+CAPTURE_SPECIES = [(MYSE, .3), (MYSO, .2), (MYLU, .25), (PESU[0], .2), (PESU[1], .05)]
+
+#Non-BCS names mixed in with other_species_rate, which the GI export queries (pyqrySiteCatBio/pyqryCapture) drop
+OTHER_SPECIES = [("Eptesicus fuscus", .6), ("Lasiurus borealis", .4)]
+
+#Visit comments, including the internal/external count notes the MYSE rule reads
+VISIT_COMMENTS = [(None, .35), ("", .15), ("internal count", .15), ("Internal and external counts", .05),
+                  ("External count at the portal", .2), ("Exit count", .1)]
+
+#Site types by biological site use
+HIBERNACULA_TYPES = [("Cave", .55), ("Mine", .45)]
+ROOST_TYPES = [("Snag", .35), ("Tree", .45), ("Bridge", .1), ("Building", .1)]
+
+#Extent of the generated points (longitude, latitude), roughly Regions 8 and 9
+EXTENT = (-95.0, 30.0, -67.0, 48.0)
+
+#Site GI output fields not read by the BCS rules, added with gi_fields=True
+SITE_GI_FIELDS = ['SITE_COMMON_NAME', 'SITE_SCIENTIFIC_NAME', 'SITE_TAXON_LEVEL', 'ORIGINATOR_NAME', 'SITE_CATEGORY',
+                  'SITE_ESTABLISHED_DATE', 'SITE_DATA_ORIGIN', 'SITE_ORIGIN', 'SITE_ORIGIN_METHOD', 'SITE_LOCAL_ID',
+                  'SITE_REFERENCE', 'SITE_COMMENTS', 'VISIT_END_DATE', 'VISIT_DATE_MMDD', 'VISITOR', 'VISIT_LOCAL_ID',
+                  'ASSOCIATED_SURVEY_NAME', 'OBS_CN', 'OBS_COMMON_NAME', 'CLASS_NAME', 'LEGEND_CLASS_NAME', 'INDIV_CN',
+                  'INDIVIDUALS', 'AGE', 'GENDER', 'ACTIVITY', 'INDIV_COMMENTS', 'SITE_GEOMETRY_TYPE', 'SITE_GIS_ACRES',
+                  'LONGITUDE', 'LATITUDE']
+
+#Capture GI output fields not read by the BCS rules, added with gi_fields=True
+CAPTURE_GI_FIELDS = ['BA_SOURCE', 'TAXON_LEVEL', 'COMMON_NAME', 'CLASS_NAME', 'LEGEND_CLASS_NAME', 'OBS_INCIDENTAL',
+                     'LAST_VISIT_SITE_STATUS', 'LAST_VISIT_SITE_CONDITION', 'YEAR_TYPE', 'OBS_YEAR', 'GROUP_TYPE',
+                     'OBS_COMMENTS', 'OBS_COUNT', 'INDIVIDUALS', 'GENDER', 'ACTIVITY', 'INDIV_COMMENTS', 'TAXA_STATUS',
+                     'SPATIAL_ID', 'CENTROID_LON', 'CENTROID_LAT']
+
+
+def _choice(r, weighted, size):
+    #values drawn from [(value, weight)] as an object array
+    values = np.empty(len(weighted), dtype=object)
+    values[:] = [value for value, weight in weighted]
+    weights = np.array([weight for value, weight in weighted], dtype=np.float64)
+    return values[r.choice(len(weighted), size, p=weights / weights.sum())]
+
+
+def _labels(prefix, count):
+    #"<prefix><n>" for n = 1..count as an object array
+    labels = np.empty(count, dtype=object)
+    labels[:] = [prefix + str(n) for n in range(1, count + 1)]
+    return labels
+
+
+def _dates(r, size, years, months=(1, 12), bad_date_rate=0.0):
+    #"YYYY/MM/DD" text, some with a time, and a share of values that are not dates
+    year = r.integers(years[0], years[1] + 1, size)
+    month = r.integers(months[0], months[1] + 1, size)
+    day = r.integers(1, 29, size)
+    codes = year * 10000 + month * 100 + day
+    uniques, inverse = np.unique(codes, return_inverse=True)
+    text = np.empty(len(uniques), dtype=object)
+    text[:] = ["%04d/%02d/%02d" % (code // 10000, code // 100 % 100, code % 100) for code in uniques.tolist()]
+    dates = text[inverse.reshape(-1)]
+    timed = r.random(size) < .05
+    dates[timed] = [value + " 10:30" for value in dates[timed]]
+    dates[r.random(size) < bad_date_rate] = "unknown"
+    return dates
+
+
+def _counts(r, size):
+    #OBS_COUNT: mostly low and moderate counts, a few large colonies, some zeros
+    count = np.exp(r.uniform(0, np.log(20), size))
+    band = r.random(size)
+    count[band > .55] = np.exp(r.uniform(np.log(20), np.log(5000), (band > .55).sum()))
+    count[band > .93] = np.exp(r.uniform(np.log(5000), np.log(60000), (band > .93).sum()))
+    count = np.floor(count)
+    count[r.random(size) < .04] = 0
+    return count
+
+
+def _points(r, size):
+    x = r.uniform(EXTENT[0], EXTENT[2], size)
+    y = r.uniform(EXTENT[1], EXTENT[3], size)
+    xy = np.empty(size, dtype=object)
+    xy[:] = list(zip(x.tolist(), y.tolist()))
+    return xy, x, y
+
+
+def _species(r, weighted, size, other_species_rate):
+    names = _choice(r, weighted, size)
+    other = r.random(size) < other_species_rate
+    names[other] = _choice(r, OTHER_SPECIES, other.sum())
+    return names
+
+
+def generate_sites(n_rows, seed=0, years=(2005, 2024), bad_date_rate=0.0, other_species_rate=0.0, gi_fields=False):
+    """Site GI rows (one per observation) as a DataFrame with the constants.siteFields columns.  OID@ numbers the
+    rows from 1; gi_fields adds the rest of the Site GI output fields (SITE_CATEGORY "Biological", LONGITUDE and
+    LATITUDE, the others null).  bad_date_rate and other_species_rate are the shares of visit dates that are not
+    dates and of observations of non-BCS species."""
+    r = np.random.default_rng([seed, 1])
+
+    #sites, visits per site and observations per visit, cut to n_rows
+    n_sites = max(n_rows // 8, 1)
+    while True:
+        visits = r.integers(1, 7, n_sites)
+        obs = r.integers(1, 6, visits.sum())
+        if obs.sum() >= n_rows:
+            break
+        n_sites *= 2
+    visit_site = np.repeat(np.arange(n_sites), visits)
+    row_visit = np.repeat(np.arange(len(obs)), obs)[:n_rows]
+    n_visits = int(row_visit[-1]) + 1 if n_rows else 0
+    row_site = visit_site[row_visit]
+    n_sites = int(row_site[-1]) + 1 if n_rows else 0
+
+    #per site
+    org = _choice(r, [(code, 1.0) for code in ORG_CODES], n_sites)
+    hibernating = r.random(n_sites) < .45
+    use = np.where(hibernating, "Hibernating", "Perch or Roost").astype(object)
+    site_type = np.where(hibernating, _choice(r, HIBERNACULA_TYPES, n_sites), _choice(r, ROOST_TYPES, n_sites))
+    xy, x, y = _points(r, n_sites)
+    forest = np.array(["Forest " + code for code in ORG_CODES], dtype=object)
+    forest_name = forest[np.searchsorted(np.array(ORG_CODES, dtype=object), org)]
+    exempt = _choice(r, [("Y", .3), ("N", .65), (None, .05)], n_sites)
+
+    #per visit
+    visit_date = _dates(r, n_visits, years, bad_date_rate=bad_date_rate)
+    status = _choice(r, [("Active", .7), ("Inactive", .25), ("Unknown", .05)], n_visits)
+    condition = _choice(r, [("Usable", .8), ("Unusable", .15), (None, .05)], n_visits)
+    comments = _choice(r, VISIT_COMMENTS, n_visits)
+
+    sites = pd.DataFrame({
+        "OID@": np.arange(1, n_rows + 1),
+        "SITE_CN": _labels("S", n_sites)[row_site],
+        "VISIT_CN": _labels("V", n_visits)[row_visit],
+        "VISIT_START_DATE": visit_date[row_visit],
+        "FS_UNIT_ID": org[row_site],
+        "FS_UNIT_NAME": forest_name[row_site],
+        "SITE_NAME": _labels("Site ", n_sites)[row_site],
+        "SITE_TYPE": site_type[row_site],
+        "EXEMPT_FROM_PUBLIC": exempt[row_site],
+        "BIOLOGICAL_SITE_USE": use[row_site],
+        "VISIT_SITE_STATUS": status[row_visit],
+        "VISIT_SITE_CONDITION": condition[row_visit],
+        "VISIT_COMMENTS": comments[row_visit],
+        "OBS_METHOD_TYPE": _choice(r, [("Visual", .85), ("Acoustic", .1), ("Capture", .05)], n_rows),
+        "OBS_SCIENTIFIC_NAME": _species(r, SITE_SPECIES, n_rows, other_species_rate),
+        "OBS_COUNT": _counts(r, n_rows),
+        "REPRO_STATUS": _choice(r, [("Reproducing", .25), ("Non-Reproductive", .25), (None, .5)], n_rows),
+        "SHAPE@XY": xy[row_site]}, columns=siteFields)
+    if gi_fields:
+        sites = sites.assign(**dict.fromkeys(SITE_GI_FIELDS))
+        sites["SITE_CATEGORY"] = "Biological"
+        sites["LONGITUDE"], sites["LATITUDE"] = x[row_site], y[row_site]
+    return sites
+
+
+def generate_captures(n_rows, seed=0, years=(2005, 2024), bad_date_rate=0.0, other_species_rate=0.0, gi_fields=False):
+    """Capture GI rows as a DataFrame with the constants.captureFields columns, about four per net (SITE_NAME).
+    Most are in the capture season (April to August).  gi_fields adds the rest of the Capture GI output fields."""
+    r = np.random.default_rng([seed, 2])
+    n_nets = max(n_rows // 4, 1)
+    row_net = np.sort(r.integers(0, n_nets, n_rows))
+
+    #per net
+    org = _choice(r, [(code, 1.0) for code in ORG_CODES], n_nets)
+    xy, x, y = _points(r, n_nets)
+    forest = np.array(["Forest " + code for code in ORG_CODES], dtype=object)
+    forest_name = forest[np.searchsorted(np.array(ORG_CODES, dtype=object), org)]
+    net_type = _choice(r, [("Sample Point", .9), ("Roost", .1)], n_nets)
+
+    in_season = r.random(n_rows) < .85
+    dates = np.where(in_season, _dates(r, n_rows, years, (4, 8), bad_date_rate), _dates(r, n_rows, years, bad_date_rate=bad_date_rate))
+
+    captures = pd.DataFrame({
+        "OID@": np.arange(1, n_rows + 1),
+        "OBS_CN": _labels("O", n_rows),
+        "OBS_DATE": dates,
+        "REPRODUCTIVE_STATUS": _choice(r, [("Reproducing", .3), ("Non-Reproductive", .3), ("Unknown", .4)], n_rows),
+        "SCIENTIFIC_NAME": _species(r, CAPTURE_SPECIES, n_rows, other_species_rate),
+        "EXEMPT_FROM_PUBLIC": _choice(r, [("Y", .2), ("N", .5), (None, .3)], n_rows),
+        "SHAPE@XY": xy[row_net],
+        "FS_UNIT_ID": org[row_net],
+        "SITE_NAME": _labels("Net ", n_nets)[row_net],
+        "FS_UNIT_NAME": forest_name[row_net],
+        "AGE": _choice(r, [("Adult", .6), ("Juvenile", .3), ("Unknown", .1)], n_rows),
+        "OBS_METHOD": _choice(r, [("In Hand", .8), ("Visual", .2)], n_rows),
+        "SITE_TYPE": net_type[row_net]}, columns=captureFields)
+    if gi_fields:
+        captures = captures.assign(**dict.fromkeys(CAPTURE_GI_FIELDS))
+        captures["CENTROID_LON"], captures["CENTROID_LAT"] = x[row_net], y[row_net]
+    return captures
+
+
+def generate(n_rows, seed=0, capture_ratio=0.1, years=(2005, 2024), bad_date_rate=0.0, other_species_rate=0.0,
+             gi_fields=False):
+    """Returns (sites, captures) DataFrames with n_rows site observations and n_rows * capture_ratio captures."""
+    return (generate_sites(n_rows, seed, years, bad_date_rate, other_species_rate, gi_fields),
+            generate_captures(int(n_rows * capture_ratio), seed, years, bad_date_rate, other_species_rate, gi_fields))
+
+
+def records(df):
+    """Rows of a generated table as dicts with None for nulls, e.g. to load into a bcs.memoryda workspace."""
+    return df.astype(object).where(df.notna(), None).to_dict("records")
@@ -0,0 +1,123 @@
+'''
+WNS detection table and PrePostWNS classification.
+
+BCS Table D-1 lists the year White-nose Syndrome was detected for each Forest (org code), 'NA' for Forests where it
+has not been detected and 'ERR' for org codes that can not be classified.  A WNSTable compiles that table once into
+an integer-year array indexed by each org code's position in a sorted code array, so a whole column of visits is
+classified with one lookup and a vectorized compare instead of a dictionary lookup and string compare per row.
+The table can be loaded from a CSV so that updates to Table D-1 do not need a code change.
+'''
+
+import csv
+
+import numpy as np
+
+from .constants import wns_dict
+
+#PrePostWNS values
+PRE_WNS = "PreWNS"
+POST_WNS = "PostWNS"
+NO_WNS = "NoWNS"
+WNS_ERROR = "error"
+
+#Codes stored in place of a year in the compiled array
+NOT_DETECTED = -1   # 'NA': WNS not detected on the Forest
+INVALID = -2        # 'ERR': org code can not be classified
+MISSING = -3        # org code not in the table
+
+
+def _year_code(value):
+    """Returns the compiled code for a Table D-1 year value ('2015', 2015, 'NA' or 'ERR')."""
+    text = str(value).strip().upper()
+    if text == "NA":
+        return NOT_DETECTED
+    if text == "ERR":
+        return INVALID
+    return int(text)
+
+
+def label(wns, year):
+    """PrePostWNS for one compiled wns code and visit year (None if the visit date is unknown).
+
+    'NA' orgs are NoWNS, 'ERR' and missing orgs are error, and a visit with no year can not be shown to be after
+    WNS so it is PreWNS.  Otherwise the visit is PreWNS before the detection year and PostWNS from it on."""
+    if wns == NOT_DETECTED:
+        return NO_WNS
+    if wns < 0:
+        return WNS_ERROR
+    if year is None or year < wns:
+        return PRE_WNS
+    return POST_WNS
+
+
+class WNSTable(object):
+    def __init__(self, years):
+        """years is {org code: detection year, 'NA' or 'ERR'}, like constants.wns_dict."""
+        orgs = sorted(str(org) for org in years)
+        codes = dict((str(org), _year_code(year)) for org, year in years.items())
+        self.orgs = np.array(orgs, dtype=str)
+        #one slot past the last org holds MISSING, so unknown org codes are looked up at index -1
+        self.years = np.array([codes[org] for org in orgs] + [MISSING], dtype=np.int32)
+        self._positions = dict((org, position) for position, org in enumerate(orgs))
+
+    @classmethod
+    def from_csv(cls, path):
+        """Loads a table from a CSV with a header row and the org code and detection year (or NA/ERR) in the
+        first two columns.  Org codes are read as text so leading zeros are kept."""
+        years = {}
+        with open(path, newline="") as csvfile:
+            reader = csv.reader(csvfile)
+            next(reader, None)
+            for line, row in enumerate(reader, 2):
+                if not row or not row[0].strip():
+                    continue
+                if len(row) < 2:
+                    raise ValueError("{} line {}: expected an org code and a WNS year".format(path, line))
+                try:
+                    _year_code(row[1])
+                except ValueError:
+                    raise ValueError("{} line {}: WNS year {!r} is not a year, NA or ERR".format(path, line, row[1]))
+                years[row[0].strip()] = row[1].strip()
+        return cls(years)
+
+    def __contains__(self, org):
+        return org in self._positions
+
+    def __len__(self):
+        return len(self.orgs)
+
+    def year(self, org):
+        """Compiled code for one org code (a year, NOT_DETECTED, INVALID or MISSING)."""
+        return int(self.years[self._positions.get(org, -1)])
+
+    def lookup(self, orgs):
+        """Compiled codes for an array of org codes."""
+        orgs = np.asarray(orgs, dtype=object).astype(str)  # None/NaN become text that matches no org code
+        positions = np.searchsorted(self.orgs, orgs).clip(0, max(len(self.orgs) - 1, 0))
+        found = self.orgs[positions] == orgs if len(self.orgs) else np.zeros(len(orgs), dtype=bool)
+        return self.years[np.where(found, positions, -1)]
+
+    def notes(self):
+        """Message lines on how NA, ERR and unknown orgs are classified.  The original tool compared 'NA' with visit
+        years as text, so NA orgs were PreWNS and got no hibernacula or capture buffers; they are NoWNS now and are
+        buffered by the highest-abundance rule.  ERR and unknown orgs are error and get no buffers."""
+        not_detected = [str(org) for org, wns in zip(self.orgs, self.years) if wns == NOT_DETECTED]
+        invalid = [str(org) for org, wns in zip(self.orgs, self.years) if wns == INVALID]
+        lines = []
+        if not_detected:
+            lines.append("Orgs with no WNS detection (NA: {}) are NoWNS and get hibernacula and capture buffers by the "
+                         "highest-abundance rule; the original tool treated them as PreWNS and wrote none".format(", ".join(not_detected)))
+        lines.append("Orgs marked ERR ({}) and orgs missing from the WNS table are error and get no buffers".format(", ".join(invalid) or "none"))
+        return lines
+
+    def classify(self, orgs, years):
+        """PrePostWNS for arrays of org codes and visit years (NaN where the visit date is unknown)."""
+        wns = self.lookup(orgs)
+        years = np.asarray(years, dtype=float)
+        with np.errstate(invalid="ignore"):
+            post = years >= wns  # False for NaN years
+        return np.select([wns == NOT_DETECTED, wns < 0, post], [NO_WNS, WNS_ERROR, POST_WNS], PRE_WNS).astype(object)
+
+
+#Table built from constants.wns_dict, used when no CSV is given
+DEFAULT_TABLE = WNSTable(wns_dict)
@@ -0,0 +1,4 @@
+'''
+Benchmarks for the tools in this repository.  Run them from the repository root, e.g.
+    python -m benchmarks.bcs_buffer_rows
+'''
@@ -0,0 +1,123 @@
+'''
+Micro-benchmark of the per-visit abundance aggregation: bcs.abundance.visit_abundance against the
+{(SITE_CN, VISIT_CN): {"PESU": ...}} dict-of-dicts loop of the legacy haCountIndividuals/roCountIndividuals.
+
+Observations are generated as NumPy columns (visit code, scientific name, OBS_COUNT).  The dict loop is only run up
+to --dict-max rows; its totals are checked against the kernel's.  Peak memory of the kernel is measured separately
+with tracemalloc, which NumPy reports its allocations to.
+
+    python -m benchmarks.abundance_kernel --sizes 100000 1000000 10000000
+'''
+
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+from bcs import abundance
+from bcs.constants import MYSE, MYSO, MYLU, PESU, BATS
+
+NAMES = np.array([MYSE, MYSO, MYLU, PESU[0], PESU[1], BATS], dtype=object)
+
+
+def observations(n_obs, seed=0):
+    """Returns (visit codes, scientific names, counts) for n_obs observations on about n_obs / 3 visits."""
+    r = np.random.default_rng(seed)
+    visit = np.sort(r.integers(0, max(n_obs // 3, 1), n_obs)).astype(np.int64)
+    names = NAMES[r.integers(0, len(NAMES), n_obs)]
+    count = r.choice(np.array([1, 4, 12, 30, 6000], dtype=np.float64), n_obs)
+    return visit, names, count
+
+
+def dict_counts(visit, names, count):
+    #the legacy per-row if/elif chain into a dict of per-species dicts
+    species_dict = {}
+    for key, name, obs in zip(visit.tolist(), names.tolist(), count.tolist()):
+        if key in species_dict:
+            if name in PESU:
+                if "PESU" in species_dict[key]:
+                    species_dict[key]["PESU"] += obs
+                else:
+                    species_dict[key]["PESU"] = obs
+            elif name == MYSE:
+                if "MYSE" in species_dict[key]:
+                    species_dict[key]["MYSE"] += obs
+                else:
+                    species_dict[key]["MYSE"] = obs
+            elif name == MYSO:
+                if "MYSO" in species_dict[key]:
+                    species_dict[key]["MYSO"] += obs
+                else:
+                    species_dict[key]["MYSO"] = obs
+            elif name == MYLU:
+                if "MYLU" in species_dict[key]:
+                    species_dict[key]["MYLU"] += obs
+                else:
+                    species_dict[key]["MYLU"] = obs
+            elif name == BATS:
+                if "BATS" in species_dict[key]:
+                    species_dict[key]["BATS"] += obs
+                else:
+                    species_dict[key]["BATS"] = obs
+        else:
+            if name in PESU:
+                species_dict[key] = {"PESU": obs}
+            elif name == MYSE:
+                species_dict[key] = {"MYSE": obs}
+            elif name == MYSO:
+                species_dict[key] = {"MYSO": obs}
+            elif name == MYLU:
+                species_dict[key] = {"MYLU": obs}
+            elif name == BATS:
+                species_dict[key] = {"BATS": obs}
+    return species_dict
+
+
+def time_kernel(visit, names, count):
+    start = time.perf_counter()
+    matrix = abundance.visit_abundance(visit, abundance.species_index(names), count)
+    return time.perf_counter() - start, matrix
+
+
+def peak_kernel_mb(visit, names, count):
+    tracemalloc.start()
+    abundance.visit_abundance(visit, abundance.species_index(names), count)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 1e6
+
+
+def time_dict(visit, names, count, matrix):
+    start = time.perf_counter()
+    species_dict = dict_counts(visit, names, count)
+    elapsed = time.perf_counter() - start
+    for key, counts in species_dict.items():
+        for code, total in counts.items():
+            if matrix[key, abundance.SPECIES_INDEX[code]] != total:
+                print("warning: visit {} {} dict {} kernel {}".format(key, code, total, matrix[key, abundance.SPECIES_INDEX[code]]))
+                return elapsed
+    return elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100000, 1000000, 10000000])
+    parser.add_argument("--dict-max", type=int, default=1000000, help="largest size to also run the dict loop on")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    print("{:>12} {:>10} {:>14} {:>10} {:>12} {:>10}".format("observations", "kernel_s", "kernel_obs/s", "peak_MB", "dict_s", "speedup"))
+    for size in args.sizes:
+        visit, names, count = observations(size, args.seed)
+        kernel_s, matrix = time_kernel(visit, names, count)
+        peak = peak_kernel_mb(visit, names, count)
+        dict_s = speedup = ""
+        if size <= args.dict_max:
+            dict_time = time_dict(visit, names, count, matrix)
+            dict_s, speedup = "{:.2f}".format(dict_time), "{:.1f}x".format(dict_time / kernel_s)
+        print("{:>12,} {:>10.2f} {:>14,.0f} {:>10.1f} {:>12} {:>10}".format(size, kernel_s, size / kernel_s, peak, dict_s, speedup))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+'''
+Throughput of the AGOL group member export against the local mock portal (agol.mock), so it runs offline.
+
+Times the original export, one gis.users.get per member, then agol.members.member_rows for each --batch-size and
+--workers pair, on the same mock group.  --latency is the seconds each mock request takes, like a REST round trip,
+and --failure-rate makes that share of member_rows' requests fail so the retries are timed too (the original loop
+has no retries, so it runs without failures).  Every run must return the same rows as the original loop.
+
+    python -m benchmarks.agol_group_members --members 3000 --latency 0.05 --batch-size 50 100 --workers 4 8 16
+'''
+
+import argparse
+import time
+
+from agol import members, mock
+
+
+def serial_rows(gis, admins, users):
+    #The export as 1_AGOLGroupMembers.ipynb did it: one users.get per member
+    rows = []
+    for username in admins + users:
+        user = gis.users.get(username)
+        if user:
+            rows.append(members.member_row(user, "Admin" if username in admins else "User"))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--members", type=int, default=3000)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--batch-size", type=int, nargs="+", default=[50, 100])
+    parser.add_argument("--workers", type=int, nargs="+", default=[4, 8, 16])
+    args = parser.parse_args(argv)
+
+    gis, group_id = mock.mock_portal(args.members, missing=args.members // 100, latency=args.latency)
+    group_members = gis.groups.get(group_id).get_members()
+    admins, users = group_members["admins"], group_members["users"]
+    start = time.perf_counter()
+    expected = serial_rows(gis, admins, users)
+    serial_s = time.perf_counter() - start
+    print("{:,} members, {:,} rows, {} s per request".format(args.members, len(expected), args.latency))
+
+    print("{:>6} {:>8} {:>10} {:>10} {:>12} {:>10}".format("batch", "workers", "requests", "seconds", "members/s", "speedup"))
+    print("{:>6} {:>8} {:>10,} {:>10.2f} {:>12,.0f} {:>10}".format(
+        "get", "1", gis.requests["users.get"], serial_s, args.members / serial_s, "1.0x"))
+    for batch_size in args.batch_size:
+        for workers in args.workers:
+            gis, group_id = mock.mock_portal(args.members, missing=args.members // 100, latency=args.latency,
+                                             failure_rate=args.failure_rate)
+            start = time.perf_counter()
+            rows = members.member_rows(gis, admins, users, batch_size, workers, backoff=args.latency)
+            elapsed = time.perf_counter() - start
+            if rows != expected:
+                print("warning: batch size {} with {} workers returned different rows".format(batch_size, workers))
+            print("{:>6} {:>8} {:>10,} {:>10.2f} {:>12,.0f} {:>10}".format(
+                batch_size, workers, sum(gis.requests.values()), elapsed, args.members / elapsed, "{:.1f}x".format(serial_s / elapsed)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+'''
+Scaling of ptBufferFC row generation from 1k to 1M bcs.synthetic observations.
+
+Times the columnar engine and, up to --legacy-max observations, the legacy cursor workflow run against the
+in-memory cursor stand-in.  Both share the hashed BufferIndex for dedupe, so time should grow roughly linearly
+with the observation count.
+
+    python -m benchmarks.bcs_buffer_rows --sizes 1000 10000 100000 1000000
+'''
+
+import argparse
+import time
+from datetime import datetime
+
+from bcs import engine, legacy, synthetic
+from bcs.memoryda import load_bcs
+
+RUN_DATE = datetime(2025, 1, 1)
+
+
+def time_engine(sites, captures):
+    start = time.perf_counter()
+    result = engine.run(sites, captures, RUN_DATE)
+    return time.perf_counter() - start, len(result.buffer_rows)
+
+
+def time_legacy(sites, captures):
+    ws = load_bcs(synthetic.records(sites), synthetic.records(captures))
+    start = time.perf_counter()
+    legacy.run(ws, RUN_DATE)
+    return time.perf_counter() - start, len(ws.tables["ptBufferFC"])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 1000000])
+    parser.add_argument("--legacy-max", type=int, default=100000, help="largest size to also run the legacy workflow on")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    print("{:>12} {:>12} {:>10} {:>14} {:>10} {:>12}".format("observations", "buffer_rows", "engine_s", "engine_obs/s", "legacy_s", "legacy_obs/s"))
+    for size in args.sizes:
+        sites, captures = synthetic.generate(size, args.seed)
+        engine_s, rows = time_engine(sites, captures)
+        legacy_s = legacy_rate = ""
+        if size <= args.legacy_max:
+            legacy_time, legacy_rows = time_legacy(sites, captures)
+            if legacy_rows != rows:
+                print("warning: legacy produced {} buffer rows, engine {}".format(legacy_rows, rows))
+            legacy_s, legacy_rate = "{:.2f}".format(legacy_time), "{:,.0f}".format(size / legacy_time)
+        print("{:>12,} {:>12,} {:>10.2f} {:>14,.0f} {:>10} {:>12}".format(size, rows, engine_s, size / engine_s, legacy_s, legacy_rate))
+
+
+if __name__ == "__main__":
+    main()
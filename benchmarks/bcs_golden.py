@@ -0,0 +1,50 @@
+'''
+Golden-output regression run of a candidate engine against the original BCSBuffering.py output.
+
+Runs bcs.golden.compare on golden fixture folders (golden.FIXTURE_FILES): GI Site and Capture tables exported to CSV,
+the ptBufferFC rows the original tool wrote for them as baseline.csv and, optionally, the rule changes since as
+rule_changes.csv.  The default is the fixture in tests/golden.  The candidate is the columnar engine or parallel.run
+with --workers.  Every site whose Site_CN, BufferClass, BufferType, BufferDistance, Species or Exempt values differ
+from the golden rows after the rule changes is listed, and the exit status is 1 if any do.
+
+    python -m benchmarks.bcs_golden
+    python -m benchmarks.bcs_golden --fixture golden/forest_0903 --run-date 2024-03-01 --candidate parallel
+'''
+
+import argparse
+import functools
+import os
+import sys
+from datetime import datetime
+
+from bcs import engine, golden, parallel
+
+#Folder of the fixture written with the original tool, and the run date it was written with
+FIXTURE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tests", "golden")
+RUN_DATE = datetime(2025, 1, 1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--fixture", nargs="+", default=[FIXTURE], help="golden fixture folders")
+    parser.add_argument("--run-date", type=lambda text: datetime.strptime(text, "%Y-%m-%d"), default=RUN_DATE,
+                        help="date the golden rows were written on (YYYY-MM-DD)")
+    parser.add_argument("--candidate", choices=["engine", "parallel"], default="engine")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes of the parallel candidate")
+    parser.add_argument("--limit", type=int, default=20, help="diverging sites to list per fixture")
+    args = parser.parse_args(argv)
+
+    candidate = engine.run if args.candidate == "engine" else functools.partial(parallel.run, workers=args.workers)
+    diverged = False
+    for folder in args.fixture:
+        sites, captures, reference, changes = golden.read_fixture(folder)
+        comparison = golden.compare(sites, captures, reference, args.run_date, candidate, changes=changes)
+        print("{} ({:,} site rows, {:,} captures)".format(folder, len(sites), len(captures)))
+        for line in golden.report(comparison, args.limit):
+            print("  " + line)
+        diverged = diverged or bool(comparison.divergences)
+    return 1 if diverged else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
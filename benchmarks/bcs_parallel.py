@@ -0,0 +1,56 @@
+'''
+Core scaling of the engine partitioned by org (bcs.parallel) from 1 to N worker processes.
+
+Runs engine.run once as the sequential baseline, then parallel.run for each --workers count on the same synthetic
+observations.  The buffer rows must be the same list for every worker count and the same rows as the sequential run
+(grouped by org instead of in engine order).  Speedup is against the sequential engine, so it includes the cost of
+partitioning and of sending the partitions to the workers; run it on a machine with at least as many cores as the
+largest worker count.
+
+    python -m benchmarks.bcs_parallel --size 1000000 --workers 1 2 4 8
+'''
+
+import argparse
+import os
+import time
+
+from bcs import engine, parallel, synthetic
+from bcs.constants import siteFields, captureFields
+from benchmarks.bcs_buffer_rows import RUN_DATE
+
+
+def time_run(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=1000000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    sites, captures = synthetic.generate(args.size, args.seed)
+    sites, captures = engine.read_rows(sites, siteFields), engine.read_rows(captures, captureFields)
+    sequential_s, sequential = time_run(engine.run, sites, captures, RUN_DATE)
+    expected = sorted(sequential.buffer_rows, key=repr)
+    print("{:,} observations, {:,} buffer rows, {} CPUs".format(args.size, len(expected), os.cpu_count()))
+
+    print("{:>8} {:>10} {:>14} {:>10}".format("workers", "seconds", "obs/s", "speedup"))
+    print("{:>8} {:>10.2f} {:>14,.0f} {:>10}".format("seq", sequential_s, args.size / sequential_s, "1.0x"))
+    first = None
+    for workers in args.workers:
+        elapsed, result = time_run(parallel.run, sites, captures, RUN_DATE, workers=workers)
+        if first is None:
+            first = result.buffer_rows
+            if sorted(first, key=repr) != expected:
+                print("warning: {} workers produced different buffer rows than the sequential engine".format(workers))
+        elif result.buffer_rows != first:
+            print("warning: {} workers produced different buffer rows than {} workers".format(workers, args.workers[0]))
+        print("{:>8} {:>10.2f} {:>14,.0f} {:>10}".format(workers, elapsed, args.size / elapsed, "{:.1f}x".format(sequential_s / elapsed)))
+
+
+if __name__ == "__main__":
+    main()
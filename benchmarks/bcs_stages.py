@@ -0,0 +1,130 @@
+'''
+Per-stage throughput and peak memory of the BCS workflows on bcs.synthetic data, tracked over time.
+
+For each size the seeded generator builds the Site and Capture tables, then the columnar engine (and, up to
+--legacy-max rows, the legacy cursor workflow on the in-memory cursor stand-in) is run with a bcs.instrument
+Recorder: once to time every stage and once with tracemalloc for each stage's peak memory.  Throughput is site rows
+per second of the stage.
+
+With --history the results are appended to a JSON lines file, one record per size, workflow and stage, and compared
+with the median of the last --baseline records for the same size, seed, workflow and stage.  A stage that is more
+than --tolerance slower (and over --min-seconds) or uses more than --tolerance more memory is reported as a
+regression and the exit status is 1, so the suite can gate a release.
+
+    python -m benchmarks.bcs_stages --sizes 1000 100000 1000000 10000000 --history bcs_stages.jsonl
+'''
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+from bcs import engine, legacy, synthetic
+from bcs.instrument import Recorder
+from bcs.memoryda import load_bcs
+
+RUN_DATE = datetime(2025, 1, 1)
+
+
+def run_engine(sites, captures, recorder):
+    with recorder.stage("Engine"):
+        engine.run(sites, captures, RUN_DATE, recorder=recorder)
+
+
+def run_legacy(sites, captures, recorder):
+    ws = load_bcs(synthetic.records(sites), synthetic.records(captures))
+    with recorder.stage("Legacy"):
+        legacy.run(ws, RUN_DATE, recorder=recorder)
+
+
+def measure(workflow, sites, captures, memory=True):
+    """Returns [(stage, seconds, peak MB)] for one run of workflow, timed and then traced for memory."""
+    timed = Recorder()
+    workflow(sites, captures, timed)
+    peaks = {}
+    if memory:
+        traced = Recorder(trace_memory=True)
+        workflow(sites, captures, traced)
+        peaks = dict((record.name, record.peak_mb) for record in traced.stages)
+    return [(record.name, record.wall_s, peaks.get(record.name, float("nan"))) for record in timed.stages]
+
+
+def commit():
+    #git commit of the benchmarked tree, if there is one
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def read_history(path):
+    if not path or not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def regressions(history, records, tolerance, min_seconds, baseline):
+    """Messages for records that are slower or use more memory than the median of the last baseline records with
+    the same size, seed, workflow and stage."""
+    messages = []
+    for record in records:
+        key = (record["size"], record["seed"], record["workflow"], record["stage"])
+        previous = [old for old in history if (old["size"], old["seed"], old["workflow"], old["stage"]) == key][-baseline:]
+        if not previous:
+            continue
+        seconds = statistics.median(old["seconds"] for old in previous)
+        if record["seconds"] > max(seconds * (1 + tolerance), min_seconds):
+            messages.append("{} {:,} rows: {:.2f} s, baseline {:.2f} s".format(record["stage"], record["size"], record["seconds"], seconds))
+        peaks = [old["peak_mb"] for old in previous if old["peak_mb"] is not None]
+        if peaks and record["peak_mb"] is not None and record["peak_mb"] > statistics.median(peaks) * (1 + tolerance):
+            messages.append("{} {:,} rows: peak {:.1f} MB, baseline {:.1f} MB".format(record["stage"], record["size"], record["peak_mb"], statistics.median(peaks)))
+    return messages
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 1000000])
+    parser.add_argument("--legacy-max", type=int, default=100000, help="largest size to also run the legacy workflow on")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true", help="skip the traced run for per-stage peak memory")
+    parser.add_argument("--history", help="JSON lines file to compare with and append the results to")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown or memory growth (0.25 = 25%%)")
+    parser.add_argument("--min-seconds", type=float, default=0.05, help="stages faster than this are never regressions")
+    parser.add_argument("--baseline", type=int, default=5, help="number of previous records the baseline is the median of")
+    args = parser.parse_args(argv)
+
+    stamp = {"date": datetime.now().isoformat(timespec="seconds"), "commit": commit(), "python": platform.python_version()}
+    records = []
+    print("{:>10} {:<40} {:>10} {:>14} {:>10}".format("rows", "stage", "seconds", "rows/s", "peak_MB"))
+    for size in args.sizes:
+        start = time.perf_counter()
+        sites, captures = synthetic.generate(size, args.seed)
+        print("{:>10,} {:<40} {:>10.2f}".format(size, "(generate)", time.perf_counter() - start))
+        workflows = [("engine", run_engine)] + ([("legacy", run_legacy)] if size <= args.legacy_max else [])
+        for name, workflow in workflows:
+            for stage, seconds, peak in measure(workflow, sites, captures, not args.no_memory):
+                records.append(dict(stamp, size=size, seed=args.seed, workflow=name, stage=stage, seconds=round(seconds, 4),
+                                    rows_per_s=round(size / seconds) if seconds else None,
+                                    peak_mb=None if peak != peak else round(peak, 1)))
+                print("{:>10,} {:<40} {:>10.2f} {:>14,.0f} {:>10.1f}".format(size, stage, seconds, size / seconds if seconds else 0, peak))
+
+    history = read_history(args.history)
+    messages = regressions(history, records, args.tolerance, args.min_seconds, args.baseline)
+    for message in messages:
+        print("regression: " + message)
+    if args.history:
+        with open(args.history, "a") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+    return 1 if messages else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
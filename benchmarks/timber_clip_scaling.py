@@ -0,0 +1,74 @@
+'''
+Core scaling of TimberSaleAreaClipTool's per sale clips from 1 to N worker processes.
+
+Clips every feature class of an input workspace to every sale in a timber sale feature class, once serially
+(clip_per_sale) as the baseline and then with clip_parallel for each --workers count, each run into a new file
+geodatabase.  Every run must write the same output feature classes with the same feature counts as the serial run.
+Speedup is against the serial run, so it includes starting the workers and copying their outputs out of the
+scratch geodatabases.  Needs arcpy (run it with the ArcGIS Pro python) and a machine with at least as many cores as
+the largest worker count.
+
+    python -m benchmarks.timber_clip_scaling C:\\data\\inputs.gdb C:\\data\\sales.gdb\\TimberSales --workers 1 2 4 8
+'''
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import arcpy
+
+import TimberSaleAreaClipTool as tool
+
+
+def outputs(output_workspace, finished_pairs):
+    #{output path relative to the geodatabase: feature count}
+    return dict((os.path.relpath(result.out_path, output_workspace), int(arcpy.GetCount_management(result.out_path)[0]))
+                for sale_id, result in finished_pairs if result.out_path is not None)
+
+
+def time_run(folder, name, clip):
+    #clip takes the output workspace and returns the finished (sale_id, ClipResult) pairs
+    output_workspace = arcpy.CreateFileGDB_management(folder, name + ".gdb")[0]
+    start = time.perf_counter()
+    finished_pairs = clip(output_workspace)
+    return time.perf_counter() - start, outputs(output_workspace, finished_pairs)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("input_workspace", help="workspace of the feature classes to clip")
+    parser.add_argument("timber_sale_fc", help="timber sale polygons with a sale_name field")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--keep", action="store_true", help="keep the output geodatabases")
+    args = parser.parse_args(argv)
+
+    match_field = "sale_name"
+    arcpy.env.workspace = args.input_workspace
+    arcpy.env.overwriteOutput = True
+    input_feature_classes = arcpy.ListFeatureClasses()
+    sale_ids = sorted({row[0] for row in arcpy.da.SearchCursor(args.timber_sale_fc, [match_field]) if row[0] is not None}, key=str)
+
+    folder = tempfile.mkdtemp(prefix="timber_clip_scaling_")
+    try:
+        serial_s, expected = time_run(folder, "serial", lambda output_workspace: tool.clip_per_sale(
+            args.input_workspace, input_feature_classes, args.timber_sale_fc, output_workspace, match_field, sale_ids))
+        print("{:,} sales, {} feature classes, {:,} outputs, {} CPUs".format(len(sale_ids), len(input_feature_classes), len(expected), os.cpu_count()))
+        print("{:>8} {:>10} {:>10} {:>10}".format("workers", "seconds", "sales/s", "speedup"))
+        print("{:>8} {:>10.2f} {:>10.2f} {:>10}".format("serial", serial_s, len(sale_ids) / serial_s, "1.0x"))
+        for workers in args.workers:
+            elapsed, result = time_run(folder, "workers_{}".format(workers), lambda output_workspace: tool.clip_parallel(
+                args.input_workspace, input_feature_classes, args.timber_sale_fc, output_workspace, match_field, sale_ids, workers))
+            if result != expected:
+                print("warning: {} workers wrote different outputs or feature counts than the serial run".format(workers))
+            print("{:>8} {:>10.2f} {:>10.2f} {:>10}".format(workers, elapsed, len(sale_ids) / elapsed, "{:.1f}x".format(serial_s / elapsed)))
+    finally:
+        if args.keep:
+            print("output geodatabases kept in " + folder)
+        else:
+            shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+import math
+
+import numpy as np
+import pytest
+
+from bcs import buffers
+from bcs.engine import BufferRow
+
+
+def row(distance, species="MYSE", xy=(500000.0, 4400000.0), exempt="N"):
+    return BufferRow("S1", "Site 1", "Forest", "0903", "Hibernacula", "Primary", distance, species, "", exempt, xy)
+
+
+def test_distance_feet():
+    assert buffers.distance_feet("500 Feet") == 500
+    assert buffers.distance_feet("2 Miles") == 10560
+    assert buffers.distance_feet("100 meters") == pytest.approx(328.084, abs=1e-3)
+    with pytest.raises(ValueError):
+        buffers.distance_feet("5 furlongs")
+
+
+def test_projected_circle_radius():
+    rings = buffers.buffer_rings([row("1000 Feet")], meters_per_unit=1.0)
+    assert rings.shape == (1, buffers.CIRCLE_VERTICES + 1, 2)
+    radius = np.hypot(rings[0, :, 0] - 500000.0, rings[0, :, 1] - 4400000.0)
+    assert radius == pytest.approx(np.full(len(radius), 304.8))
+    assert (rings[0, 0] == rings[0, -1]).all()
+
+
+def test_geographic_circle_radius():
+    rings = buffers.circle_rings([-85.0], [40.0], [26400.0], geographic=True)
+    lon, lat = np.radians(rings[0, :, 0]), np.radians(rings[0, :, 1])
+    #haversine distance from the center, within 0.5% of 5 miles
+    a = np.sin((lat - math.radians(40.0)) / 2) ** 2 + math.cos(math.radians(40.0)) * np.cos(lat) * np.sin((lon - math.radians(-85.0)) / 2) ** 2
+    meters = 2 * 6371008.8 * np.arcsin(np.sqrt(a))
+    assert meters == pytest.approx(np.full(len(meters), 26400 * 0.3048), rel=5e-3)
+
+
+def test_rows_without_xy_get_nan_rings():
+    assert np.isnan(buffers.buffer_rings([row("500 Feet", xy=None)])).all()
+
+
+def test_merge_buffer_rows():
+    merged = buffers.merge_buffer_rows([row("500 Feet", "PESU"), row("500 Feet", "MYSE", exempt="Y"), row("1320 Feet")])
+    assert [(r.BufferDistance, r.Species, r.Exempt) for r in merged] == [("500 Feet", "PESU, MYSE", "Y"), ("1320 Feet", "MYSE", "N")]
+
+
+def test_ring_distances():
+    rows = [row("4488 Feet"), row("500 Feet"), row("1320 Feet"), row("500 Feet", xy=(0.0, 0.0))]
+    assert list(buffers.ring_distances(rows)) == [1320, 0, 500, 0]
@@ -0,0 +1,115 @@
+from datetime import datetime
+
+import pandas as pd
+
+from bcs import engine, legacy, wns
+from bcs.constants import MYSE, MYSO, bufferFields, siteFields, captureFields
+from bcs.memoryda import load_bcs
+
+RUN_DATE = datetime(2025, 1, 1)
+
+
+def site(**values):
+    row = {"OID@": 1, "SITE_CN": "S1", "VISIT_CN": "V1", "VISIT_START_DATE": "2020/02/01", "FS_UNIT_ID": "0903",
+           "FS_UNIT_NAME": "Forest 0903", "SITE_NAME": "Site 1", "SITE_TYPE": "Cave", "EXEMPT_FROM_PUBLIC": "N",
+           "BIOLOGICAL_SITE_USE": "Hibernating", "VISIT_SITE_STATUS": "Active", "VISIT_SITE_CONDITION": "Usable",
+           "VISIT_COMMENTS": "", "OBS_METHOD_TYPE": "Visual", "OBS_SCIENTIFIC_NAME": MYSE, "OBS_COUNT": 12,
+           "REPRO_STATUS": None, "SHAPE@XY": (-85.0, 40.0)}
+    row.update(values)
+    return row
+
+
+def capture(**values):
+    row = {"OID@": 1, "OBS_CN": "O1", "OBS_DATE": "2020/07/01", "REPRODUCTIVE_STATUS": "Reproducing",
+           "SCIENTIFIC_NAME": MYSE, "EXEMPT_FROM_PUBLIC": None, "SHAPE@XY": (-85.0, 40.0), "FS_UNIT_ID": "0903",
+           "SITE_NAME": "Net 1", "FS_UNIT_NAME": "Forest 0903", "AGE": "Adult", "OBS_METHOD": "In Hand",
+           "SITE_TYPE": "Sample Point"}
+    row.update(values)
+    return row
+
+
+def buffers(sites=(), captures=()):
+    result = engine.run(list(sites), list(captures), RUN_DATE)
+    return [(row.BufferClass, row.BufferType, row.BufferDistance, row.Species) for row in result.buffer_rows]
+
+
+def test_hibernacula_thresholds():
+    assert buffers([site(OBS_COUNT=12)]) == [("Hibernacula", "Primary", "500 Feet", "MYSE"),
+                                             ("Hibernacula", "Secondary", "1320 Feet", "MYSE")]
+
+
+def test_hibernacula_internal_myse_count():
+    assert buffers([site(OBS_COUNT=6, VISIT_COMMENTS="Internal count")]) == [
+        ("Hibernacula", "Secondary", "1320 Feet", "MYSE"), ("Hibernacula", "Tertiary", "4488 Feet", "MYSE")]
+
+
+def test_hibernacula_pre_wns_visit_has_no_buffers():
+    assert buffers([site(VISIT_START_DATE="2010/02/01")]) == []
+
+
+def test_historical_site_gets_one_buffer():
+    assert buffers([site(VISIT_SITE_STATUS="Inactive")]) == [("Hibernacula", "Historical", "500 Feet", "BCS")]
+
+
+def test_roost_primary_and_maternity():
+    rows = buffers([site(BIOLOGICAL_SITE_USE="Perch or Roost", SITE_TYPE="Building", VISIT_START_DATE="2020/06/01",
+                         OBS_SCIENTIFIC_NAME=MYSO, OBS_COUNT=3, REPRO_STATUS="Reproducing")])
+    assert rows == [("Roost", "Primary", "150 Feet", ""), ("Roost", "Maternity", "3696 Feet", "MYSO")]
+
+
+def test_capture_window():
+    assert buffers(captures=[capture()]) == [("Capture", "Maternity", "3960 Feet", "MYSE")]
+    assert buffers(captures=[capture(OBS_DATE="2020/04/01")]) == []
+
+
+def test_unparseable_date_is_a_warning():
+    result = engine.run([site(VISIT_START_DATE="not a date")], [], RUN_DATE)
+    assert result.buffer_rows == []
+    assert result.warnings
+
+
+def test_tuple_and_dict_rows_match():
+    sites, captures = [site(OBS_COUNT=25)], [capture()]
+    as_tuples = engine.run([tuple(row[field] for field in siteFields) for row in sites],
+                           [tuple(row[field] for field in captureFields) for row in captures], RUN_DATE)
+    assert as_tuples.buffer_rows == engine.run(sites, captures, RUN_DATE).buffer_rows
+    assert engine.run(pd.DataFrame(sites), pd.DataFrame(captures), RUN_DATE).buffer_rows == as_tuples.buffer_rows
+
+
+def test_na_org_is_no_wns_and_uses_highest_abundance():
+    #NA orgs were PreWNS (no buffers) in the original tool; every visit now counts, pre-WNS dates too
+    sites = [site(FS_UNIT_ID="0805", VISIT_START_DATE="2010/02/01", OBS_COUNT=12),
+             site(**{"OID@": 2}, FS_UNIT_ID="0805", VISIT_CN="V2", VISIT_START_DATE="2012/02/01", OBS_COUNT=30)]
+    result = engine.run(sites, [capture(FS_UNIT_ID="0805")], RUN_DATE)
+    assert set(result.hibernacula["PrePostWNS"]) == {"NoWNS"}
+    assert buffers(sites) == [("Hibernacula", "Primary", "500 Feet", "MYSE"), ("Hibernacula", "Secondary", "1320 Feet", "MYSE"),
+                              ("Hibernacula", "Tertiary", "4488 Feet", "MYSE")]
+    assert buffers(captures=[capture(FS_UNIT_ID="0805")]) == [("Capture", "Maternity", "3960 Feet", "MYSE")]
+
+
+def test_na_org_roost_has_no_post_wns_buffers():
+    assert buffers([site(FS_UNIT_ID="0805", BIOLOGICAL_SITE_USE="Perch or Roost", SITE_TYPE="Building",
+                         VISIT_START_DATE="2020/06/01", OBS_SCIENTIFIC_NAME=MYSO, REPRO_STATUS="Reproducing")]) == []
+
+
+def test_err_and_unknown_orgs_are_error_without_buffers():
+    for org in ("08", "0999"):
+        result = engine.run([site(FS_UNIT_ID=org)], [capture(FS_UNIT_ID=org)], RUN_DATE)
+        assert set(result.hibernacula["PrePostWNS"]) == set(result.captures["PrePostWNS"]) == {"error"}
+        assert result.buffer_rows == []
+
+
+def test_legacy_classifies_orgs_like_the_engine():
+    sites = [site(**{"OID@": n}, SITE_CN="S{}".format(n), FS_UNIT_ID=org, VISIT_START_DATE="2010/02/01")
+             for n, org in enumerate(["0903", "0805", "08", "0999"], 1)]
+    captures = [capture(**{"OID@": n}, OBS_CN="O{}".format(n), FS_UNIT_ID=org) for n, org in enumerate(["0903", "0805", "08", "0999"], 1)]
+    ws = load_bcs(sites, captures)
+    legacy.run(ws, RUN_DATE)
+    expected = [tuple(row) for row in engine.run(sites, captures, RUN_DATE).buffer_rows]
+    assert sorted(tuple(row[field] for field in bufferFields) for row in ws.tables["ptBufferFC"]) == sorted(expected)
+
+
+def test_wns_notes_name_the_na_and_err_orgs():
+    notes = wns.DEFAULT_TABLE.notes()
+    assert "0805" in notes[0] and "PreWNS" in notes[0]
+    assert "08" in notes[1]
@@ -0,0 +1,117 @@
+import os
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from bcs import engine, golden, legacy
+from bcs.constants import bufferFields, wns_dict
+from bcs.memoryda import load_bcs
+from bcs.synthetic import records
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "golden")
+RUN_DATE = datetime(2025, 1, 1)
+
+
+def fixture():
+    return golden.read_fixture(FIXTURE)
+
+
+def legacy_run(sites, captures, current_date, wns):
+    ws = load_bcs(records(sites), records(captures))
+    legacy.run(ws, current_date, wns=wns)
+    return [tuple(row[field] for field in bufferFields) for row in ws.tables["ptBufferFC"]]
+
+
+def site_rows(rows, site):
+    #(BufferClass, BufferType, BufferDistance, Species) of a site's golden rows (dicts) or engine BufferRows
+    rows = [row if isinstance(row, dict) else row._asdict() for row in rows]
+    return sorted(tuple(row[field] for field in golden.COMPARE_FIELDS[1:5]) for row in rows if row["Site_CN"] == site)
+
+
+@pytest.mark.parametrize("candidate", [engine.run, legacy_run])
+def test_matches_the_original_tool_with_the_rule_changes(candidate):
+    sites, captures, reference, changes = fixture()
+    comparison = golden.compare(sites, captures, reference, RUN_DATE, candidate, changes=changes)
+    assert comparison.divergences == {}
+    assert comparison.reference_rows == comparison.candidate_rows == len(reference) + 59
+    assert comparison.changed_sites == 31
+
+
+def test_without_the_rule_changes_only_the_changed_sites_diverge():
+    sites, captures, reference, changes = fixture()
+    comparison = golden.compare(sites, captures, reference, RUN_DATE)
+    assert set(comparison.divergences) == set(change["Site_CN"] for change in changes)
+
+
+def test_rule_changes_are_historic_hibernacula_and_na_orgs():
+    #Worked out from the fixture input alone: a hibernaculum is historic when its latest visit is Inactive and Usable
+    sites, captures, reference, changes = fixture()
+    hib = sites[sites["BIOLOGICAL_SITE_USE"] == "Hibernating"]
+    latest = hib.assign(date=pd.to_datetime(hib["VISIT_START_DATE"].str[:10], format="%Y/%m/%d"))
+    latest = latest.sort_values("date").groupby("SITE_CN").tail(1)
+    historic = set(latest.loc[(latest["VISIT_SITE_STATUS"] == "Inactive") & (latest["VISIT_SITE_CONDITION"] == "Usable"), "SITE_CN"])
+    org = dict(zip(sites["SITE_CN"], sites["FS_UNIT_ID"]))
+    org.update(zip(captures["OBS_CN"], captures["FS_UNIT_ID"]))
+    na = set(site for site, code in org.items() if wns_dict[code] == "NA")
+
+    historical = [change for change in changes if change["BufferType"] == "Historical"]
+    assert set(change["Site_CN"] for change in historical) == historic
+    assert all(change["Change"] == "added" and change["BufferDistance"] == "500 Feet" for change in historical)
+    removed = [change for change in changes if change["Change"] == "removed"]
+    assert removed and set(change["Site_CN"] for change in removed) <= historic - na
+    others = [change for change in changes if change["Change"] == "added" and change["BufferType"] != "Historical"]
+    assert others and set(change["Site_CN"] for change in others) <= na - historic
+
+
+def test_rule_change_rows():
+    sites, captures, reference, changes = fixture()
+    rows = engine.run(sites, captures, RUN_DATE).buffer_rows
+    #historic hibernaculum (org 0808, WNS 2013): the original tool gave it MYSE abundance buffers
+    assert site_rows(reference, "S41") == [("Hibernacula", "Primary", "500 Feet", "MYSE"),
+                                           ("Hibernacula", "Secondary", "1320 Feet", "MYSE"),
+                                           ("Hibernacula", "Tertiary", "4488 Feet", "MYSE")]
+    assert site_rows(rows, "S41") == [("Hibernacula", "Historical", "500 Feet", "BCS")]
+    #historic hibernaculum of an NA org (0805)
+    assert site_rows(reference, "S72") == []
+    assert site_rows(rows, "S72") == [("Hibernacula", "Historical", "500 Feet", "BCS")]
+    #hibernaculum of an NA org (0816): NoWNS, highest abundance over every visit
+    assert site_rows(reference, "S10") == []
+    assert site_rows(rows, "S10") == [("Hibernacula", "Primary", "500 Feet", "PESU"),
+                                      ("Hibernacula", "Secondary", "1320 Feet", "MYSE"),
+                                      ("Hibernacula", "Secondary", "1320 Feet", "PESU"),
+                                      ("Hibernacula", "Tertiary", "4488 Feet", "MYSE"),
+                                      ("Hibernacula", "Tertiary", "4488 Feet", "PESU")]
+    #capture of an NA org (0813)
+    assert site_rows(reference, "O2") == []
+    assert site_rows(rows, "O2") == [("Capture", "Maternity", "9540 Feet", "MYSO")]
+
+
+def test_missing_buffer_is_reported_against_its_site():
+    sites, captures, reference, changes = fixture()
+    dropped = engine.run(sites, captures, RUN_DATE).buffer_rows[0]
+
+    def candidate(sites, captures, current_date, wns):
+        return [row for row in engine.run(sites, captures, current_date, wns=wns).buffer_rows if row != dropped]
+
+    comparison = golden.compare(sites, captures, reference, RUN_DATE, candidate, changes=changes)
+    assert list(comparison.divergences) == [dropped.Site_CN]
+    missing, extra = comparison.divergences[dropped.Site_CN]
+    assert sum(missing.values()) == 1 and not extra
+
+
+def test_rule_change_must_apply_to_the_golden_rows():
+    sites, captures, reference, changes = fixture()
+    removed = next(change for change in changes if change["Change"] == "removed")
+    with pytest.raises(ValueError):
+        golden.apply_changes(reference, changes + [removed])
+
+
+def test_golden_csv_round_trip(tmp_path):
+    sites, captures, reference, changes = fixture()
+    rows = engine.run(sites, captures, RUN_DATE).buffer_rows
+    path = tmp_path / "golden.csv"
+    golden.write_golden(path, rows)
+    comparison = golden.compare(sites, captures, golden.read_golden(path), RUN_DATE)
+    assert comparison.reference_rows == len(rows)
+    assert comparison.divergences == {}
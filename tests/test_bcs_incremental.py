@@ -0,0 +1,46 @@
+from datetime import datetime
+
+from bcs import incremental, synthetic
+
+RUN_DATE = datetime(2025, 1, 1)
+
+
+def data():
+    return synthetic.generate(2000, seed=3)
+
+
+def test_fingerprints_ignore_row_order():
+    sites, captures = data()
+    shuffled = sites.sample(frac=1, random_state=0)
+    assert incremental.fingerprints(shuffled, captures, RUN_DATE) == incremental.fingerprints(sites, captures, RUN_DATE)
+
+
+def test_changed_and_removed_keys():
+    sites, captures = data()
+    previous = incremental.fingerprints(sites, captures, RUN_DATE)
+    changed_site = sites["SITE_CN"].iloc[0]
+    removed_net = captures["SITE_NAME"].iloc[-1]
+    sites.loc[sites.index[0], "OBS_COUNT"] = 999
+    captures = captures[captures["SITE_NAME"] != removed_net]
+
+    changed, removed = incremental.compare(previous, incremental.fingerprints(sites, captures, RUN_DATE))
+    assert changed == {(incremental.SITE_SOURCE, changed_site)}
+    assert removed == {(incremental.CAPTURE_SOURCE, removed_net)}
+
+
+def test_run_date_changes_only_snags_crossing_ten_years():
+    sites, captures = data()
+    before = incremental.fingerprints(sites, captures, datetime(2025, 1, 1))
+    changed, removed = incremental.compare(before, incremental.fingerprints(sites, captures, datetime(2040, 1, 1)))
+    snag_sites = set(sites.loc[sites["SITE_TYPE"] == "Snag", "SITE_CN"])
+    assert changed and not removed
+    assert {key for source, key in changed} <= snag_sites
+
+
+def test_select_and_buffer_key():
+    sites, captures = data()
+    site_key = incremental.buffer_key("Roost", sites["SITE_CN"].iloc[0], "Site")
+    capture_key = incremental.buffer_key("Capture", "O1", captures["SITE_NAME"].iloc[0])
+    selected_sites, selected_captures = incremental.select(sites, captures, {site_key, capture_key})
+    assert set(selected_sites["SITE_CN"]) == {site_key[1]}
+    assert set(selected_captures["SITE_NAME"]) == {capture_key[1]}